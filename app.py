@@ -4,14 +4,24 @@ from colorama import init, Fore, Back, Style
 from datetime import datetime
 import os
 import json
-import pandas as pd
 import logging
 import traceback
 import time
+import threading
+from contextlib import contextmanager
 from cutlery.DatasetKitchen import DatasetManager, TemplateManager, FileHandler
 from cutlery.OllamaInterface import OllamaInterface
+from cutlery.ParquetEditLog import ParquetEditLog
+from cutlery.FileCatalog import FileCatalog
+from cutlery.ResponseEncoder import ResponseEncoder
+from cutlery.BatchIngestor import BatchIngestor
+from cutlery.LatexSegmenter import LatexSegmenter
+from cutlery.ArxivPaperDownloader import ArxivPaperDownloader
+from cutlery.ModelEvaluator import ModelEvaluator
+from cutlery.DatasetSharder import DatasetSharder
 import subprocess
 import glob
+import re
 
 init(autoreset=True)
 
@@ -28,18 +38,69 @@ huggingface_dir = os.path.join(base_dir, "huggingface_models")
 salad_dir = os.path.join(base_dir, "salad")
 oven_dir = os.path.join(base_dir, "oven")
 edits_dir = os.path.join(base_dir, "edits")
+evaluations_dir = os.path.join(base_dir, "evaluations")
+shards_dir = os.path.join(base_dir, "shards")
 
-for dir_path in [huggingface_dir, salad_dir, oven_dir, edits_dir]:
+for dir_path in [huggingface_dir, salad_dir, oven_dir, edits_dir, evaluations_dir, shards_dir]:
     os.makedirs(dir_path, exist_ok=True)
 
 ollama_interface = OllamaInterface(None)
 file_handler = FileHandler(input_dir, output_dir)
 template_manager = TemplateManager(input_dir)
 dataset_manager = DatasetManager(ollama_interface, template_manager, input_dir, output_dir)
+edit_log = ParquetEditLog()
+response_encoder = ResponseEncoder()
+batch_ingestor = BatchIngestor(template_manager)
+latex_segmenter = LatexSegmenter(os.path.join(latex_library_dir, '.segments'), template_manager)
+arxiv_downloader = ArxivPaperDownloader(
+    os.path.join(base_dir, 'arxiv_cache'),
+    latex_library_dir=latex_library_dir,
+    base_url=os.environ.get('AGENTCHEF_ARXIV_EPRINT_URL', 'https://arxiv.org/e-print/'),
+    max_workers=int(os.environ.get('AGENTCHEF_ARXIV_WORKERS', 4))
+)
+model_evaluator = ModelEvaluator(
+    ollama_interface,
+    cache_dir=os.path.join(evaluations_dir, '.cache'),
+    max_workers=int(os.environ.get('AGENTCHEF_EVAL_WORKERS', 4))
+)
+
+DATA_FILE_EXTENSIONS = ('.json', '.parquet', '.txt', '.tex')
+file_catalog = FileCatalog({
+    "ingredient_files": (input_dir, DATA_FILE_EXTENSIONS),
+    "dish_files": (output_dir, DATA_FILE_EXTENSIONS),
+    "latex_files": (latex_library_dir, ('.tex',)),
+    "salad_files": (salad_dir, DATA_FILE_EXTENSIONS),
+    "huggingface_folders": (huggingface_dir, None),
+    "oven_files": (oven_dir, DATA_FILE_EXTENSIONS),
+    "edits_files": (edits_dir, DATA_FILE_EXTENSIONS),
+    "evaluation_files": (evaluations_dir, ('.parquet', '.json')),
+    "shard_folders": (shards_dir, None),
+})
 
 CUSTOM_PROMPTS_DIR = os.path.join(base_dir, 'custom_prompts')
 os.makedirs(CUSTOM_PROMPTS_DIR, exist_ok=True)
 
+# Set when the serving worker is asked to stop; running generation jobs checkpoint and return
+shutdown_event = threading.Event()
+active_jobs = 0
+active_jobs_lock = threading.Lock()
+
+def begin_shutdown():
+    if not shutdown_event.is_set():
+        logging.info(f"Shutdown requested, waiting for {active_jobs} in-flight job(s) to checkpoint")
+    shutdown_event.set()
+
+@contextmanager
+def track_job():
+    global active_jobs
+    with active_jobs_lock:
+        active_jobs += 1
+    try:
+        yield
+    finally:
+        with active_jobs_lock:
+            active_jobs -= 1
+
 def initialize(model):
     ollama_interface.set_model(model)
 
@@ -70,7 +131,8 @@ def run(mode, seed_file, **kwargs):
                 paraphrases_per_sample=paraphrases_per_sample,
                 column_types=column_types,
                 use_all_samples=use_all_samples,
-                custom_prompts=custom_prompts
+                custom_prompts=custom_prompts,
+                stop_event=shutdown_event
             )
 
             if result_df.empty:
@@ -81,6 +143,17 @@ def run(mode, seed_file, **kwargs):
             input_name = os.path.splitext(seed_file)[0]
             timestamp = int(time.time())
             output_filename = f'{input_name}_synthetic_{timestamp}.parquet'
+
+            if result_df.attrs.get('partial'):
+                # Interrupted by a shutdown: keep the rows generated so far as a checkpoint
+                output_filename = f'{input_name}_synthetic_{timestamp}_partial.parquet'
+                result_df.to_parquet(os.path.join(output_dir, output_filename))
+                print(f"{Fore.YELLOW}Generation interrupted, checkpoint saved to {output_filename}{Style.RESET_ALL}")
+                return {
+                    'message': "Generation interrupted by server shutdown, partial dataset saved",
+                    'file': output_filename
+                }
+
             output_file = os.path.join(output_dir, output_filename)
             result_df.to_parquet(output_file)
 
@@ -103,34 +176,48 @@ def run(mode, seed_file, **kwargs):
 def index():
     return "Welcome to AgentChef API"
 
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    return jsonify({"status": "ok", "pid": os.getpid()})
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    checks = {
+        "shutting_down": shutdown_event.is_set(),
+        "templates_loaded": bool(template_manager.get_templates()),
+        "data_dirs_writable": all(os.access(d, os.W_OK) for d in [input_dir, output_dir, edits_dir]),
+    }
+    ready = not checks["shutting_down"] and checks["templates_loaded"] and checks["data_dirs_writable"]
+    return jsonify({"ready": ready, "active_jobs": active_jobs, "checks": checks}), 200 if ready else 503
+
 @app.route('/api/files', methods=['GET'])
 def get_files():
-    def get_files_from_dir(directory):
-        return [f for f in os.listdir(directory) if os.path.isfile(os.path.join(directory, f)) and f.endswith(('.json', '.parquet', '.txt', '.tex'))]
-
-    ingredient_files = get_files_from_dir(input_dir)
-    dish_files = get_files_from_dir(output_dir)
-    latex_files = [f for f in os.listdir(latex_library_dir) if f.endswith('.tex')]
-    salad_files = get_files_from_dir(salad_dir)
-    huggingface_folders = [f for f in os.listdir(huggingface_dir) if os.path.isdir(os.path.join(huggingface_dir, f))]
-    oven_files = get_files_from_dir(oven_dir)
-    edits_files = get_files_from_dir(edits_dir)
-    
-    return jsonify({
-        "ingredient_files": ingredient_files,
-        "dish_files": dish_files,
-        "latex_files": latex_files,
-        "salad_files": salad_files,
-        "huggingface_folders": huggingface_folders,
-        "oven_files": oven_files,
-        "edits_files": edits_files
-    })
+    return jsonify({category: file_catalog.names(category) for category in file_catalog.categories})
+
+@app.route('/api/catalog/<category>', methods=['GET'])
+def get_catalog(category):
+    try:
+        extensions = request.args.get('extensions')
+        limit = request.args.get('limit')
+        entries, total = file_catalog.list(
+            category,
+            pattern=request.args.get('pattern'),
+            extensions=tuple(extensions.split(',')) if extensions else None,
+            sort=request.args.get('sort', 'name'),
+            reverse=request.args.get('order', 'asc') == 'desc',
+            offset=int(request.args.get('offset', 0)),
+            limit=int(limit) if limit else None
+        )
+        return jsonify({"files": entries, "total": total})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
 @app.route('/api/parquet_data', methods=['GET'])
 def get_parquet_data():
     filename = request.args.get('filename')
     page = int(request.args.get('page', 0))
     rows_per_page = int(request.args.get('rows_per_page', 10))
+    response_format = request.args.get('format', 'json')
 
     if not filename:
         return jsonify({"error": "Filename is required"}), 400
@@ -152,19 +239,64 @@ def get_parquet_data():
         if not os.path.exists(file_path):
             return jsonify({"error": f"File not found: {file_path}"}), 404
         
-        df = pd.read_parquet(file_path)
-        columns = df.columns.tolist()
         start = page * rows_per_page
-        end = min(start + rows_per_page, len(df))
-        page_data = df.iloc[start:end].to_dict('records')
-        return jsonify({
+        table, total_rows = dataset_manager.read_parquet_page(file_path, start, start + rows_per_page)
+        columns = table.column_names
+        page_data = edit_log.overlay_records(file_path, response_encoder.table_records(table), start)
+
+        if response_format == 'ndjson':
+            # First line carries the page metadata, then one row per line
+            return response_encoder.ndjson_response(page_data, header={"total_rows": total_rows, "columns": columns})
+        return response_encoder.json_response({
             "content": page_data,
-            "total_rows": len(df),
+            "total_rows": total_rows,
             "columns": columns
         })
     except Exception as e:
         return jsonify({"error": f"Error reading parquet file: {str(e)}"}), 500
 
+@app.route('/api/export/<path:filename>', methods=['GET'])
+def export_dataset(filename):
+    output_format = request.args.get('format', 'jsonl')
+    compression = request.args.get('compression')
+    columns = request.args.get('columns')
+    start = request.args.get('start', type=int)
+    stop = request.args.get('stop', type=int)
+
+    if output_format not in dataset_manager.exporter.FORMATS:
+        return jsonify({"error": f"Unsupported export format: {output_format}"}), 400
+    if compression not in (None, 'gzip', 'br', 'none'):
+        return jsonify({"error": f"Unsupported compression: {compression}"}), 400
+
+    for dir_path in [input_dir, output_dir, salad_dir, edits_dir]:
+        file_path = os.path.join(dir_path, filename)
+        if os.path.exists(file_path):
+            break
+    else:
+        return jsonify({"error": f"File not found: {filename}"}), 404
+
+    try:
+        chunks = dataset_manager.exporter.iter_export(
+            file_path,
+            output_format,
+            columns=columns.split(',') if columns else None,
+            batch_transform=lambda batch, offset: edit_log.overlay_batch(file_path, batch, offset),
+            start=start,
+            stop=stop
+        )
+        mimetype, extension = dataset_manager.exporter.FORMATS[output_format]
+        download_name = f"{os.path.splitext(os.path.basename(filename))[0]}{extension}"
+        return response_encoder.stream_response(
+            chunks,
+            mimetype=mimetype,
+            headers={"Content-Disposition": f'attachment; filename="{download_name}"'},
+            encoding='' if compression == 'none' else compression
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Error exporting file: {str(e)}"}), 500
+
 @app.route('/api/file/<type>/<path:filename>', methods=['GET'])
 def get_file_content(type, filename):
     logging.info(f"Received request for file: {filename} of type: {type}")
@@ -182,22 +314,7 @@ def get_file_content(type, filename):
     else:
         return jsonify({"error": "Invalid file type"}), 400
     
-    try:
-        if filename.endswith('.parquet'):
-            df = pd.read_parquet(file_path)
-            content = df.head(100).to_dict('records')  # Convert first 100 rows to list of dictionaries
-            columns = df.columns.tolist()
-            return jsonify({"content": content, "columns": columns, "total_rows": len(df)})
-        elif filename.endswith(('.txt', '.json', '.tex')):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            return jsonify({"content": content})
-        else:
-            return jsonify({"error": "Unsupported file type"}), 400
-    except FileNotFoundError:
-        return jsonify({"error": f"File not found: {file_path}"}), 404
-    except Exception as e:
-        return jsonify({"error": f"Error reading file: {str(e)}"}), 500
+    return _read_file_content(file_path, filename)
 
 @app.route('/api/file/edit/<path:filename>', methods=['GET'])
 def get_edit_file_content(filename):
@@ -207,14 +324,13 @@ def get_edit_file_content(filename):
 def _read_file_content(file_path, filename):
     try:
         if filename.endswith('.parquet'):
-            df = pd.read_parquet(file_path)
-            content = df.head(100).to_dict('records')  # Convert first 100 rows to list of dictionaries
-            columns = df.columns.tolist()
-            return jsonify({"content": content, "columns": columns, "total_rows": len(df)})
+            table, total_rows = dataset_manager.read_parquet_page(file_path, 0, 100)  # Preview the first 100 rows
+            content = edit_log.overlay_records(file_path, response_encoder.table_records(table))
+            return response_encoder.json_response({"content": content, "columns": table.column_names, "total_rows": total_rows})
         elif filename.endswith(('.txt', '.json', '.tex')):
             with open(file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
-            return jsonify({"content": content})
+            return response_encoder.json_response({"content": content})
         else:
             return jsonify({"error": "Unsupported file type"}), 400
     except FileNotFoundError:
@@ -264,6 +380,13 @@ def add_template():
     except ValueError as e:
         return jsonify({'success': False, 'message': str(e)}), 400
 
+@app.route('/api/template_schema/<template_name>', methods=['GET'])
+def get_template_schema(template_name):
+    try:
+        return jsonify(template_manager.get_schema(template_name).to_dict())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+
 @app.route('/api/template/<template_name>', methods=['GET'])
 def load_template(template_name):
     template = template_manager.load_template(f"{template_name}.json")
@@ -333,15 +456,19 @@ def run_agent_chef():
             # This could be part of your UnslothTrainer or a separate utility
             apply_custom_chat_template(custom_chat_template)
 
-        result = run(
-            mode='custom',
-            seed_file=seed_file,
-            sample_rate=data.get('sampleRate', 100),
-            paraphrases_per_sample=data.get('paraphrasesPerSample', 1),
-            column_types=data.get('columnTypes', {}),
-            use_all_samples=data.get('useAllSamples', True),
-            custom_prompts=data.get('customPrompts', {})
-        )
+        if shutdown_event.is_set():
+            return jsonify({'error': 'Server is shutting down'}), 503
+
+        with track_job():
+            result = run(
+                mode='custom',
+                seed_file=seed_file,
+                sample_rate=data.get('sampleRate', 100),
+                paraphrases_per_sample=data.get('paraphrasesPerSample', 1),
+                column_types=data.get('columnTypes', {}),
+                use_all_samples=data.get('useAllSamples', True),
+                custom_prompts=data.get('customPrompts', {})
+            )
 
         if 'error' in result:
             print(f"{Fore.RED}Error: {result['error']}{Style.RESET_ALL}")
@@ -366,15 +493,19 @@ def generate_synthetic():
     ollama_model = data['ollama_model']
     system_prompt = data['system_prompt']
     
+    if shutdown_event.is_set():
+        return jsonify({'error': 'Server is shutting down'}), 503
+
     try:
         initialize(ollama_model)
-        result = run(
-            mode='custom',
-            seed_file=seed_parquet,
-            sample_rate=100,
-            paraphrases_per_sample=num_samples,
-            custom_prompts={'system': system_prompt}
-        )
+        with track_job():
+            result = run(
+                mode='custom',
+                seed_file=seed_parquet,
+                sample_rate=100,
+                paraphrases_per_sample=num_samples,
+                custom_prompts={'system': system_prompt}
+            )
         
         if 'error' in result:
             return jsonify({'error': result['error']}), 400
@@ -399,13 +530,9 @@ def convert_to_json():
         if not os.path.exists(file_path):
             return jsonify({'error': 'File not found'}), 404
 
-        # Use the content from the request if available, otherwise read from file
-        if not content:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-
-        # Use the Dataset_Manager to parse the content to JSON
-        df, json_file, parquet_file = dataset_manager.parse_text_to_parquet(content, template_name, os.path.splitext(filename)[0])
+        # Use the content from the request if available, otherwise stream it from the file
+        _, json_file, parquet_file = dataset_manager.parse_text_to_parquet(
+            content or None, template_name, os.path.splitext(filename)[0], source_file=file_path)
         
         return jsonify({
             'message': 'JSON and Parquet files created successfully',
@@ -416,6 +543,143 @@ def convert_to_json():
         logging.exception(f"Error converting to JSON: {str(e)}")
         return jsonify({'error': str(e)}), 400
 
+@app.route('/api/batch_ingest', methods=['POST'])
+def batch_ingest():
+    data = request.json
+    files = data.get('files')
+    pattern = data.get('pattern')
+    template_name = data.get('template')
+    mode = data.get('mode', 'combined')
+    output_name = data.get('output_name')
+
+    if not template_name or not (files or pattern):
+        return jsonify({'error': 'A template and a list of files or a glob pattern are required'}), 400
+    if mode not in ('combined', 'per_file'):
+        return jsonify({'error': f"Invalid mode: {mode}"}), 400
+    if shutdown_event.is_set():
+        return jsonify({'error': 'Server is shutting down'}), 503
+
+    try:
+        # Inputs are resolved inside the ingredients folder only
+        txt_files = batch_ingestor.resolve_files(files=files, patterns=[pattern] if pattern else None, root_dir=input_dir)
+        if not txt_files:
+            return jsonify({'error': 'No matching files found'}), 404
+
+        combined_file = None
+        if mode == 'combined':
+            output_name = os.path.basename(output_name or f"batch_ingest_{int(time.time())}")
+            combined_file = os.path.join(input_dir, f"{os.path.splitext(output_name)[0]}.parquet")
+
+        with track_job():
+            report = batch_ingestor.ingest(txt_files, template_name, input_dir, combined_file=combined_file,
+                                           source_column=data.get('source_column'))
+        file_catalog.invalidate('ingredient_files')
+
+        # Report paths relative to the ingredients folder
+        for result in report['files']:
+            result['file'] = os.path.relpath(result['file'], input_dir)
+            if result['output']:
+                result['output'] = os.path.basename(result['output'])
+        if combined_file:
+            report['combined_file'] = os.path.basename(combined_file)
+        return jsonify(report)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logging.exception(f"Error in batch ingestion: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/latex/segments/<path:filename>', methods=['GET'])
+def get_latex_segments(filename):
+    kinds = request.args.get('kinds')
+    offset = request.args.get('offset', 0, type=int)
+    limit = request.args.get('limit', type=int)
+    include_text = request.args.get('text', '1') != '0'
+
+    try:
+        file_path = batch_ingestor.resolve_files(files=[filename], root_dir=latex_library_dir)
+        if not file_path:
+            return jsonify({"error": f"File not found: {filename}"}), 404
+        index = latex_segmenter.get_index(file_path[0])
+        segments = index['segments']
+        if kinds:
+            wanted = set(kinds.split(','))
+            segments = [segment for segment in segments if segment['kind'] in wanted]
+        total = len(segments)
+        segments = segments[offset:offset + limit if limit is not None else None]
+        if not include_text:
+            segments = [{key: value for key, value in segment.items() if key not in ('text', 'proof')} for segment in segments]
+        return response_encoder.json_response({
+            "file": index['file'],
+            "sha256": index['sha256'],
+            "counts": index['counts'],
+            "total": total,
+            "segments": segments
+        })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logging.exception(f"Error segmenting LaTeX file: {str(e)}")
+        return jsonify({"error": f"Error segmenting LaTeX file: {str(e)}"}), 500
+
+@app.route('/api/arxiv/fetch', methods=['POST'])
+def fetch_arxiv_sources():
+    data = request.json
+    ids = data.get('ids') or []
+    if isinstance(ids, str):
+        ids = [part for part in re.split(r'[\s,]+', ids) if part]
+    if not ids:
+        return jsonify({'error': 'A list of arXiv IDs or URLs is required'}), 400
+    if shutdown_event.is_set():
+        return jsonify({'error': 'Server is shutting down'}), 503
+
+    try:
+        with track_job():
+            results = arxiv_downloader.fetch_many(ids, refresh=bool(data.get('refresh')))
+        file_catalog.invalidate('latex_files')
+        for result in results:
+            result.pop('path', None)
+        return jsonify({
+            'results': results,
+            'failed': sum(1 for result in results if result['status'] == 'error')
+        })
+    except Exception as e:
+        logging.exception(f"Error fetching arXiv sources: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/latex/seeds', methods=['POST'])
+def build_latex_seeds():
+    data = request.json
+    files = data.get('files')
+    pattern = data.get('pattern')
+    template_name = data.get('template', 'latexMath')
+    kinds = data.get('kinds')
+    output_name = os.path.basename(data.get('output_name') or f"latex_seeds_{int(time.time())}")
+
+    if not (files or pattern):
+        return jsonify({'error': 'A list of files or a glob pattern is required'}), 400
+    if shutdown_event.is_set():
+        return jsonify({'error': 'Server is shutting down'}), 503
+
+    try:
+        tex_files = batch_ingestor.resolve_files(files=files, patterns=[pattern] if pattern else None, root_dir=latex_library_dir)
+        if not tex_files:
+            return jsonify({'error': 'No matching files found'}), 404
+        parquet_file = os.path.join(input_dir, f"{os.path.splitext(output_name)[0]}.parquet")
+        with track_job():
+            rows = latex_segmenter.write_seed_parquet(tex_files, template_name, parquet_file, kinds=kinds)
+        file_catalog.invalidate('ingredient_files')
+        return jsonify({
+            'message': f"Created {rows} seed rows from {len(tex_files)} LaTeX file(s)",
+            'parquet_file': os.path.basename(parquet_file),
+            'rows': rows
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logging.exception(f"Error building LaTeX seeds: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/parse_dataset', methods=['POST'])
 def parse_dataset():
     data = request.json
@@ -437,7 +701,7 @@ def parse_dataset():
         # Save as Parquet
         parquet_filename = f"parsed_dataset_{int(time.time())}.parquet"
         parquet_file = os.path.join(input_dir, parquet_filename)
-        df.to_parquet(parquet_file, engine='pyarrow')
+        dataset_manager.build_parquet(df, parquet_file, schema=template_manager.get_schema(template_name))
 
         return jsonify({
             'success': True,
@@ -460,19 +724,12 @@ def convert_to_json_parquet():
         if not os.path.exists(json_file_path):
             return jsonify({'error': 'JSON file not found'}), 404
 
-        # Read JSON file
-        with open(json_file_path, 'r') as f:
-            json_data = json.load(f)
-
-        # Convert JSON to DataFrame
-        df = pd.DataFrame(json_data)
-
         # Generate base filename without extension
         base_filename = os.path.splitext(filename)[0]
         
-        # Save as Parquet
+        # Stream the JSON records into Parquet
         parquet_file = os.path.join(input_dir, f"{base_filename}.parquet")
-        df.to_parquet(parquet_file, engine='pyarrow')
+        dataset_manager.exporter.export_to_file(json_file_path, parquet_file, 'parquet')
         
         return jsonify({
             'message': 'Parquet seed created successfully',
@@ -500,7 +757,7 @@ def slice_parquet():
         else:
             return jsonify({"error": f"File not found: {filename}"}), 404
 
-        df = pd.read_parquet(file_path)
+        df = edit_log.read_dataframe(file_path)
         
         # Ensure columns_to_remove only contains columns that exist in the DataFrame
         columns_to_remove = [col for col in columns_to_remove if col in df.columns]
@@ -537,15 +794,10 @@ def save_parquet_edits():
         else:
             return jsonify({"error": f"File not found: {filename}"}), 404
 
-        df = pd.read_parquet(file_path)
+        # Edits are appended to the dataset's edit log and folded into the parquet on compaction
+        edit_count = edit_log.append(file_path, edits)
 
-        for row_index, row_edits in edits.items():
-            for column, value in row_edits.items():
-                df.at[int(row_index), column] = value
-
-        df.to_parquet(file_path, engine='pyarrow')
-
-        return jsonify({"message": "Edits saved successfully"}), 200
+        return jsonify({"message": "Edits saved successfully", "edit_count": edit_count}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
@@ -567,20 +819,131 @@ def save_parquet_as_new():
         else:
             return jsonify({"error": f"File not found: {filename}"}), 404
 
-        df = pd.read_parquet(file_path)
-
-        for row_index, row_edits in edits.items():
-            for column, value in row_edits.items():
-                df.at[int(row_index), column] = value
-
         new_filename = f"{os.path.splitext(filename)[0]}_edited.parquet"
         new_file_path = os.path.join(edits_dir, new_filename)
-        df.to_parquet(new_file_path, engine='pyarrow')
+        edit_log.copy_with_edits(file_path, new_file_path, edits)
 
         return jsonify({"message": f"Edits saved as new file: {new_filename} in 'edits' directory"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+@app.route('/api/compact_edits', methods=['POST'])
+def compact_edits():
+    data = request.json
+    filename = data.get('filename')
+    background = data.get('background', False)
+
+    if not filename:
+        return jsonify({"error": "Filename is required"}), 400
+
+    try:
+        for dir_path in [input_dir, output_dir, salad_dir, edits_dir]:
+            file_path = os.path.join(dir_path, filename)
+            if os.path.exists(file_path):
+                break
+        else:
+            return jsonify({"error": f"File not found: {filename}"}), 404
+
+        if background:
+            started = edit_log.compact_async(file_path)
+            return jsonify({"message": "Compaction started" if started else "Compaction already running"}), 202
+
+        compacted = edit_log.compact(file_path)
+        return jsonify({"message": f"Compacted {compacted} edits into {filename}", "compacted": compacted}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
     
+@app.route('/api/evaluate', methods=['POST'])
+def evaluate_model():
+    data = request.json
+    filename = data.get('filename')
+    model = data.get('model')
+    target_column = data.get('target_column', 'command')
+    limit = data.get('limit')
+
+    if not filename or not model:
+        return jsonify({"error": "Filename and model are required"}), 400
+    if shutdown_event.is_set():
+        return jsonify({'error': 'Server is shutting down'}), 503
+
+    try:
+        for dir_path in [input_dir, output_dir, salad_dir, edits_dir]:
+            file_path = os.path.join(dir_path, filename)
+            if os.path.exists(file_path):
+                break
+        else:
+            return jsonify({"error": f"File not found: {filename}"}), 404
+
+        # The evaluator streams the parquet itself, so fold in pending cell edits first
+        if edit_log.has_pending(file_path):
+            edit_log.compact(file_path)
+
+        model_name = re.sub(r'[^\w.-]+', '_', model)
+        run_name = f"{os.path.splitext(os.path.basename(filename))[0]}_{model_name}"
+        predictions_file = os.path.join(evaluations_dir, f"{run_name}_predictions.parquet")
+        with track_job():
+            report = model_evaluator.evaluate(file_path, model, output_file=predictions_file, target_column=target_column,
+                                              limit=int(limit) if limit else None)
+        report['output_file'] = os.path.basename(predictions_file)
+        with open(os.path.join(evaluations_dir, f"{run_name}_report.json"), 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        file_catalog.invalidate('evaluation_files')
+        return jsonify(report)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logging.exception(f"Error evaluating model: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/shard_dataset', methods=['POST'])
+def shard_dataset():
+    data = request.json
+    filename = data.get('filename')
+
+    if not filename:
+        return jsonify({"error": "Filename is required"}), 400
+    sizes = {}
+    for key, default in (('rows_per_shard', 100000), ('row_group_size', None)):
+        value = data.get(key)
+        if value is None or value == '':
+            sizes[key] = default
+            continue
+        try:
+            sizes[key] = int(value)
+        except (TypeError, ValueError):
+            sizes[key] = 0
+        if isinstance(value, bool) or sizes[key] <= 0:
+            return jsonify({'error': f"{key} must be a positive integer, got {value!r}"}), 400
+    if shutdown_event.is_set():
+        return jsonify({'error': 'Server is shutting down'}), 503
+
+    try:
+        for dir_path in [input_dir, output_dir, salad_dir, edits_dir]:
+            file_path = os.path.join(dir_path, filename)
+            if os.path.exists(file_path):
+                break
+        else:
+            return jsonify({"error": f"File not found: {filename}"}), 404
+
+        if edit_log.has_pending(file_path):
+            edit_log.compact(file_path)
+
+        output_name = os.path.basename(data.get('output_name') or os.path.splitext(os.path.basename(filename))[0])
+        if output_name in ('', '.', '..'):
+            return jsonify({'error': f"Invalid output_name: {data.get('output_name')!r}"}), 400
+        sharder = DatasetSharder(rows_per_shard=sizes['rows_per_shard'], row_group_size=sizes['row_group_size'])
+        with track_job():
+            manifest = sharder.shard(file_path, os.path.join(shards_dir, output_name), splits=data.get('splits'),
+                                     stratify=data.get('stratify', 'task') or None, seed=int(data.get('seed', 0)))
+        file_catalog.invalidate('shard_folders')
+        manifest['output_name'] = output_name
+        return jsonify(manifest)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logging.exception(f"Error sharding dataset: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/generate_paraphrases', methods=['POST'])
 def generate_paraphrases():
     data = request.json
@@ -607,8 +970,8 @@ def get_ollama_models():
 @app.route('/api/seeds', methods=['GET'])
 def get_seeds():
     try:
-        seed_files = [f for f in os.listdir(input_dir) if f.endswith(('.json', '.parquet'))]
-        seed_files.sort(key=lambda x: os.path.getmtime(os.path.join(input_dir, x)), reverse=True)
+        entries, _ = file_catalog.list('ingredient_files', extensions=('.json', '.parquet'), sort='mtime', reverse=True)
+        seed_files = [entry['name'] for entry in entries]
         
         if not seed_files:
             return jsonify({"seeds": [], "message": "No seed files found"}), 200
@@ -645,8 +1008,8 @@ def combine_files():
         new_filename = '_'.join(base_names)
         
         if file_extension == '.parquet':
-            # Special handling for parquet files
-            dfs = []
+            # Special handling for parquet files: stream them into one file with pending edits applied
+            file_paths = []
             for file in files:
                 file_name = file['name']
                 file_type = file['type']
@@ -657,19 +1020,13 @@ def combine_files():
                     file_path = os.path.join(output_dir, file_name)
                 else:
                     return jsonify({'error': f'Invalid file type: {file_type}'}), 400
-                
-                df = pd.read_parquet(file_path)
-                print(f"{Fore.CYAN}Read file: {file_name}, Shape: {df.shape}{Style.RESET_ALL}")
-                dfs.append(df)
-            
-            combined_df = pd.concat(dfs, ignore_index=True)
-            print(f"{Fore.GREEN}Combined DataFrame Shape: {combined_df.shape}{Style.RESET_ALL}")
+                file_paths.append(file_path)
             
             # Save the combined data
             output_filename = f'{new_filename}.parquet'
             output_file = os.path.join(salad_dir, output_filename)
-            combined_df.to_parquet(output_file, engine='pyarrow')
-            print(f"{Fore.GREEN}Saved combined file: {output_file}{Style.RESET_ALL}")
+            rows = dataset_manager.combine_files(file_paths, output_file, batch_transform=edit_log.overlay_batch)
+            print(f"{Fore.GREEN}Saved combined file: {output_file} ({rows} rows){Style.RESET_ALL}")
         else:
             # Handling for text-based files (txt, json, tex)
             combined_data = []
@@ -741,4 +1098,5 @@ def list_prompt_sets():
     return jsonify(files)
 
 if __name__ == '__main__':
+    # Development server; for multi-user serving use `gunicorn -c gunicorn.conf.py app:app`
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -1,78 +1,298 @@
-import arxiv
-import requests
 import os
-import tarfile
+import re
+import json
+import time
 import gzip
 import shutil
+import tarfile
+import hashlib
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 class ArxivPaperDownloader:
-    def __init__(self, download_dir='papers'):
+    """
+    Fetch arXiv LaTeX sources in bulk.
+
+    Sources are streamed to disk with a bounded thread pool and cached per ID and version under
+    `download_dir/<id>/<version>/` together with a manifest, so asking for the same paper again
+    does not touch the network. Archives are extracted member by member with path, type, count
+    and size checks, and the `.tex` files are copied into `latex_library_dir` when given.
+    """
+
+    NEW_ID = re.compile(r'(\d{4}\.\d{4,5})(v\d+)?')
+    OLD_ID = re.compile(r'([a-z\-]+(?:\.[A-Z]{2})?/\d{7})(v\d+)?')
+
+    def __init__(self, download_dir='papers', latex_library_dir=None, base_url='https://arxiv.org/e-print/',
+                 max_workers=4, request_interval=1.0, timeout=60, max_download_bytes=200 << 20,
+                 max_extract_bytes=500 << 20, max_members=5000):
         self.download_dir = download_dir
-        if not os.path.exists(self.download_dir):
-            os.makedirs(self.download_dir)
+        self.latex_library_dir = latex_library_dir
+        self.base_url = base_url.rstrip('/') + '/'
+        self.max_workers = max_workers
+        self.request_interval = request_interval
+        self.timeout = timeout
+        self.max_download_bytes = max_download_bytes
+        self.max_extract_bytes = max_extract_bytes
+        self.max_members = max_members
+        self.logger = logging.getLogger(__name__)
+        self._session = None
+        self._rate_lock = threading.Lock()
+        self._next_request_at = 0.0
+        self._id_locks = {}
+        self._id_locks_lock = threading.Lock()
+        os.makedirs(self.download_dir, exist_ok=True)
+        if self.latex_library_dir:
+            os.makedirs(self.latex_library_dir, exist_ok=True)
 
     def search_and_download(self, arxiv_url):
         try:
-            # Extract the arXiv ID from the URL
-            arxiv_id = self._extract_arxiv_id(arxiv_url)
-            
-            # Search for the paper using the arXiv ID
+            import arxiv
+
+            # Resolve the current version through the arXiv API, then fetch its source
+            arxiv_id, _ = self.parse_id(arxiv_url)
             search = arxiv.Search(id_list=[arxiv_id])
             paper = next(search.results())
-            
-            # Download the LaTeX source
-            return self._download_latex_source(paper)
+            result = self.fetch(paper.get_short_id())
+            if result['status'] == 'error':
+                return f"Error downloading LaTeX source: {result['error']}"
+            return f"LaTeX source extracted to: {result['path']}"
         except Exception as e:
             return f"Error: {str(e)}"
 
     def _extract_arxiv_id(self, url):
-        # Extract the arXiv ID from the URL
-        parts = url.split('/')
-        return parts[-1]
+        arxiv_id, version = self.parse_id(url)
+        return arxiv_id + (version or '')
+
+    def parse_id(self, value):
+        """
+        Split an arXiv ID or abs/pdf/e-print URL into (id, version), version being e.g. 'v2' or None.
+        """
+        value = value.strip()
+        value = re.sub(r'^(?:arxiv:)', '', value, flags=re.I)
+        value = re.sub(r'\.pdf$', '', value)
+        for pattern in (self.NEW_ID, self.OLD_ID):
+            matches = list(pattern.finditer(value))
+            if matches:
+                match = matches[-1]
+                return match.group(1), match.group(2)
+        raise ValueError(f"Not an arXiv identifier: {value}")
 
-    def _download_latex_source(self, paper):
+    def _cache_dir(self, arxiv_id, version):
+        return os.path.join(self.download_dir, arxiv_id.replace('/', '_'), version or 'latest')
+
+    def _lock_for(self, key):
+        with self._id_locks_lock:
+            return self._id_locks.setdefault(key, threading.Lock())
+
+    @property
+    def session(self):
+        # requests is imported on first download so importing the downloader stays cheap
+        if self._session is None:
+            with self._rate_lock:
+                if self._session is None:
+                    import requests
+                    self._session = requests.Session()
+        return self._session
+
+    def _wait_turn(self):
+        # Space out request starts across all threads to stay polite to the e-print server
+        with self._rate_lock:
+            now = time.monotonic()
+            wait = self._next_request_at - now
+            self._next_request_at = max(now, self._next_request_at) + self.request_interval
+        if wait > 0:
+            time.sleep(wait)
+
+    def fetch(self, value, refresh=False):
+        """
+        Fetch and extract one paper's source, reusing the cache for the same ID and version.
+
+        :return: {'id', 'version', 'status' ('cached', 'downloaded' or 'error'), 'path',
+            'tex_files', 'latex_files', 'error'}
+        """
+        result = {'input': value, 'id': None, 'version': None, 'status': 'error', 'path': None,
+                  'tex_files': [], 'latex_files': [], 'error': None}
         try:
-            # Construct the source URL
-            source_url = f"https://arxiv.org/e-print/{paper.get_short_id()}"
-            
-            # Create a filename for the source
-            filename = f"{paper.get_short_id().split('v')[0]}_source"
-            filepath = os.path.join(self.download_dir, filename)
-            
-            # Download the source file
-            response = requests.get(source_url)
-            response.raise_for_status()
-            
-            # Save the downloaded file
-            with open(filepath, 'wb') as f:
-                f.write(response.content)
-            
-            # Extract the contents
-            if tarfile.is_tarfile(filepath):
-                with tarfile.open(filepath, 'r') as tar:
-                    tar.extractall(path=filepath + '_extracted')
-                os.remove(filepath)
-                return f"LaTeX source extracted to: {filepath}_extracted"
-            elif filepath.endswith('.gz'):
-                with gzip.open(filepath, 'rb') as f_in:
-                    with open(filepath[:-3], 'wb') as f_out:
-                        shutil.copyfileobj(f_in, f_out)
-                os.remove(filepath)
-                return f"LaTeX source extracted to: {filepath[:-3]}"
-            else:
-                return f"Source file downloaded to: {filepath}"
+            arxiv_id, version = self.parse_id(value)
+            result.update(id=arxiv_id, version=version)
+            cache_dir = self._cache_dir(arxiv_id, version)
+            manifest_file = os.path.join(cache_dir, 'manifest.json')
+            with self._lock_for(cache_dir):
+                if not refresh and os.path.exists(manifest_file):
+                    with open(manifest_file, 'r', encoding='utf-8') as f:
+                        manifest = json.load(f)
+                    result['status'] = 'cached'
+                else:
+                    manifest = self._download_and_extract(arxiv_id, version, cache_dir)
+                    result['status'] = 'downloaded'
+            result['path'] = os.path.join(cache_dir, 'source')
+            result['tex_files'] = manifest['tex_files']
+            result['latex_files'] = self._copy_to_library(arxiv_id, version, cache_dir, manifest['tex_files'])
         except Exception as e:
-            return f"Error downloading LaTeX source: {str(e)}"
+            result['status'] = 'error'
+            result['error'] = str(e)
+            self.logger.warning(f"Failed to fetch arXiv source for {value}: {str(e)}")
+        return result
+
+    def fetch_many(self, values, refresh=False):
+        """
+        Fetch many papers with a bounded thread pool; results keep the input order and
+        duplicate IDs are fetched once.
+        """
+        unique = list(dict.fromkeys(value.strip() for value in values if value and value.strip()))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(lambda value: self.fetch(value, refresh=refresh), unique))
+        counts = {}
+        for result in results:
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+        self.logger.info(f"Fetched {len(results)} arXiv sources: {counts}")
+        return results
+
+    def _download_and_extract(self, arxiv_id, version, cache_dir):
+        os.makedirs(cache_dir, exist_ok=True)
+        url = f"{self.base_url}{arxiv_id}{version or ''}"
+        archive_file = os.path.join(cache_dir, 'source.download')
+        part_file = f"{archive_file}.part"
+
+        self._wait_turn()
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with self.session.get(url, stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+                with open(part_file, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=1 << 20):
+                        size += len(chunk)
+                        if size > self.max_download_bytes:
+                            raise ValueError(f"Source for {arxiv_id} exceeds {self.max_download_bytes} bytes")
+                        digest.update(chunk)
+                        f.write(chunk)
+            os.replace(part_file, archive_file)
+        except Exception:
+            if os.path.exists(part_file):
+                os.remove(part_file)
+            raise
+
+        source_dir = os.path.join(cache_dir, 'source')
+        if os.path.exists(source_dir):
+            shutil.rmtree(source_dir)
+        os.makedirs(source_dir)
+        try:
+            files = self._extract(archive_file, source_dir, arxiv_id)
+        except Exception:
+            shutil.rmtree(source_dir, ignore_errors=True)
+            raise
+        finally:
+            os.remove(archive_file)
+
+        manifest = {
+            'id': arxiv_id,
+            'version': version,
+            'url': url,
+            'bytes': size,
+            'sha256': digest.hexdigest(),
+            'files': files,
+            'tex_files': [name for name in files if name.lower().endswith('.tex')],
+            'fetched_at': time.time(),
+        }
+        with open(os.path.join(cache_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+    def _extract(self, archive_file, source_dir, arxiv_id):
+        with open(archive_file, 'rb') as f:
+            magic = f.read(4)
+        if magic.startswith(b'%PDF'):
+            raise ValueError(f"No LaTeX source available for {arxiv_id} (PDF only)")
+
+        if tarfile.is_tarfile(archive_file):
+            return self._extract_tar(archive_file, source_dir)
+
+        # A gzip-compressed single file (usually the .tex itself), or an uncompressed file
+        opener = gzip.open if magic[:2] == b'\x1f\x8b' else open
+        name = f"{arxiv_id.replace('/', '_')}.tex"
+        with opener(archive_file, 'rb') as f_in, open(os.path.join(source_dir, name), 'wb') as f_out:
+            self._copy_limited(f_in, f_out, self.max_extract_bytes)
+        return [name]
+
+    def _extract_tar(self, archive_file, source_dir):
+        root = os.path.realpath(source_dir)
+        files = []
+        total = 0
+        with tarfile.open(archive_file, 'r:*') as tar:
+            for count, member in enumerate(tar, start=1):
+                if count > self.max_members:
+                    raise ValueError(f"Archive has more than {self.max_members} members")
+                if not (member.isfile() or member.isdir()):
+                    self.logger.warning(f"Skipping non-regular archive member: {member.name}")
+                    continue
+                name = member.name.replace('\\', '/')
+                while name.startswith('./'):
+                    name = name[2:]
+                if not name or name.startswith('/') or '..' in name.split('/'):
+                    raise ValueError(f"Unsafe path in archive: {member.name}")
+                target = os.path.realpath(os.path.join(root, name))
+                if not target.startswith(root + os.sep):
+                    raise ValueError(f"Unsafe path in archive: {member.name}")
+                if member.isdir():
+                    os.makedirs(target, exist_ok=True)
+                    continue
+                total += member.size
+                if total > self.max_extract_bytes:
+                    raise ValueError(f"Archive expands beyond {self.max_extract_bytes} bytes")
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with tar.extractfile(member) as f_in, open(target, 'wb') as f_out:
+                    self._copy_limited(f_in, f_out, member.size)
+                files.append(os.path.relpath(target, root).replace(os.sep, '/'))
+        return files
+
+    @staticmethod
+    def _copy_limited(f_in, f_out, limit):
+        copied = 0
+        while True:
+            chunk = f_in.read(1 << 20)
+            if not chunk:
+                return copied
+            copied += len(chunk)
+            if copied > limit:
+                raise ValueError(f"Extracted file exceeds {limit} bytes")
+            f_out.write(chunk)
+
+    def _copy_to_library(self, arxiv_id, version, cache_dir, tex_files):
+        if not self.latex_library_dir:
+            return []
+        prefix = f"{arxiv_id.replace('/', '_')}{version or ''}"
+        copied = []
+        for name in tex_files:
+            source = os.path.join(cache_dir, 'source', name)
+            flat_name = name.replace('/', '__')
+            if not flat_name.startswith(prefix):
+                flat_name = f"{prefix}_{flat_name}"
+            target = os.path.join(self.latex_library_dir, flat_name)
+            if not os.path.exists(target) or os.path.getsize(target) != os.path.getsize(source):
+                shutil.copyfile(source, target)
+            copied.append(flat_name)
+        return copied
+
+def main():
+    parser = argparse.ArgumentParser(description="Download arXiv LaTeX sources into the latex library")
+    parser.add_argument("ids", nargs="+", help="arXiv IDs or abs/pdf URLs (optionally with a version, e.g. 2303.08774v2)")
+    parser.add_argument("--download_dir", default=os.path.join("agent_chef_data", "arxiv_cache"), help="Source cache directory")
+    parser.add_argument("--latex_library", default=os.path.join("agent_chef_data", "latex_library"), help="Where to copy .tex files")
+    parser.add_argument("--base_url", default=os.environ.get("AGENTCHEF_ARXIV_EPRINT_URL", "https://arxiv.org/e-print/"), help="e-print endpoint")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent downloads")
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached sources")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    downloader = ArxivPaperDownloader(args.download_dir, latex_library_dir=args.latex_library, base_url=args.base_url, max_workers=args.workers)
+    results = downloader.fetch_many(args.ids, refresh=args.refresh)
+    for result in results:
+        detail = result['error'] if result['status'] == 'error' else ', '.join(result['latex_files']) or 'no .tex files'
+        print(f"{result['input']}: {result['status']} ({detail})")
+    return 1 if any(result['status'] == 'error' for result in results) else 0
 
-# Usage example
 if __name__ == "__main__":
-    downloader = ArxivPaperDownloader()
-    result = downloader.search_and_download("https://arxiv.org/abs/2303.08774")
-    print(result)
-    
-    
-# from ArxivPaperDownloader import ArxivPaperDownloader
-
-# downloader = ArxivPaperDownloader(download_dir='your_custom_directory')
-# result = downloader.search_and_download("https://arxiv.org/abs/2303.08774")
-# print(result)
\ No newline at end of file
+    raise SystemExit(main())
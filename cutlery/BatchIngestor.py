@@ -0,0 +1,220 @@
+import os
+import glob
+import time
+import json
+import shutil
+import logging
+import argparse
+import multiprocessing
+import tempfile
+import pyarrow as pa
+import pyarrow.parquet as pq
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .IngredientTokenizer import IngredientTokenizer
+from .ParquetRowWriter import ParquetRowWriter
+
+# Malformed-group positions kept per file in the report; the full count is always reported
+MAX_REPORTED_ERRORS = 20
+
+def _ingest_file(txt_file, template_schema, output_file, row_group_size):
+    """
+    Parse one $("...") text file into a parquet file. Runs inside a worker process.
+    """
+    from .DatasetKitchen import DatasetManager
+
+    started = time.time()
+    errors = []
+    result = {'file': txt_file, 'output': output_file, 'rows': 0, 'malformed_groups': 0, 'schema_issues': [], 'error': None}
+    try:
+        tokenizer = IngredientTokenizer()
+        rows = DatasetManager.iter_template_rows(tokenizer.iter_file(txt_file, errors=errors), template_schema.columns)
+        with ParquetRowWriter(output_file, row_group_size=row_group_size, template_schema=template_schema) as writer:
+            writer.write_rows(DatasetManager.iter_multi_turn_rows(rows, template_schema))
+        result['rows'] = writer.rows_written
+        result['schema_issues'] = list(dict.fromkeys(writer.issues))
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+        if os.path.exists(output_file):
+            os.remove(output_file)
+    result['malformed_groups'] = len(errors)
+    result['malformed'] = errors[:MAX_REPORTED_ERRORS]
+    result['seconds'] = round(time.time() - started, 3)
+    return result
+
+class BatchIngestor:
+    """
+    Convert many $("...") ingredient files to parquet in parallel.
+
+    Each file is tokenized and written by a worker process, so throughput scales with cores.
+    Output is either one parquet per input file or a single combined parquet built from the
+    per-file results in input order, plus a per-file report of row counts and failures.
+    Per-file outputs never replace an existing parquet; a `_2`, `_3`, ... suffix is added instead.
+    """
+
+    def __init__(self, template_manager, max_workers=None, row_group_size=10000):
+        self.template_manager = template_manager
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.row_group_size = row_group_size
+        self.logger = logging.getLogger(__name__)
+
+    def resolve_files(self, files=None, patterns=None, root_dir=None):
+        """
+        Expand glob patterns and/or a list of paths (relative to `root_dir` when given) into
+        a de-duplicated, ordered list of existing files.
+        """
+        candidates = []
+        for pattern in patterns or []:
+            full_pattern = os.path.join(root_dir, pattern) if root_dir else pattern
+            candidates.extend(sorted(glob.glob(full_pattern, recursive=True)))
+        for file_path in files or []:
+            candidates.append(os.path.join(root_dir, file_path) if root_dir else file_path)
+
+        resolved, seen = [], set()
+        for file_path in candidates:
+            real_path = os.path.realpath(file_path)
+            if root_dir and not real_path.startswith(os.path.realpath(root_dir) + os.sep):
+                raise ValueError(f"File outside of {root_dir}: {file_path}")
+            if real_path in seen or not os.path.isfile(real_path):
+                continue
+            seen.add(real_path)
+            resolved.append(file_path)
+        return resolved
+
+    def _per_file_outputs(self, files, output_dir):
+        outputs, used = [], set()
+        for file_path in files:
+            stem = os.path.splitext(os.path.basename(file_path))[0]
+            name, counter = f"{stem}.parquet", 1
+            # Never overwrite an existing parquet (e.g. from an earlier ingest of a same-named file)
+            while name in used or os.path.exists(os.path.join(output_dir, name)):
+                counter += 1
+                name = f"{stem}_{counter}.parquet"
+            used.add(name)
+            outputs.append(os.path.join(output_dir, name))
+        return outputs
+
+    def ingest(self, files, template_name, output_dir, combined_file=None, source_column=None):
+        """
+        Ingest `files` with the named template.
+
+        :param files: List of text file paths
+        :param template_name: TemplateManager template used to map groups to columns
+        :param output_dir: Directory for per-file parquets (and the combined file's temp parts)
+        :param combined_file: If set, write a single parquet here instead of per-file outputs
+        :param source_column: Optional column name recording each row's source file in the
+            combined output
+        :return: Report dict with per-file results and totals
+        """
+        template_schema = self.template_manager.get_schema(template_name)
+        os.makedirs(output_dir, exist_ok=True)
+
+        started = time.time()
+        work_dir = tempfile.mkdtemp(prefix='.ingest_', dir=output_dir) if combined_file else None
+        outputs = self._per_file_outputs(files, work_dir or output_dir)
+        results = [None] * len(files)
+        try:
+            # spawn rather than fork: the Flask app's threads and locks must not be copied into workers
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=min(self.max_workers, max(len(files), 1)), mp_context=context) as executor:
+                futures = {
+                    executor.submit(_ingest_file, file_path, template_schema, output_file, self.row_group_size): index
+                    for index, (file_path, output_file) in enumerate(zip(files, outputs))
+                }
+                for future in as_completed(futures):
+                    result = future.result()
+                    results[futures[future]] = result
+                    if result['error']:
+                        self.logger.warning(f"Failed to ingest {result['file']}: {result['error']}")
+
+            if combined_file:
+                self._combine(results, combined_file, source_column)
+                for result in results:
+                    result['output'] = combined_file if not result['error'] else None
+        finally:
+            if work_dir:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+        report = {
+            'template': template_name,
+            'files': results,
+            'total_files': len(results),
+            'failed_files': sum(1 for result in results if result['error']),
+            'total_rows': sum(result['rows'] for result in results),
+            'malformed_groups': sum(result['malformed_groups'] for result in results),
+            'combined_file': combined_file,
+            'seconds': round(time.time() - started, 3),
+        }
+        self.logger.info(f"Ingested {report['total_files'] - report['failed_files']}/{report['total_files']} files, {report['total_rows']} rows in {report['seconds']}s")
+        return report
+
+    def _combine(self, results, combined_file, source_column=None):
+        """
+        Concatenate the per-file parquets in input order, re-chunked into full row groups.
+        """
+        writer = None
+        pending, pending_rows, total = [], 0, 0
+
+        def flush():
+            nonlocal pending, pending_rows
+            if pending:
+                writer.write_table(pa.concat_tables(pending), row_group_size=self.row_group_size)
+            pending, pending_rows = [], 0
+
+        try:
+            for result in results:
+                if result['error'] or not result['rows']:
+                    continue
+                table = pq.read_table(result['output'])
+                if source_column:
+                    table = table.append_column(source_column, pa.array([result['file']] * table.num_rows, type=pa.string()))
+                if writer is None:
+                    writer = pq.ParquetWriter(combined_file, table.schema)
+                elif table.schema != writer.schema:
+                    table = table.cast(writer.schema)
+                pending.append(table)
+                pending_rows += table.num_rows
+                total += table.num_rows
+                if pending_rows >= self.row_group_size:
+                    flush()
+            if writer is None:
+                writer = pq.ParquetWriter(combined_file, pa.schema([]))
+            flush()
+        finally:
+            if writer is not None:
+                writer.close()
+        return total
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert $(\"...\") ingredient text files to parquet in parallel")
+    parser.add_argument("inputs", nargs="+", help="Text files or glob patterns (quote globs to avoid shell expansion)")
+    parser.add_argument("--template", required=True, help="Template name from templates.json")
+    parser.add_argument("--templates_dir", default=os.path.join("agent_chef_data", "ingredients"), help="Directory containing templates.json")
+    parser.add_argument("--output_dir", default=os.path.join("agent_chef_data", "ingredients"), help="Directory for per-file parquet outputs")
+    parser.add_argument("--combined", help="Write one combined parquet to this path instead of per-file outputs")
+    parser.add_argument("--source_column", help="Add a column with each row's source file to the combined output")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--report", help="Write the JSON ingestion report to this path")
+    args = parser.parse_args()
+
+    from .DatasetKitchen import TemplateManager
+
+    logging.basicConfig(level=logging.INFO)
+    ingestor = BatchIngestor(TemplateManager(args.templates_dir), max_workers=args.workers)
+    files = ingestor.resolve_files(
+        files=[entry for entry in args.inputs if not glob.has_magic(entry)],
+        patterns=[entry for entry in args.inputs if glob.has_magic(entry)]
+    )
+
+    report = ingestor.ingest(files, args.template, args.output_dir, combined_file=args.combined, source_column=args.source_column)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    for result in report['files']:
+        status = f"ERROR {result['error']}" if result['error'] else f"{result['rows']} rows"
+        print(f"{result['file']}: {status}")
+    print(f"{report['total_files'] - report['failed_files']}/{report['total_files']} files, {report['total_rows']} rows in {report['seconds']}s")
+    return 1 if report['failed_files'] else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,448 @@
+import os
+import re
+import csv
+import json
+import time
+import shutil
+import logging
+import argparse
+import multiprocessing
+import tempfile
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from .TemplateSchema import TemplateSchema
+except ImportError:
+    from TemplateSchema import TemplateSchema
+
+def _is_text(value_type):
+    return pa.types.is_string(value_type) or pa.types.is_large_string(value_type)
+
+def _is_numeric(value_type):
+    return pa.types.is_integer(value_type) or pa.types.is_floating(value_type)
+
+def _replace_rows(values, mask, transform):
+    """
+    Run `transform` on the rows where `mask` is set only and put the results back in place,
+    so a low-probability operator costs in proportion to the rows it changes.
+    """
+    if isinstance(mask, pa.ChunkedArray):
+        mask = mask.combine_chunks()
+    changed = transform(values.filter(mask))
+    if isinstance(changed, pa.ChunkedArray):
+        changed = changed.combine_chunks()
+    return pc.replace_with_mask(values, mask, changed)
+
+class AugmentationOperator:
+    """
+    Base class for vectorized, non-LLM augmentations applied to a whole Arrow table at once.
+
+    Subclasses set `name` and implement `transform(column, rng)`, returning the augmented
+    column; only rows picked with `probability` take the augmented value. `columns=None`
+    selects the default columns for the operator's type (text columns skip the dictionary
+    encoded label columns such as `task` and `command`).
+    """
+
+    name = None
+
+    def __init__(self, columns=None, probability=1.0):
+        self.columns = list(columns) if columns else None
+        self.probability = float(probability)
+
+    def select_columns(self, schema):
+        if self.columns is not None:
+            return [column for column in self.columns if column in schema.names]
+        return [field.name for field in schema if _is_text(field.type) and field.name not in TemplateSchema.DICTIONARY_COLUMNS]
+
+    def _mask(self, num_rows, rng):
+        return pa.array(rng.random(num_rows) < self.probability, type=pa.bool_())
+
+    def apply(self, table, rng):
+        for column in self.select_columns(table.schema):
+            index = table.schema.get_field_index(column)
+            original = table.column(index)
+            if self.probability < 1.0:
+                augmented = _replace_rows(original, self._mask(table.num_rows, rng), lambda values: self.transform(values, rng))
+            else:
+                augmented = self.transform(original, rng)
+            table = table.set_column(index, table.schema.field(index), augmented)
+        return table
+
+    def transform(self, column, rng):
+        raise NotImplementedError
+
+    def to_dict(self):
+        config = {key: value for key, value in vars(self).items() if not key.startswith('_')}
+        return {'op': self.name, **config}
+
+class CaseOperator(AugmentationOperator):
+    name = 'case'
+    KERNELS = {'lower': pc.utf8_lower, 'upper': pc.utf8_upper, 'capitalize': pc.utf8_capitalize, 'title': pc.utf8_title}
+
+    def __init__(self, mode='lower', columns=None, probability=0.1):
+        super().__init__(columns, probability)
+        if mode not in self.KERNELS:
+            raise ValueError(f"Unknown case mode '{mode}', expected one of {sorted(self.KERNELS)}")
+        self.mode = mode
+
+    def transform(self, column, rng):
+        return self.KERNELS[self.mode](column)
+
+class WhitespaceOperator(AugmentationOperator):
+    """
+    Collapse runs of whitespace to one space and trim both ends.
+    """
+    name = 'whitespace'
+
+    def __init__(self, columns=None, probability=1.0):
+        super().__init__(columns, probability)
+
+    def transform(self, column, rng):
+        # Most rows are already tidy: only rewrite those with runs, tabs/newlines or edge whitespace
+        untidy = pc.fill_null(pc.match_substring_regex(column, r'\s\s|^\s|\s$|[^\S ]'), False)
+        return _replace_rows(column, untidy, lambda rows: pc.binary_join(pc.utf8_split_whitespace(pc.utf8_trim_whitespace(rows)), ' '))
+
+class PunctuationOperator(AugmentationOperator):
+    """
+    `toggle_period` drops trailing sentence punctuation where present and adds a period where
+    not; `strip` only drops it; `remove` deletes all punctuation except the `/`, `-` and `_`
+    used in commands.
+    """
+    name = 'punctuation'
+    MODES = ('toggle_period', 'strip', 'remove')
+
+    def __init__(self, mode='toggle_period', columns=None, probability=0.3):
+        super().__init__(columns, probability)
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown punctuation mode '{mode}', expected one of {list(self.MODES)}")
+        self.mode = mode
+
+    def transform(self, column, rng):
+        stripped = pc.replace_substring_regex(column, r'[.!?]+\s*$', '')
+        if self.mode == 'strip':
+            return stripped
+        if self.mode == 'remove':
+            # RE2's \w is ASCII-only; spell out letters, marks and digits so accented words survive
+            return pc.replace_substring_regex(column, r'[^\p{L}\p{M}\p{N}_\s/\-]+', '')
+        ends_with_punctuation = pc.match_substring_regex(column, r'[.!?]\s*$')
+        return pc.if_else(ends_with_punctuation, stripped, pc.binary_join_element_wise(column, '.', ''))
+
+class SynonymOperator(AugmentationOperator):
+    """
+    Replace whole words with a synonym from a local table: a dict, or a JSON file mapping a
+    word to a list of alternatives, or a CSV file with the word followed by its alternatives
+    on each line. Each selected row gets a randomly chosen alternative per word.
+    """
+    name = 'synonyms'
+
+    def __init__(self, table, columns=None, probability=0.5):
+        super().__init__(columns, probability)
+        self.table = table
+        self._synonyms = self.load_table(table)
+
+    @staticmethod
+    def load_table(table):
+        if isinstance(table, dict):
+            entries = table
+        elif str(table).endswith('.json'):
+            with open(table, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        else:
+            with open(table, 'r', encoding='utf-8', newline='') as f:
+                entries = {row[0]: row[1:] for row in csv.reader(f) if len(row) > 1}
+        synonyms = {}
+        for word, alternatives in entries.items():
+            alternatives = [alternatives] if isinstance(alternatives, str) else list(alternatives)
+            alternatives = [str(alternative) for alternative in alternatives if alternative and alternative != word]
+            if word and alternatives:
+                synonyms[str(word)] = alternatives
+        return synonyms
+
+    def apply(self, table, rng):
+        # The per-row choice already decides which rows change, so the base class mask is not used
+        for column in self.select_columns(table.schema):
+            index = table.schema.get_field_index(column)
+            values = table.column(index)
+            for word, alternatives in self._synonyms.items():
+                pattern = rf'(?i)\b{re.escape(word)}\b'
+                present = pc.fill_null(pc.match_substring_regex(values, pattern), False)
+                if not pc.any(present).as_py():
+                    continue
+                picked = rng.random(table.num_rows) < self.probability
+                choice = rng.integers(0, len(alternatives), table.num_rows)
+                for alternative_index, alternative in enumerate(alternatives):
+                    mask = pc.and_(pa.array(picked & (choice == alternative_index)), present)
+                    if not pc.any(mask).as_py():
+                        continue
+                    replacement = alternative.replace('\\', '\\\\')
+                    values = _replace_rows(values, mask, lambda rows: pc.replace_substring_regex(rows, pattern, replacement))
+            table = table.set_column(index, table.schema.field(index), values)
+        return table
+
+    def to_dict(self):
+        return {'op': self.name, 'table': self.table, 'columns': self.columns, 'probability': self.probability}
+
+class ShuffleFieldsOperator(AugmentationOperator):
+    """
+    Permute the values of each group of same-typed columns within a row, e.g. the
+    `agent_one`/`agent_two` turns of multi-turn templates such as duo_swarm.
+    """
+    name = 'shuffle_fields'
+
+    def __init__(self, groups, probability=0.5):
+        super().__init__(None, probability)
+        self.groups = [list(group) for group in groups]
+
+    def apply(self, table, rng):
+        num_rows = table.num_rows
+        for group in self.groups:
+            group = [column for column in group if column in table.schema.names]
+            if len(group) < 2 or not num_rows:
+                continue
+            types = {table.schema.field(column).type for column in group}
+            if len(types) > 1:
+                raise ValueError(f"Cannot shuffle columns of different types: {group}")
+
+            permutations = np.tile(np.arange(len(group)), (num_rows, 1))
+            picked = rng.random(num_rows) < self.probability
+            permutations[picked] = rng.permuted(permutations[picked], axis=1)
+            # Take from the columns laid end to end: value of column k for row i is at k * num_rows + i
+            stacked = pa.chunked_array([chunk for column in group for chunk in table.column(column).chunks], type=types.pop())
+            rows = np.arange(num_rows)
+            shuffled = [stacked.take(pa.array(permutations[:, position] * num_rows + rows)) for position in range(len(group))]
+            for column, values in zip(group, shuffled):
+                index = table.schema.get_field_index(column)
+                table = table.set_column(index, table.schema.field(index), values)
+        return table
+
+    def to_dict(self):
+        return {'op': self.name, 'groups': self.groups, 'probability': self.probability}
+
+class NumericJitterOperator(AugmentationOperator):
+    """
+    Scale numeric values by a random factor in [1 - scale, 1 + scale]; integers are rounded
+    back to their type.
+    """
+    name = 'numeric_jitter'
+
+    def __init__(self, scale=0.1, columns=None, probability=1.0):
+        super().__init__(columns, probability)
+        self.scale = float(scale)
+
+    def select_columns(self, schema):
+        if self.columns is not None:
+            return [column for column in self.columns if column in schema.names]
+        return [field.name for field in schema if _is_numeric(field.type)]
+
+    def transform(self, column, rng):
+        factors = pa.array(1 + rng.uniform(-self.scale, self.scale, len(column)))
+        jittered = pc.multiply(pc.cast(column, pa.float64()), factors)
+        if pa.types.is_integer(column.type):
+            return pc.cast(pc.round(jittered), column.type, safe=False)
+        return pc.cast(jittered, column.type)
+
+OPERATORS = {operator.name: operator for operator in (CaseOperator, WhitespaceOperator, PunctuationOperator, SynonymOperator, ShuffleFieldsOperator, NumericJitterOperator)}
+
+class AugmentationPipeline:
+    """
+    An ordered list of operators applied with a seeded RNG.
+
+    Every batch gets its own generator derived from the seed and the batch key (row group and
+    batch number in the file, plus the copy number), so the output is the same however the
+    work is split across processes.
+    """
+
+    def __init__(self, operators, seed=0):
+        self.operators = list(operators)
+        self.seed = seed
+
+    @classmethod
+    def from_config(cls, config, seed=0):
+        """
+        :param config: List of operator dicts like {"op": "case", "mode": "lower", "probability": 0.2}
+        """
+        operators = []
+        for entry in config:
+            entry = dict(entry)
+            name = entry.pop('op', None)
+            if name not in OPERATORS:
+                raise ValueError(f"Unknown augmentation operator '{name}', expected one of {sorted(OPERATORS)}")
+            operators.append(OPERATORS[name](**entry))
+        return cls(operators, seed=seed)
+
+    def to_config(self):
+        return [operator.to_dict() for operator in self.operators]
+
+    def apply(self, data, key=(0,)):
+        table = pa.Table.from_batches([data]) if isinstance(data, pa.RecordBatch) else data
+        rng = np.random.default_rng([self.seed, *key])
+        for operator in self.operators:
+            table = operator.apply(table, rng)
+        return table
+
+def _augment_row_groups(input_file, row_groups, part_file, pipeline, batch_size, copies, include_original):
+    """
+    Augment a range of row groups into one part file. Runs inside a worker process.
+    """
+    parquet_file = pq.ParquetFile(input_file)
+    writer = None
+    rows = 0
+    try:
+        for row_group in row_groups:
+            table = parquet_file.read_row_group(row_group)
+            for batch_index, batch in enumerate(table.to_batches(max_chunksize=batch_size)):
+                outputs = [pa.Table.from_batches([batch])] if include_original else []
+                outputs.extend(pipeline.apply(batch, key=(row_group, batch_index, copy)) for copy in range(copies))
+                for output in outputs:
+                    if writer is None:
+                        writer = pq.ParquetWriter(part_file, output.schema)
+                    writer.write_table(output.cast(writer.schema))
+                    rows += output.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+class DatasetAugmentor:
+    """
+    Apply augmentation pipelines to tables in memory or to parquet files with a process pool.
+
+    Files are split into contiguous ranges of row groups, each worker writes its range to a
+    part file, and the parts are concatenated in order into full row groups of the output.
+    """
+
+    def __init__(self, max_workers=None, batch_size=8192, row_group_size=10000):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.row_group_size = row_group_size
+        self.logger = logging.getLogger(__name__)
+
+    def default_pipeline(self, schema, seed=0, synonyms=None):
+        """
+        Whitespace clean-up, punctuation toggling, synonym substitution (when a table is given),
+        occasional lowercasing, turn shuffles for multi-turn rows and numeric jitter.
+        """
+        operators = [WhitespaceOperator(), PunctuationOperator()]
+        if synonyms:
+            operators.append(SynonymOperator(synonyms))
+        operators.append(CaseOperator('lower'))
+        if {'agent_one', 'agent_two'} <= set(schema.names):
+            operators.append(ShuffleFieldsOperator([['agent_one', 'agent_two']]))
+        operators.append(NumericJitterOperator())
+        return AugmentationPipeline(operators, seed=seed)
+
+    def augment_table(self, table, pipeline, copies=1, include_original=False):
+        outputs = [table] if include_original else []
+        for copy in range(copies):
+            outputs.extend(pipeline.apply(batch, key=(0, index, copy))
+                           for index, batch in enumerate(table.to_batches(max_chunksize=self.batch_size)))
+        if not outputs:
+            return table.schema.empty_table()
+        return pa.concat_tables([output.cast(outputs[0].schema) for output in outputs])
+
+    def _plan(self, num_row_groups):
+        tasks = min(self.max_workers * 4, num_row_groups)
+        bounds = np.linspace(0, num_row_groups, tasks + 1).astype(int) if tasks else []
+        return [list(range(start, stop)) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+    def augment_file(self, input_file, output_file, pipeline, copies=1, include_original=False):
+        """
+        Augment a parquet file into `output_file`.
+
+        :param copies: Augmented variants written per input row
+        :param include_original: Also write the unchanged rows (before their variants, per batch)
+        :return: Report dict with row counts and timing
+        """
+        started = time.time()
+        parquet_file = pq.ParquetFile(input_file)
+        plan = self._plan(parquet_file.num_row_groups)
+        output_dir = os.path.dirname(os.path.abspath(output_file))
+        work_dir = tempfile.mkdtemp(prefix='.augment_', dir=output_dir)
+        part_files = [os.path.join(work_dir, f"part-{index:05d}.parquet") for index in range(len(plan))]
+        try:
+            if len(plan) > 1 and self.max_workers > 1:
+                # spawn rather than fork: the Flask app's threads and locks must not be copied into workers
+                context = multiprocessing.get_context('spawn')
+                with ProcessPoolExecutor(max_workers=min(self.max_workers, len(plan)), mp_context=context) as executor:
+                    list(executor.map(_augment_row_groups, [input_file] * len(plan), plan, part_files, [pipeline] * len(plan),
+                                      [self.batch_size] * len(plan), [copies] * len(plan), [include_original] * len(plan)))
+            else:
+                for row_groups, part_file in zip(plan, part_files):
+                    _augment_row_groups(input_file, row_groups, part_file, pipeline, self.batch_size, copies, include_original)
+            rows = self._combine([part for part in part_files if os.path.exists(part)], output_file, parquet_file.schema_arrow)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        report = {
+            'input_file': input_file,
+            'output_file': output_file,
+            'input_rows': parquet_file.metadata.num_rows,
+            'output_rows': rows,
+            'pipeline': pipeline.to_config(),
+            'seed': pipeline.seed,
+            'seconds': round(time.time() - started, 3),
+        }
+        self.logger.info(f"Augmented {report['input_rows']} rows into {rows} rows in {report['seconds']}s")
+        return report
+
+    def _combine(self, part_files, output_file, schema):
+        writer = None
+        pending, pending_rows, total = [], 0, 0
+        try:
+            for part_file in part_files:
+                for batch in pq.ParquetFile(part_file).iter_batches(batch_size=self.row_group_size):
+                    if writer is None:
+                        writer = pq.ParquetWriter(output_file, batch.schema)
+                    pending.append(pa.Table.from_batches([batch]).cast(writer.schema))
+                    pending_rows += batch.num_rows
+                    total += batch.num_rows
+                    if pending_rows >= self.row_group_size:
+                        writer.write_table(pa.concat_tables(pending), row_group_size=self.row_group_size)
+                        pending, pending_rows = [], 0
+            if writer is None:
+                writer = pq.ParquetWriter(output_file, schema)
+            if pending:
+                writer.write_table(pa.concat_tables(pending), row_group_size=self.row_group_size)
+        finally:
+            if writer is not None:
+                writer.close()
+        return total
+
+def main():
+    parser = argparse.ArgumentParser(description="Augment a parquet dataset with vectorized, non-LLM operators")
+    parser.add_argument("input", help="Input parquet")
+    parser.add_argument("output", help="Output parquet")
+    parser.add_argument("--pipeline", help=f"JSON file or inline JSON list of operators ({', '.join(OPERATORS)}); default: the standard pipeline")
+    parser.add_argument("--synonyms", help="Synonym table (.json or .csv) for the default pipeline")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--copies", type=int, default=1, help="Augmented variants per row")
+    parser.add_argument("--include_original", action="store_true", help="Also keep the original rows")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per core)")
+    parser.add_argument("--report", help="Write a JSON report here")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    augmentor = DatasetAugmentor(max_workers=args.workers)
+    if args.pipeline:
+        if os.path.exists(args.pipeline):
+            with open(args.pipeline, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        else:
+            config = json.loads(args.pipeline)
+        pipeline = AugmentationPipeline.from_config(config, seed=args.seed)
+    else:
+        pipeline = augmentor.default_pipeline(pq.read_schema(args.input), seed=args.seed, synonyms=args.synonyms)
+
+    report = augmentor.augment_file(args.input, args.output, pipeline, copies=args.copies, include_original=args.include_original)
+    print(f"Wrote {report['output_rows']} rows to {args.output} in {report['seconds']}s")
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,240 @@
+import json
+import logging
+import itertools
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from .IngredientTokenizer import IngredientTokenizer
+from .DatasetReader import DatasetReader
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class _ChunkSink:
+    """
+    Write-only file object that hands back whatever was written since the last drain().
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def writable(self):
+        return True
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+class DatasetExporter:
+    """
+    Export datasets as CSV, JSONL, parquet or $("...") text byte streams.
+
+    Parquet sources are read lazily with `ParquetFile.iter_batches`, other formats through the
+    `DatasetReader` registry, so only one record batch is held in memory at a time whether the
+    bytes go to an HTTP response or a file on disk.
+    """
+
+    FORMATS = {
+        'csv': ('text/csv', '.csv'),
+        'jsonl': ('application/x-ndjson', '.jsonl'),
+        'parquet': ('application/vnd.apache.parquet', '.parquet'),
+        'txt': ('text/plain', '.txt'),
+    }
+
+    def __init__(self, batch_size=8192, parquet_compression='zstd', reader=None):
+        self.batch_size = batch_size
+        self.parquet_compression = parquet_compression
+        self.reader = reader or DatasetReader(batch_size)
+        self.logger = logging.getLogger(__name__)
+
+    def iter_batches(self, file_path, columns=None, batch_transform=None, start=None, stop=None):
+        """
+        Yield record batches from a parquet file, or any other format the reader registry knows.
+
+        :param batch_transform: Optional callable(batch, row_offset) returning a batch,
+            e.g. to overlay pending edits
+        :param start: First row to yield; row groups entirely before it are not read
+        :param stop: Row to stop before
+        """
+        if self.reader.sniff(file_path).name != 'parquet':
+            yield from self._iter_stream_batches(file_path, columns, batch_transform, start, stop)
+            return
+
+        parquet_file = pq.ParquetFile(file_path)
+        if columns is None:
+            columns = [name for name in parquet_file.schema_arrow.names if not name.startswith('__index_level_')]
+        metadata = parquet_file.metadata
+        start = 0 if start is None else max(0, start)
+        stop = metadata.num_rows if stop is None else min(stop, metadata.num_rows)
+
+        # Only decode the row groups overlapping [start, stop)
+        row_groups = []
+        offset = first_row = 0
+        for index in range(metadata.num_row_groups):
+            group_rows = metadata.row_group(index).num_rows
+            if offset + group_rows > start and offset < stop:
+                if not row_groups:
+                    first_row = offset
+                row_groups.append(index)
+            offset += group_rows
+        if not row_groups or start >= stop:
+            return
+
+        offset = first_row
+        for batch in parquet_file.iter_batches(batch_size=self.batch_size, row_groups=row_groups, columns=columns):
+            batch_start = offset
+            offset += batch.num_rows
+            if offset <= start:
+                continue
+            if batch_start < start or offset > stop:
+                batch = batch.slice(max(start - batch_start, 0), min(offset, stop) - max(batch_start, start))
+                batch_start = max(batch_start, start)
+            if batch_transform is not None:
+                batch = batch_transform(batch, batch_start)
+            yield batch
+            if offset >= stop:
+                return
+
+    def _iter_stream_batches(self, file_path, columns, batch_transform, start, stop):
+        # Without row group metadata, rows before `start` are read and skipped
+        start = 0 if start is None else max(0, start)
+        if stop is not None and start >= stop:
+            return
+        offset = 0
+        for batch in self.reader.iter_batches(file_path, batch_size=self.batch_size, columns=columns):
+            batch_start = offset
+            offset += batch.num_rows
+            if offset <= start:
+                continue
+            if batch_start < start or (stop is not None and offset > stop):
+                end = offset if stop is None else min(offset, stop)
+                batch = batch.slice(max(start - batch_start, 0), end - max(batch_start, start))
+                batch_start = max(batch_start, start)
+            if batch_transform is not None:
+                batch = batch_transform(batch, batch_start)
+            yield batch
+            if stop is not None and offset >= stop:
+                return
+
+    def _dumps(self, record):
+        if orjson is not None:
+            return orjson.dumps(record, default=str, option=orjson.OPT_SERIALIZE_NUMPY)
+        return json.dumps(record, default=str, ensure_ascii=False).encode('utf-8')
+
+    def iter_csv(self, batches):
+        first = True
+        for batch in batches:
+            sink = pa.BufferOutputStream()
+            pacsv.write_csv(batch, sink, write_options=pacsv.WriteOptions(include_header=first))
+            first = False
+            yield sink.getvalue().to_pybytes()
+
+    def iter_jsonl(self, batches):
+        for batch in batches:
+            yield b''.join(self._dumps(record) + b'\n' for record in batch.to_pylist())
+
+    def iter_parquet(self, batches, schema=None):
+        sink = _ChunkSink()
+        writer = None
+        try:
+            for batch in batches:
+                if writer is None:
+                    writer = pq.ParquetWriter(sink, batch.schema, compression=self.parquet_compression)
+                elif batch.schema != writer.schema:
+                    batch = batch.cast(writer.schema)
+                # One row group per batch keeps the writer's buffered state to a single batch
+                writer.write_batch(batch, row_group_size=batch.num_rows)
+                data = sink.drain()
+                if data:
+                    yield data
+            if writer is None and schema is not None:
+                # Empty source: still emit a valid parquet file with the schema
+                writer = pq.ParquetWriter(sink, schema, compression=self.parquet_compression)
+        finally:
+            if writer is not None:
+                writer.close()
+        data = sink.drain()
+        if data:
+            yield data
+
+    def _txt_cells(self, column):
+        if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+            values = column.to_pylist()
+        else:
+            values = [None if value is None else str(value) for value in column.to_pylist()]
+        return ['$("")' if value is None else IngredientTokenizer.format_group(value) for value in values]
+
+    def iter_txt(self, batches):
+        """
+        Yield the ingredient text format: one `$("value")` line per cell, rows separated by a
+        blank line. Values are escaped so they tokenize back unchanged; nulls become `$("")`.
+        """
+        first = True
+        for batch in batches:
+            if batch.num_rows == 0:
+                continue
+            # Format column by column, then interleave the cells row by row
+            cells = [self._txt_cells(column) for column in batch.columns]
+            rows = ['\n'.join(row) + '\n' for row in zip(*cells)]
+            text = '\n'.join(rows)
+            yield (text if first else '\n' + text).encode('utf-8')
+            first = False
+
+    def iter_export(self, file_path, output_format, columns=None, batch_transform=None, start=None, stop=None):
+        """
+        Return an iterator over the bytes of `file_path` converted to `output_format` ('csv', 'jsonl',
+        'parquet' or 'txt'), optionally restricted to rows [start, stop).
+
+        The columns are checked and the first chunk is produced before returning, so a bad request
+        or unreadable file raises here rather than partway through a streamed response.
+        """
+        if output_format not in self.FORMATS:
+            raise ValueError(f"Unsupported export format: {output_format}")
+        is_parquet = self.reader.sniff(file_path).name == 'parquet'
+        schema = None
+        if is_parquet:
+            source_schema = pq.ParquetFile(file_path).schema_arrow
+            if columns:
+                missing = [name for name in columns if name not in source_schema.names]
+                if missing:
+                    raise ValueError(f"Columns not found: {', '.join(missing)}")
+            names = columns or [name for name in source_schema.names if not name.startswith('__index_level_')]
+            schema = pa.schema([source_schema.field(name) for name in names])
+
+        batches = self.iter_batches(file_path, columns=columns, batch_transform=batch_transform, start=start, stop=stop)
+        if output_format == 'parquet':
+            chunks = self.iter_parquet(batches, schema)
+        else:
+            chunks = getattr(self, f"iter_{output_format}")(batches)
+        first = next(chunks, None)
+        if first is None:
+            return iter(())
+        return itertools.chain([first], chunks)
+
+    def export_to_file(self, file_path, output_file, output_format, columns=None, batch_transform=None, start=None, stop=None):
+        with open(output_file, 'wb', buffering=1 << 20) as f:
+            chunks = self.iter_export(file_path, output_format, columns=columns, batch_transform=batch_transform, start=start, stop=stop)
+            for chunk in chunks:
+                f.write(chunk)
+        self.logger.info(f"Exported {file_path} to {output_file}")
+        return output_file
@@ -1,11 +1,20 @@
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from tqdm import tqdm
-from datasets import load_dataset
-import numpy as np
 from colorama import Fore, Style, init
-import os, json, urllib.parse, tarfile, gzip, shutil, requests, random, re, time, logging, glob
+import os, json, shutil, random, re, time, logging, glob, threading
+from filelock import FileLock
 from typing import List, Dict, Any, Optional
 import logging
+from .DatasetAugmentor import DatasetAugmentor, AugmentationPipeline
+from .DatasetExporter import DatasetExporter
+from .DatasetReader import DatasetReader, _merge_types
+from .IngredientTokenizer import IngredientTokenizer
+from .ParquetRowWriter import ParquetRowWriter
+from .TemplateSchema import TemplateSchema
+from .DocumentChunker import DocumentChunker
+from concurrent.futures import ThreadPoolExecutor
 
 # from langchain.document_loaders import (
 #     WebBaseLoader, PyPDFLoader, TextLoader, Docx2txtLoader,
@@ -20,6 +29,32 @@ import logging
 
 #TODO allow arxiv & hugging face links in ui for digestion and dataset construction
 
+def _combined_schema(schemas):
+    """
+    One schema for several files: dictionary columns are decoded to their values, and a column
+    whose types cannot be promoted (int in one file, string in another) becomes string.
+    """
+    types = {}
+    for schema in schemas:
+        for field in schema:
+            value_type = field.type.value_type if pa.types.is_dictionary(field.type) else field.type
+            types[field.name] = _merge_types(types[field.name], value_type) if field.name in types else value_type
+    return pa.schema([(name, pa.string() if pa.types.is_null(value_type) else value_type) for name, value_type in types.items()])
+
+def _cast_column(column, value_type):
+    if column.type == value_type:
+        return column
+    if pa.types.is_dictionary(column.type):
+        column = column.dictionary_decode()
+    try:
+        return column.cast(value_type)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+        if not pa.types.is_string(value_type):
+            raise
+        # Nested values have no string cast; store them as JSON text
+        return pa.array([None if value is None else json.dumps(value, ensure_ascii=False, default=str)
+                         for value in column.to_pylist()], pa.string())
+
 class PromptManager:
     def __init__(self):
         self.prompts = {
@@ -244,12 +279,19 @@ class EnhancedDatasetGenerator:
         
         return verified_text
 
-    def generate_enhanced_synthetic_data(self, seed_data, num_samples, column_types, custom_prompts):
+    def generate_enhanced_synthetic_data(self, seed_data, num_samples, column_types, custom_prompts, stop_event=None):
         synthetic_data = []
         samples_per_original = num_samples // len(seed_data)
         remaining_samples = num_samples % len(seed_data)
 
         for _, original_row in tqdm(seed_data.iterrows(), total=len(seed_data), desc="Generating synthetic data"):
+            if stop_event is not None and stop_event.is_set():
+                # The server is shutting down: hand back what has been generated so far
+                logging.warning(f"Generation stopped early after {len(synthetic_data)} rows")
+                result_df = pd.DataFrame(synthetic_data)
+                result_df.attrs['partial'] = True
+                return result_df
+
             samples_for_this_row = samples_per_original + (1 if remaining_samples > 0 else 0)
             remaining_samples = max(0, remaining_samples - 1)
 
@@ -301,8 +343,54 @@ class DatasetManager:
         self.output_dir = output_dir
         self.file_handler = FileHandler(input_dir, output_dir)  # Add this line
         self.enhanced_generator = EnhancedDatasetGenerator(ollama_interface, template_manager)
+        self.reader = DatasetReader()
+        self.exporter = DatasetExporter(reader=self.reader)
+        self.augmentor = DatasetAugmentor()
+        self.tokenizer = IngredientTokenizer()
+
+    def read_parquet_page(self, file_path, start, stop):
+        """
+        Read rows [start, stop) of a parquet file as an Arrow table, decoding only the row
+        groups that overlap the page.
+
+        :return: Tuple of (table, total_rows)
+        """
+        parquet_file = pq.ParquetFile(file_path)
+        metadata = parquet_file.metadata
+        total_rows = metadata.num_rows
+        start = max(0, min(start, total_rows))
+        stop = max(start, min(stop, total_rows))
+        columns = [name for name in parquet_file.schema_arrow.names if not name.startswith('__index_level_')]
+
+        row_groups = []
+        first_row = None
+        offset = 0
+        for i in range(metadata.num_row_groups):
+            group_rows = metadata.row_group(i).num_rows
+            if offset < stop and offset + group_rows > start:
+                row_groups.append(i)
+                if first_row is None:
+                    first_row = offset
+            offset += group_rows
+
+        if not row_groups:
+            return parquet_file.schema_arrow.empty_table().select(columns), total_rows
+
+        table = parquet_file.read_row_groups(row_groups, columns=columns)
+        return table.slice(start - first_row, stop - start), total_rows
+
+    def parquet_to_txt(self, parquet_file, columns=None, start=None, stop=None):
+        """
+        Write a parquet file from the input directory back out in the $("...") text format.
+
+        Record batches are streamed column-wise into a buffered file, so memory stays at one
+        batch regardless of the dataset size.
 
-    def parquet_to_txt(self, parquet_file):
+        :param parquet_file: Parquet file name relative to the input directory
+        :param columns: Optional list of columns to emit, in order
+        :param start: Optional first row to emit
+        :param stop: Optional row to stop before
+        """
         try:
             logging.info(f"Converting parquet file to text: {parquet_file}")
             
@@ -310,19 +398,10 @@ class DatasetManager:
             if not os.path.exists(parquet_file_path):
                 raise FileNotFoundError(f"Parquet file not found: {parquet_file_path}")
             
-            df = pd.read_parquet(parquet_file_path)
-            
-            txt_content = []
-            for _, row in df.iterrows():
-                for column in df.columns:
-                    txt_content.append(f'$("{row[column]}")')
-                txt_content.append('')  # Add an empty line between rows
-            
             txt_filename = f"{os.path.splitext(parquet_file)[0]}.txt"
             txt_file_path = os.path.join(self.input_dir, txt_filename)
             
-            with open(txt_file_path, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(txt_content))
+            self.exporter.export_to_file(parquet_file_path, txt_file_path, 'txt', columns=columns, start=start, stop=stop)
             
             logging.info(f"Created text file: {txt_filename}")
             return txt_filename
@@ -338,11 +417,7 @@ class DatasetManager:
             if not os.path.exists(seed_file_path):
                 raise FileNotFoundError(f"Seed file not found: {seed_file_path}")
             
-            with open(seed_file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            pattern = re.compile(r'\$\("((?:(?!\$\(").|\n)*?)"\)', re.DOTALL)
-            matches = pattern.findall(content)
+            matches = list(self.tokenizer.iter_file(seed_file_path))
             
             paraphrased_content = []
             for _ in range(num_samples):
@@ -367,7 +442,7 @@ class DatasetManager:
             logging.exception(f"Error in generate_paraphrased_txt: {str(e)}")
             raise
 
-    def txt_to_parquet(self, txt_file):
+    def txt_to_parquet(self, txt_file, template_name='commander'):
         try:
             logging.info(f"Converting text file to parquet: {txt_file}")
             
@@ -375,23 +450,21 @@ class DatasetManager:
             if not os.path.exists(txt_file_path):
                 raise FileNotFoundError(f"Text file not found: {txt_file_path}")
             
-            with open(txt_file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            pattern = re.compile(r'\$\("((?:(?!\$\(").|\n)*?)"\)', re.DOTALL)
-            matches = pattern.findall(content)
-            
+            template_schema = self.template_manager.get_schema(template_name)
+            num_columns = len(template_schema.columns)
             data = []
-            for i in range(0, len(matches), 5):  # Assuming 5 columns based on your template
-                row = matches[i:i+5]
-                if len(row) == 5:
+            row = []
+            for group in self.tokenizer.iter_file(txt_file_path):
+                row.append(group)
+                if len(row) == num_columns:
                     data.append(row)
+                    row = []
             
-            df = pd.DataFrame(data, columns=['task', 'instruction', 'input', 'output', 'command'])
+            df = pd.DataFrame(data, columns=template_schema.columns)
             
             parquet_filename = f"{os.path.splitext(txt_file)[0]}.parquet"
             parquet_path = os.path.join(self.output_dir, parquet_filename)
-            df.to_parquet(parquet_path, engine='pyarrow')
+            self.build_parquet(df, parquet_path, schema=template_schema)
             
             logging.info(f"Created parquet file: {parquet_filename}")
             return parquet_filename
@@ -399,47 +472,85 @@ class DatasetManager:
             logging.exception(f"Error in txt_to_parquet: {str(e)}")
             raise
         
-    def read_data(self, file_path):
-        """Read data from parquet, json, or txt file."""
-        base_name, ext = os.path.splitext(file_path)
-        
-        if ext.lower() == '.parquet':
-            try:
-                return pd.read_parquet(file_path)
-            except Exception as e:
-                self.logger.warning(f"Failed to read parquet file: {e}")
-        
-        # Try JSON
-        json_path = f"{base_name}.json"
-        if os.path.exists(json_path):
-            try:
-                with open(json_path, 'r') as f:
-                    data = json.load(f)
-                return pd.DataFrame(data)
-            except Exception as e:
-                self.logger.warning(f"Failed to read JSON file: {e}")
-        
-        # Try TXT
-        txt_path = f"{base_name}.txt"
-        if os.path.exists(txt_path):
-            try:
-                with open(txt_path, 'r') as f:
-                    lines = f.readlines()
-                # Assuming tab-separated values, adjust if needed
-                data = [line.strip().split('\t') for line in lines]
-                return pd.DataFrame(data[1:], columns=data[0])
-            except Exception as e:
-                self.logger.warning(f"Failed to read TXT file: {e}")
-        
-        raise ValueError(f"Unable to read data from {file_path} or its JSON/TXT alternatives")
-    
-    def generate_synthetic_data(self, seed_file, sample_rate, paraphrases_per_sample, column_types, use_all_samples=True, custom_prompts={}, **kwargs):
+    def iter_batches(self, file_path, batch_size=None, columns=None, template_name=None):
+        """
+        Stream a parquet, JSON array, JSONL, CSV/TSV or $("...") text file as Arrow record batches.
+
+        :param template_name: For $("...") text, the template whose columns the groups fill
+        """
+        if template_name and columns is None and self.reader.sniff(file_path).name == 'txt':
+            columns = self.template_manager.get_schema(template_name).columns
+        return self.reader.iter_batches(file_path, batch_size=batch_size, columns=columns)
+
+    def read_data(self, file_path, columns=None, template_name=None):
+        """
+        Read a dataset file of any supported format into a DataFrame.
+
+        The format is detected from the content. If `file_path` does not exist, a file with the
+        same base name and another supported extension is used instead; read errors are raised.
+        """
+        if not os.path.exists(file_path):
+            base_name = os.path.splitext(file_path)[0]
+            for ext in ('.parquet', '.json', '.jsonl', '.csv', '.tsv', '.txt'):
+                if os.path.exists(base_name + ext):
+                    self.logger.info(f"{file_path} not found, reading {base_name + ext}")
+                    file_path = base_name + ext
+                    break
+            else:
+                raise FileNotFoundError(f"No data file found for {file_path}")
+
+        batches = list(self.iter_batches(file_path, columns=columns, template_name=template_name))
+        if not batches:
+            return pd.DataFrame(columns=columns)
+        return pa.concat_tables([pa.Table.from_batches([batch]) for batch in batches], promote_options='default').to_pandas()
+
+    def combine_files(self, file_paths, output_file, batch_size=None, batch_transform=None):
+        """
+        Stream several dataset files, in any supported formats, into one parquet file.
+
+        Schemas are unified up front (see `_combined_schema`); columns missing from a file are
+        filled with nulls.
+
+        :param batch_transform: Optional callable(file_path, batch, row_offset) returning a batch,
+            e.g. to overlay pending edits
+
+        :return: Number of rows written
+        """
+        schemas = []
+        for file_path in file_paths:
+            if self.reader.sniff(file_path).name == 'parquet':
+                schema = pq.read_schema(file_path)
+                schemas.append(pa.schema([field for field in schema if not field.name.startswith('__index_level_')]))
+            else:
+                first = next(iter(self.reader.iter_batches(file_path, batch_size=batch_size)), None)
+                if first is not None:
+                    schemas.append(first.schema)
+        if not schemas:
+            raise ValueError("No rows to combine")
+        schema = _combined_schema(schemas)
+
+        rows = 0
+        with pq.ParquetWriter(output_file, schema) as writer:
+            for file_path in file_paths:
+                offset = 0
+                for batch in self.reader.iter_batches(file_path, batch_size=batch_size):
+                    if batch_transform is not None:
+                        batch = batch_transform(file_path, batch, offset)
+                    offset += batch.num_rows
+                    arrays = [_cast_column(batch.column(field.name), field.type) if field.name in batch.schema.names
+                              else pa.nulls(batch.num_rows, type=field.type) for field in schema]
+                    writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+                    rows += batch.num_rows
+                self.logger.info(f"Combined {file_path}")
+        return rows
+
+    def generate_synthetic_data(self, seed_file, sample_rate, paraphrases_per_sample, column_types, use_all_samples=True, custom_prompts={}, stop_event=None, **kwargs):
         try:
             seed_file_path = os.path.join(self.input_dir, seed_file)
             if not os.path.exists(seed_file_path):
                 raise FileNotFoundError(f"Seed file not found: {seed_file_path}")
             
-            seed_data = pd.read_parquet(seed_file_path)
+            seed_data = self.read_data(seed_file_path)
             
             num_samples = len(seed_data) if use_all_samples else int(len(seed_data) * (sample_rate / 100))
             
@@ -458,7 +569,8 @@ class DatasetManager:
                 samples_to_use, 
                 total_samples, 
                 column_types, 
-                custom_prompts
+                custom_prompts,
+                stop_event=stop_event
             )
             
             print(f"{Fore.GREEN}Synthetic data generation completed successfully{Style.RESET_ALL}")
@@ -492,23 +604,23 @@ class DatasetManager:
     def combine_parquets(self, seed_parquet_dir):
         try:
             # Get all parquet files in the directory
-            parquet_files = glob.glob(os.path.join(seed_parquet_dir, '*.parquet'))
+            parquet_files = sorted(glob.glob(os.path.join(seed_parquet_dir, '*.parquet')))
             logging.info(f"Found {len(parquet_files)} parquet files in {seed_parquet_dir}")
             
-            # Read and combine all parquet files
-            dfs = []
+            # Stream every readable file into one table
+            tables = []
             for file in parquet_files:
                 try:
-                    df = pd.read_parquet(file)
-                    dfs.append(df)
-                    logging.info(f"Successfully read {file}. Shape: {df.shape}")
+                    table = self.reader.read_table(file)
+                    tables.append(table)
+                    logging.info(f"Successfully read {file}. Shape: {table.shape}")
                 except Exception as e:
                     logging.error(f"Error reading {file}: {str(e)}")
             
-            if not dfs:
+            if not tables:
                 raise ValueError("No valid parquet files found")
             
-            combined_df = pd.concat(dfs, ignore_index=True)
+            combined_df = pa.concat_tables(tables, promote_options='permissive').to_pandas()
             logging.info(f"Successfully combined parquet files. Final shape: {combined_df.shape}")
             
             return combined_df
@@ -516,21 +628,26 @@ class DatasetManager:
             logging.exception(f"Error in combine_parquets: {str(e)}")
             return pd.DataFrame()
 
-    def augment_data(self, seed_parquet):
+    def augment_data(self, seed_parquet, pipeline=None, seed=0, copies=1):
+        """
+        Augment a seed parquet with vectorized operators (see DatasetAugmentor).
+
+        :param pipeline: AugmentationPipeline or list of operator configs; defaults to the
+            standard pipeline, with synonyms from `synonyms.json` in the ingredients folder if present
+        :return: DataFrame of `copies` augmented variants of every row
+        """
         try:
             logging.info(f"Attempting to augment data from: {seed_parquet}")
-            # Load the seed data
-            seed_data = pd.read_parquet(seed_parquet)
-            logging.info(f"Successfully read seed parquet. Shape: {seed_data.shape}")
-            
-            # Implement data augmentation logic
-            augmented_data = seed_data.copy()
-            for column in seed_data.columns:
-                if seed_data[column].dtype == 'object':  # Text data
-                    augmented_data[column] = augmented_data[column].apply(lambda x: f"{x} (augmented)")
-                elif seed_data[column].dtype in ['int64', 'float64']:  # Numeric data
-                    augmented_data[column] = augmented_data[column] * (1 + np.random.uniform(-0.1, 0.1, len(seed_data)))
-            
+            seed_data = self.reader.read_table(seed_parquet)
+            logging.info(f"Successfully read seed parquet. Rows: {seed_data.num_rows}")
+
+            if pipeline is None:
+                synonyms = os.path.join(self.input_dir, 'synonyms.json')
+                pipeline = self.augmentor.default_pipeline(seed_data.schema, seed=seed, synonyms=synonyms if os.path.exists(synonyms) else None)
+            elif not isinstance(pipeline, AugmentationPipeline):
+                pipeline = AugmentationPipeline.from_config(pipeline, seed=seed)
+            augmented_data = self.augmentor.augment_table(seed_data, pipeline, copies=copies).to_pandas()
+
             logging.info(f"Successfully augmented data. Shape: {augmented_data.shape}")
             return augmented_data
         except Exception as e:
@@ -553,38 +670,6 @@ class DatasetManager:
         paraphrased_text = response['message']['content'].strip()
         return self.clean_paraphrased_text(paraphrased_text)
 
-    def parse_text_to_parquet(self, text_content, template_name, filename):
-        template = self.template_manager.get_template(template_name)
-        if not template:
-            raise ValueError(f"Template '{template_name}' not found")
-
-        self.logger.info(f"Parsing text content using template: {template_name}")
-        
-        # Save the original text content to a txt file
-        txt_file = os.path.join(self.input_dir, f"{filename}.txt")
-        with open(txt_file, 'w', encoding='utf-8') as f:
-            f.write(text_content)
-        self.logger.info(f"Saved original text content to {txt_file}")
-
-        # Parse the content using manual formatting
-        parsed_data = self.parse_manual_formatting(text_content, template)
-
-        # Create DataFrame from parsed data
-        df = pd.DataFrame(parsed_data)
-        self.logger.info(f"Created DataFrame with shape: {df.shape}")
-
-        # Save as JSON
-        json_file = os.path.join(self.input_dir, f"{filename}.json")
-        df.to_json(json_file, orient='records', indent=2)
-        self.logger.info(f"Saved JSON file: {json_file}")
-
-        # Save as Parquet
-        parquet_file = os.path.join(self.input_dir, f"{filename}.parquet")
-        df.to_parquet(parquet_file, engine='pyarrow')
-        self.logger.info(f"Saved Parquet file: {parquet_file}")
-
-        return df, json_file, parquet_file
-    
     def fallback_json_structure(self, text_content, template):
         # Split the content into lines
         lines = text_content.split('\n')
@@ -604,12 +689,14 @@ class DatasetManager:
         template = self.template_manager.get_template(template_name)
         if not template:
             raise ValueError(f"Template '{template_name}' not found")
+        # Parse into the unique column names so repeated fields don't collide
+        columns = self.template_manager.get_schema(template_name).columns
 
         if mode == 'manual':
-            parsed_data = self.parse_manual_formatting(content, template)
+            parsed_data = self.parse_manual_formatting(content, columns)
         elif mode == 'automatic':
             formatted_content = self.apply_automatic_formatting(content, template)
-            parsed_data = self.parse_manual_formatting(formatted_content, template)
+            parsed_data = self.parse_manual_formatting(formatted_content, columns)
         else:
             raise ValueError(f"Invalid parsing mode: {mode}")
 
@@ -618,11 +705,9 @@ class DatasetManager:
     
     def parse_manual_formatting(self, content, template):
         parsed_data = {column: [] for column in template}
-        pattern = re.compile(r'\$\("((?:(?!\$\(").|\n)*?)"\)', re.DOTALL)
-        matches = pattern.findall(content)
 
         num_columns = len(template)
-        for i, match in enumerate(matches):
+        for i, match in enumerate(self.tokenizer.iter_text(content)):
             column_index = i % num_columns
             column = template[column_index]
             # Remove any leading/trailing whitespace, but preserve internal formatting
@@ -635,7 +720,45 @@ class DatasetManager:
 
         return parsed_data
     
-    def apply_automatic_formatting(self, content, template):
+    def apply_automatic_formatting(self, content, template, chunk_chars=6000, overlap_chars=600, max_workers=4):
+        """
+        Have the model wrap `content` in $("...") groups following the template's categories.
+
+        Documents longer than `chunk_chars` are split on paragraph/section boundaries into
+        overlapping windows that are formatted concurrently. Each window's output is cut into
+        complete records (one group per category, in order); records repeated across the overlap
+        are dropped and the rest are re-joined in document order, so column cycling is kept.
+
+        :return: The formatted $("...") text
+        """
+        windows = DocumentChunker(chunk_chars, overlap_chars).windows(content)
+        if len(windows) <= 1:
+            return self._format_window(content, template)
+
+        self.logger.info(f"Formatting {len(windows)} windows with up to {max_workers} concurrent requests")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            outputs = list(executor.map(lambda window: self._format_window(window, template), windows))
+
+        records, seen = [], set()
+        num_fields = len(template)
+        for index, output in enumerate(outputs):
+            groups = list(self.tokenizer.iter_text(output))
+            complete = len(groups) - len(groups) % num_fields
+            if complete < len(groups):
+                self.logger.warning(f"Window {index + 1}/{len(windows)}: dropping {len(groups) - complete} group(s) of an incomplete record")
+            if not groups:
+                self.logger.warning(f"Window {index + 1}/{len(windows)}: no $(\"...\") groups in the model output")
+            for start in range(0, complete, num_fields):
+                record = groups[start:start + num_fields]
+                key = tuple(' '.join(value.split()).lower() for value in record)
+                if key in seen:
+                    continue
+                seen.add(key)
+                records.append(record)
+
+        return '\n\n'.join('\n'.join(IngredientTokenizer.format_group(value.strip()) for value in record) for record in records)
+
+    def _format_window(self, content, template):
         prompt = f"""Format the following text using $("") symbols according to these categories: {', '.join(template)}. 
         Follow these rules strictly:
         1. Each $("") group should correspond to a single category in order, cycling through the categories as needed.
@@ -643,6 +766,7 @@ class DatasetManager:
         3. Do not split content within $("") groups.
         4. Ignore any content that is not enclosed in $("") delimiters.
         5. Preserve all formatting, including newlines, within the $("") groups.
+        6. Always start with the first category and emit complete records of {len(template)} groups.
 
         Text to format:
         {content}"""
@@ -654,15 +778,24 @@ class DatasetManager:
 
         return response['message']['content']
     
+    def log_schema_issues(self, template_name, issues):
+        for issue in dict.fromkeys(issues):
+            self.logger.warning(f"Template '{template_name}' validation: {issue}")
+
     def build_parquet(self, data, output_file, schema=None):
         """
         Build a Parquet file from the given data.
         
         :param data: DataFrame or dictionary of data to save as Parquet
         :param output_file: Path to save the Parquet file
-        :param schema: Optional PyArrow schema to use
+        :param schema: Optional PyArrow schema or TemplateSchema to use
         """
-        if isinstance(data, pd.DataFrame):
+        if isinstance(schema, TemplateSchema):
+            df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            self.log_schema_issues(schema.name, schema.validate(table))
+            pq.write_table(schema.conform(table), output_file)
+        elif isinstance(data, pd.DataFrame):
             if schema:
                 table = pa.Table.from_pandas(data, schema=schema)
                 pq.write_table(table, output_file)
@@ -687,8 +820,7 @@ class DatasetManager:
         :param parquet_file: Path to the input Parquet file
         :param csv_file: Path to save the output CSV file
         """
-        df = pd.read_parquet(parquet_file)
-        df.to_csv(csv_file, index=False)
+        self.exporter.export_to_file(parquet_file, csv_file, 'csv')
         print(f"CSV file saved to: {csv_file}")
 
     def parquet_to_jsonl(self, parquet_file, jsonl_file):
@@ -698,8 +830,7 @@ class DatasetManager:
         :param parquet_file: Path to the input Parquet file
         :param jsonl_file: Path to save the output JSONL file
         """
-        df = pd.read_parquet(parquet_file)
-        df.to_json(jsonl_file, orient='records', lines=True)
+        self.exporter.export_to_file(parquet_file, jsonl_file, 'jsonl')
         print(f"JSONL file saved to: {jsonl_file}")
 
     def convert_parquet(self, parquet_file, output_formats=['csv', 'jsonl']):
@@ -719,6 +850,57 @@ class DatasetManager:
             jsonl_file = f"{base_name}.jsonl"
             self.parquet_to_jsonl(parquet_file, jsonl_file)
 
+    @staticmethod
+    def iter_template_rows(groups, template):
+        """
+        Group a stream of $("...") contents into one dict per template row.
+
+        A trailing partial row is padded with empty strings for the missing fields.
+        """
+        num_fields = len(template)
+        row = []
+        for group in groups:
+            row.append(group)
+            if len(row) == num_fields:
+                yield row
+                row = []
+        if row:
+            yield row + [""] * (num_fields - len(row))
+
+    @staticmethod
+    def iter_multi_turn_rows(rows, template_schema):
+        """
+        Turn raw template rows into parquet records keyed by the template's unique column
+        names, pairing consecutive rows for multi-turn templates like "duo_swarm".
+        """
+        columns = template_schema.columns
+        if not template_schema.is_multi_turn:
+            for row in rows:
+                yield dict(zip(columns, row))
+            return
+
+        # Each structured turn needs two rows; a lone trailing row is dropped. The turns use
+        # the second input/output pair of each row.
+        pending = None
+        for row in rows:
+            row = dict(zip(columns, row))
+            if pending is None:
+                pending = row
+                continue
+            yield {
+                "agent_one": {
+                    "instruction": pending["agent_instruct_one"],
+                    "input": pending["input_2"],
+                    "output": pending["output_2"]
+                },
+                "agent_two": {
+                    "instruction": row["agent_instruct_two"],
+                    "input": row["input_2"],
+                    "output": row["output_2"]
+                }
+            }
+            pending = None
+
     def txt_to_multi_turn_parquet(self, txt_file, output_file, template_name):
         """
         Convert a formatted txt file to a multi-turn parquet file based on the template.
@@ -727,103 +909,78 @@ class DatasetManager:
         :param output_file: Path to save the output parquet file
         :param template_name: Name of the template to use for parsing
         """
-        template = self.template_manager.get_template(template_name)
-        if not template:
-            raise ValueError(f"Template '{template_name}' not found")
+        template_schema = self.template_manager.get_schema(template_name)
 
-        with open(txt_file, 'r', encoding='utf-8') as f:
-            content = f.read()
+        rows = self.iter_template_rows(self.tokenizer.iter_file(txt_file), template_schema.columns)
+        with ParquetRowWriter(output_file, template_schema=template_schema) as writer:
+            writer.write_rows(self.iter_multi_turn_rows(rows, template_schema))
+        self.log_schema_issues(template_name, writer.issues)
+        print(f"Multi-turn parquet file saved to: {output_file}")
 
-        pattern = re.compile(r'\$\("((?:(?!\$\(").|\n)*?)"\)', re.DOTALL)
-        matches = pattern.findall(content)
+    def parse_text_to_parquet(self, text_content, template_name, filename, source_file=None, row_group_size=10000):
+        """
+        Parse $("...") formatted text into `{filename}.json` and a multi-turn `{filename}.parquet`
+        in a single pass.
 
-        data = []
-        num_fields = len(template)
-        
-        for i in range(0, len(matches), num_fields):
-            turn = {}
-            for j, field in enumerate(template):
-                if i + j < len(matches):
-                    turn[field] = matches[i + j]
-                else:
-                    turn[field] = ""  # Handle cases where there might be missing fields
-            data.append(turn)
-
-        # For multi-turn formats like "duo_swarm", we need to structure the data differently
-        if template_name == "duo_swarm":
-            structured_data = []
-            for i in range(0, len(data), 2):
-                if i + 1 < len(data):
-                    structured_turn = {
-                        "agent_one": {
-                            "instruction": data[i]["agent_instruct_one"],
-                            "input": data[i]["input"],
-                            "output": data[i]["output"]
-                        },
-                        "agent_two": {
-                            "instruction": data[i+1]["agent_instruct_two"],
-                            "input": data[i+1]["input"],
-                            "output": data[i+1]["output"]
-                        }
-                    }
-                    structured_data.append(structured_turn)
-            data = structured_data
-
-        df = pd.DataFrame(data)
-        df.to_parquet(output_file, engine='pyarrow')
-        print(f"Multi-turn parquet file saved to: {output_file}")
+        Groups are tokenized as they are read and each completed row goes to both outputs at
+        once: the JSON array is written row by row on this thread while parquet row groups are
+        encoded and written on a background thread behind a bounded queue.
 
-    def parse_text_to_parquet(self, text_content, template_name, filename):
-        template = self.template_manager.get_template(template_name)
-        if not template:
-            raise ValueError(f"Template '{template_name}' not found")
+        :param text_content: Formatted text, or None to stream it from `source_file`
+        :param source_file: Path of the text on disk; used instead of `text_content` when given
+            without it, and not rewritten if it already is `{filename}.txt`
+        :return: (row_count, json_file, parquet_file)
+        """
+        template_schema = self.template_manager.get_schema(template_name)
+        columns = template_schema.columns
+        if text_content is None and source_file is None:
+            raise ValueError("Either text_content or source_file is required")
 
         self.logger.info(f"Parsing text content using template: {template_name}")
-        
-        # Save the original text content to a txt file
-        txt_file = os.path.join(self.input_dir, f"{filename}.txt")
-        with open(txt_file, 'w', encoding='utf-8') as f:
-            f.write(text_content)
-        self.logger.info(f"Saved original text content to {txt_file}")
 
-        # Parse the content using manual formatting
-        parsed_data = self.parse_manual_formatting(text_content, template)
-
-        # Create DataFrame from parsed data
-        df = pd.DataFrame(parsed_data)
-        self.logger.info(f"Created DataFrame with shape: {df.shape}")
+        # Keep a copy of the original text next to the outputs
+        txt_file = os.path.join(self.input_dir, f"{filename}.txt")
+        if text_content is not None:
+            with open(txt_file, 'w', encoding='utf-8') as f:
+                f.write(text_content)
+            self.logger.info(f"Saved original text content to {txt_file}")
+            groups = self.tokenizer.iter_text(text_content)
+        else:
+            if not os.path.exists(txt_file) or not os.path.samefile(source_file, txt_file):
+                shutil.copyfile(source_file, txt_file)
+                self.logger.info(f"Saved original text content to {txt_file}")
+            groups = self.tokenizer.iter_file(source_file)
 
-        # Save as JSON
         json_file = os.path.join(self.input_dir, f"{filename}.json")
-        df.to_json(json_file, orient='records', indent=2)
-        self.logger.info(f"Saved JSON file: {json_file}")
-
-        # Save as multi-turn Parquet
         parquet_file = os.path.join(self.input_dir, f"{filename}.parquet")
-        self.txt_to_multi_turn_parquet(txt_file, parquet_file, template_name)
+
+        row_count = 0
+
+        def tee_rows(rows, json_out):
+            # Write the flat JSON record for every row on its way to the parquet writer
+            nonlocal row_count
+            json_out.write('[')
+            for row in rows:
+                record = dict(zip(columns, (value.strip() for value in row)))
+                json_out.write(',\n' if row_count else '\n')
+                json_out.write(json.dumps(record, ensure_ascii=False))
+                row_count += 1
+                yield row
+            json_out.write('\n]\n')
+
+        with open(json_file, 'w', encoding='utf-8', buffering=1 << 20) as json_out:
+            writer = ParquetRowWriter(parquet_file, row_group_size=row_group_size, background=True, template_schema=template_schema)
+            try:
+                rows = tee_rows(self.iter_template_rows(groups, columns), json_out)
+                for record in self.iter_multi_turn_rows(rows, template_schema):
+                    writer.write_row(record)
+            finally:
+                writer.close()
+        self.log_schema_issues(template_name, writer.issues)
+        self.logger.info(f"Saved JSON file: {json_file}")
         self.logger.info(f"Saved multi-turn Parquet file: {parquet_file}")
 
-        return df, json_file, parquet_file
-
-    def convert_parquet(self, parquet_file, output_formats=['csv', 'jsonl']):
-        """
-        Convert a multi-turn parquet file to specified formats.
-        
-        :param parquet_file: Path to the input multi-turn parquet file
-        :param output_formats: List of formats to convert to ('csv', 'jsonl', or both)
-        """
-        df = pd.read_parquet(parquet_file)
-        base_name = os.path.splitext(parquet_file)[0]
-        
-        if 'csv' in output_formats:
-            csv_file = f"{base_name}.csv"
-            df.to_csv(csv_file, index=False)
-            print(f"CSV file saved to: {csv_file}")
-        
-        if 'jsonl' in output_formats:
-            jsonl_file = f"{base_name}.jsonl"
-            df.to_json(jsonl_file, orient='records', lines=True)
-            print(f"JSONL file saved to: {jsonl_file}")
+        return row_count, json_file, parquet_file
 
 class FileHandler:
     def __init__(self, input_dir, output_dir):
@@ -878,34 +1035,91 @@ class FileHandler:
             return None
         
 class TemplateManager:
-    def __init__(self, input_dir):
+    """
+    Registry of dataset templates backed by templates.json.
+
+    Every process keeps its own copy, re-checked against the file at most once per
+    `reload_interval` seconds (a stat call), so templates added by another worker show up
+    without a restart. Writes take a file lock, merge into the latest file contents and
+    replace the file atomically. Compiled schemas are cached per file version.
+    """
+
+    def __init__(self, input_dir, reload_interval=1.0):
         self.input_dir = input_dir
         self.templates_file = os.path.join(input_dir, 'templates.json')
+        self.reload_interval = reload_interval
         self.logger = logging.getLogger(__name__)
         self.logger.info(f"Templates file path: {self.templates_file}")
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(f"{self.templates_file}.lock")
+        self._version = None
+        self._checked_at = 0.0
+        self._schemas = {}
         self.templates = self.load_templates()
 
+    def _file_version(self):
+        # os.replace gives every saved file a new inode, so this changes on every write
+        try:
+            stat = os.stat(self.templates_file)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    @property
+    def version(self):
+        return self._version
+
+    def _read_templates_file(self):
+        version = self._file_version()
+        with open(self.templates_file, 'r') as f:
+            templates = json.load(f)
+        # Ensure all template values are lists
+        for key, value in templates.items():
+            if not isinstance(value, list):
+                templates[key] = list(value) if isinstance(value, (tuple, set)) else [str(value)]
+        return templates, version
+
     def load_templates(self):
         try:
             if os.path.exists(self.templates_file):
-                with open(self.templates_file, 'r') as f:
-                    templates = json.load(f)
+                templates, version = self._read_templates_file()
                 self.logger.info(f"Successfully loaded templates from {self.templates_file}")
             else:
                 self.logger.warning(f"Templates file not found at {self.templates_file}. Creating default templates.")
                 templates = self.create_default_templates()
-                self.save_templates(templates)
-            
-            # Ensure all template values are lists
-            for key, value in templates.items():
-                if not isinstance(value, list):
-                    templates[key] = list(value) if isinstance(value, (tuple, set)) else [str(value)]
-            
+                version = self.save_templates(templates)
+            with self._lock:
+                self._version = version
+                self._checked_at = time.monotonic()
+                self._schemas = {}
             return templates
         except Exception as e:
             self.logger.error(f"Error loading templates: {str(e)}")
             return self.create_default_templates()
 
+    def refresh(self, force=False):
+        """
+        Reload templates.json if another process changed it since it was last read.
+        """
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.reload_interval:
+            return False
+        with self._lock:
+            self._checked_at = now
+            version = self._file_version()
+            if version is None or version == self._version:
+                return False
+            try:
+                templates, version = self._read_templates_file()
+            except (OSError, ValueError) as e:
+                self.logger.error(f"Error reloading templates: {str(e)}")
+                return False
+            self.templates = templates
+            self._version = version
+            self._schemas = {}
+        self.logger.info(f"Reloaded templates from {self.templates_file}")
+        return True
+
     def create_default_templates(self):
         return {
             "chat": ["instruction", "input", "output"],
@@ -934,36 +1148,75 @@ class TemplateManager:
         }
 
     def save_templates(self, templates):
+        """
+        Atomically replace templates.json; returns the new file version.
+        """
         try:
             os.makedirs(os.path.dirname(self.templates_file), exist_ok=True)
-            with open(self.templates_file, 'w') as f:
-                json.dump(templates, f, indent=2)
-            self.logger.info(f"Successfully saved templates to {self.templates_file}")
+            with self._file_lock:
+                return self._write_templates_file(templates)
         except Exception as e:
             self.logger.error(f"Error saving templates: {str(e)}")
 
+    def _write_templates_file(self, templates):
+        tmp_file = f"{self.templates_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(templates, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.templates_file)
+        self.logger.info(f"Successfully saved templates to {self.templates_file}")
+        return self._file_version()
+
     def get_templates(self):
+        self.refresh()
         return self.templates
 
     def create_template(self, template_name, template_fields):
-        if template_name in self.templates:
-            raise ValueError(f"Template '{template_name}' already exists")
-        self.templates[template_name] = template_fields
-        self.save_templates(self.templates)
+        TemplateSchema(template_name, template_fields)  # Reject invalid field definitions up front
+        with self._lock, self._file_lock:
+            # Merge into the latest file contents so concurrent writers don't drop each other's templates
+            if os.path.exists(self.templates_file):
+                templates, _ = self._read_templates_file()
+            else:
+                templates = dict(self.templates)
+            if template_name in templates:
+                raise ValueError(f"Template '{template_name}' already exists")
+            templates[template_name] = template_fields
+            version = self._write_templates_file(templates)
+            self.templates = templates
+            self._version = version
+            self._checked_at = time.monotonic()
+            self._schemas = {}
         return self.templates[template_name]
 
     def get_template(self, template_name):
+        """
+        Return the template's field names in order (typed fields are reduced to their name).
+        """
+        self.refresh()
         template = self.templates.get(template_name)
         if template is None:
             self.logger.warning(f"Template '{template_name}' not found")
-        return template
+            return None
+        return [field['name'] if isinstance(field, dict) else field for field in template]
+
+    def get_schema(self, template_name):
+        """
+        Return the compiled TemplateSchema for a template, building it once per file version.
+        """
+        self.refresh()
+        with self._lock:
+            schema = self._schemas.get(template_name)
+            if schema is None:
+                template = self.templates.get(template_name)
+                if template is None:
+                    raise ValueError(f"Template '{template_name}' not found")
+                schema = self._schemas[template_name] = TemplateSchema(template_name, template)
+        return schema
 
     def add_template(self, template_name, template_fields):
-        if template_name in self.templates:
-            raise ValueError(f"Template '{template_name}' already exists")
-        self.templates[template_name] = template_fields
-        self.save_templates(self.templates)
-        return self.templates[template_name]
+        return self.create_template(template_name, template_fields)
 
 # class DocumentLoader:
 #     def __init__(self, github_access_token=None):
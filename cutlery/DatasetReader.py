@@ -0,0 +1,412 @@
+import os
+import csv
+import json
+import logging
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from .IngredientTokenizer import IngredientTokenizer
+
+class _RecordBatcher:
+    """
+    Collect dict records and emit them as record batches of `batch_size` rows.
+
+    With a `schema` every batch gets the same types; values that do not fit a string column
+    (a number among strings, say) are stored as their JSON text.
+    """
+
+    def __init__(self, batch_size, columns=None, schema=None):
+        self.batch_size = batch_size
+        self.columns = columns
+        self.schema = schema
+        self.records = []
+
+    def add(self, record):
+        self.records.append(record)
+        if len(self.records) >= self.batch_size:
+            return self.flush()
+        return None
+
+    def flush(self):
+        if not self.records:
+            return None
+        records, self.records = self.records, []
+        if self.schema is None:
+            batch = pa.RecordBatch.from_pylist(records)
+        else:
+            try:
+                batch = pa.RecordBatch.from_pylist(records, schema=self.schema)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                batch = pa.RecordBatch.from_pylist(self._stringify(records), schema=self.schema)
+        if self.columns is not None:
+            batch = _select(batch, self.columns)
+        return batch
+
+    def _stringify(self, records):
+        names = [field.name for field in self.schema if pa.types.is_string(field.type)]
+        records = [dict(record) for record in records]
+        for record in records:
+            for name in names:
+                value = record.get(name)
+                if value is not None and not isinstance(value, str):
+                    record[name] = json.dumps(value, ensure_ascii=False)
+        return records
+
+def _merge_types(left, right):
+    if left == right or pa.types.is_null(right):
+        return left
+    if pa.types.is_null(left):
+        return right
+    try:
+        merged = pa.unify_schemas([pa.schema([('value', left)]), pa.schema([('value', right)])], promote_options='permissive')
+    except (pa.ArrowInvalid, pa.ArrowTypeError, NotImplementedError):
+        return pa.string()
+    return merged.field('value').type
+
+def _infer_schema(records, batch_size):
+    """
+    Infer one schema over every record (in chunks of `batch_size`), so types do not change
+    between batches. Fields are ordered by first appearance; a field whose values cannot share
+    an Arrow type, such as ints and strings mixed, falls back to string, and so does a field
+    that is always null.
+    """
+    types = {}
+
+    def observe(chunk):
+        names = {}
+        for record in chunk:
+            names.update(dict.fromkeys(record))
+        for name in names:
+            try:
+                value_type = pa.array([record.get(name) for record in chunk]).type
+            except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+                value_type = pa.string()
+            types[name] = _merge_types(types[name], value_type) if name in types else value_type
+
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= batch_size:
+            observe(chunk)
+            chunk = []
+    if chunk:
+        observe(chunk)
+    return pa.schema([(name, pa.string() if pa.types.is_null(value_type) else value_type) for name, value_type in types.items()])
+
+def _iter_record_batches(open_records, batch_size, columns=None):
+    """
+    Batch the dict records of a file in two passes: `open_records()` is called once to infer
+    the schema and again to build the batches, so memory stays at one batch.
+    """
+    batcher = _RecordBatcher(batch_size, columns, _infer_schema(open_records(), batch_size))
+    for record in open_records():
+        batch = batcher.add(record)
+        if batch is not None:
+            yield batch
+    batch = batcher.flush()
+    if batch is not None:
+        yield batch
+
+def _select(batch, columns):
+    missing = [name for name in columns if name not in batch.schema.names]
+    if missing:
+        raise ValueError(f"Columns not found: {', '.join(missing)}")
+    return batch.select(columns)
+
+def _rebatch(batches, batch_size):
+    """
+    Re-chunk a stream of record batches into batches of exactly `batch_size` rows (the last may be shorter).
+    """
+    pending, pending_rows = [], 0
+    for batch in batches:
+        while batch.num_rows:
+            take = min(batch_size - pending_rows, batch.num_rows)
+            pending.append(batch.slice(0, take))
+            pending_rows += take
+            batch = batch.slice(take)
+            if pending_rows == batch_size:
+                yield _concat(pending)
+                pending, pending_rows = [], 0
+    if pending_rows:
+        yield _concat(pending)
+
+def _concat(batches):
+    if len(batches) == 1:
+        return batches[0]
+    return pa.Table.from_batches(batches).combine_chunks().to_batches()[0]
+
+class ParquetReader:
+    name = 'parquet'
+    extensions = ('.parquet',)
+
+    def sniff(self, head):
+        return head.startswith(b'PAR1')
+
+    def iter_batches(self, file_path, batch_size, columns=None):
+        parquet_file = pq.ParquetFile(file_path)
+        if columns is None:
+            columns = [name for name in parquet_file.schema_arrow.names if not name.startswith('__index_level_')]
+        yield from parquet_file.iter_batches(batch_size=batch_size, columns=columns)
+
+class JsonArrayReader:
+    """
+    Reads a top-level JSON array of objects one element at a time with `JSONDecoder.raw_decode`,
+    so only the current chunk and the element being decoded are held in memory.
+    """
+
+    name = 'json'
+    extensions = ('.json',)
+
+    def __init__(self, chunk_size=1 << 20):
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+
+    def sniff(self, head):
+        return head.lstrip().startswith(b'[')
+
+    def iter_records(self, stream):
+        buffer = ''
+        position = 0
+        eof = False
+        started = False
+        read_size = self.chunk_size
+
+        def fill():
+            nonlocal buffer, position, eof
+            chunk = stream.read(read_size)
+            if not chunk:
+                eof = True
+                return False
+            buffer = buffer[position:] + chunk
+            position = 0
+            return True
+
+        while True:
+            # Skip whitespace and the separators between elements
+            while True:
+                while position < len(buffer) and buffer[position] in ' \t\r\n':
+                    position += 1
+                if position < len(buffer) or not fill():
+                    break
+            if position >= len(buffer):
+                raise ValueError("Unexpected end of JSON array")
+            char = buffer[position]
+            if not started:
+                if char != '[':
+                    raise ValueError("Expected a JSON array")
+                started = True
+                position += 1
+                continue
+            if char == ']':
+                return
+            if char == ',':
+                position += 1
+                continue
+
+            try:
+                value, end = self.decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # Most likely the element continues past the buffer: read more and retry,
+                # growing the read size so a huge element is not re-scanned too often
+                if eof or not fill():
+                    raise
+                read_size = min(read_size * 2, 64 << 20)
+                continue
+            read_size = self.chunk_size
+            position = end
+            if not isinstance(value, dict):
+                raise ValueError(f"JSON array elements must be objects, got {type(value).__name__}")
+            yield value
+
+    def iter_file_records(self, file_path):
+        with open(file_path, 'r', encoding='utf-8-sig') as f:
+            yield from self.iter_records(f)
+
+    def iter_batches(self, file_path, batch_size, columns=None):
+        yield from _iter_record_batches(lambda: self.iter_file_records(file_path), batch_size, columns)
+
+class JsonLinesReader:
+    name = 'jsonl'
+    extensions = ('.jsonl', '.ndjson')
+
+    def sniff(self, head):
+        lines = [line.strip() for line in head.splitlines() if line.strip()]
+        if not lines or not lines[0].startswith(b'{'):
+            return False
+        try:
+            json.loads(lines[0])
+        except ValueError:
+            return False
+        return True
+
+    def iter_file_records(self, file_path):
+        with open(file_path, 'r', encoding='utf-8-sig') as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f"Invalid JSON on line {line_number} of {file_path}: {e}")
+
+    def iter_batches(self, file_path, batch_size, columns=None):
+        yield from _iter_record_batches(lambda: self.iter_file_records(file_path), batch_size, columns)
+
+class DelimitedReader:
+    """
+    CSV/TSV through pyarrow's streaming CSV reader. All columns are read as strings, as the
+    old TSV fallback did, so a value that only looks numeric in the first block cannot fail
+    a later one; templates cast them afterwards.
+    """
+
+    name = 'csv'
+    extensions = ('.csv', '.tsv', '.tab')
+
+    def __init__(self, block_size=1 << 20):
+        self.block_size = block_size
+
+    def sniff(self, head):
+        text = head.decode('utf-8', errors='ignore')
+        first_line = text.split('\n', 1)[0]
+        return '\t' in first_line or ',' in first_line
+
+    def delimiter(self, file_path):
+        if file_path.lower().endswith(('.tsv', '.tab')):
+            return '\t'
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            header = f.readline()
+        return '\t' if header.count('\t') > header.count(',') else ','
+
+    def iter_batches(self, file_path, batch_size, columns=None):
+        delimiter = self.delimiter(file_path)
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            names = next(csv.reader([f.readline()], delimiter=delimiter), [])
+        reader = pacsv.open_csv(
+            file_path,
+            read_options=pacsv.ReadOptions(block_size=self.block_size),
+            parse_options=pacsv.ParseOptions(delimiter=delimiter, newlines_in_values=True),
+            convert_options=pacsv.ConvertOptions(
+                column_types={name: pa.string() for name in names},
+                strings_can_be_null=False,
+                include_columns=columns,
+            ),
+        )
+        yield from _rebatch(reader, batch_size)
+
+class IngredientTextReader:
+    """
+    The $("...") text format. Groups carry no column names, so they are laid out row by row
+    over `columns` (normally a template's columns); without them every group becomes a row
+    of a single `text` column.
+    """
+
+    name = 'txt'
+    extensions = ('.txt',)
+
+    def __init__(self, tokenizer=None):
+        self.tokenizer = tokenizer or IngredientTokenizer()
+
+    def sniff(self, head):
+        return head.lstrip().startswith(IngredientTokenizer.OPEN.encode('utf-8'))
+
+    def iter_batches(self, file_path, batch_size, columns=None):
+        columns = list(columns) if columns else ['text']
+        width = len(columns)
+        batcher = _RecordBatcher(batch_size)
+        row = []
+        for group in self.tokenizer.iter_file(file_path):
+            row.append(group)
+            if len(row) == width:
+                batch = batcher.add(dict(zip(columns, row)))
+                row = []
+                if batch is not None:
+                    yield batch
+        if row:
+            row.extend([''] * (width - len(row)))
+            batcher.add(dict(zip(columns, row)))
+        batch = batcher.flush()
+        if batch is not None:
+            yield batch
+
+class DatasetReader:
+    """
+    Registry of dataset readers that all produce Arrow record batches.
+
+    The format comes from the extension when a reader claims it. Files with an unknown or
+    missing extension are sniffed from their first bytes (parquet magic, a JSON array or
+    JSON lines, a `$("` group, a delimited header). Readers are tried in registration order
+    and new formats can be added with `register`.
+    """
+
+    SNIFF_BYTES = 64 << 10
+
+    def __init__(self, batch_size=8192):
+        self.batch_size = batch_size
+        self.logger = logging.getLogger(__name__)
+        self.readers = []
+        for reader in (ParquetReader(), JsonArrayReader(), JsonLinesReader(), IngredientTextReader(), DelimitedReader()):
+            self.register(reader)
+
+    def register(self, reader, first=False):
+        """
+        Add a reader: an object with `name`, `extensions`, `sniff(head_bytes)` and
+        `iter_batches(file_path, batch_size, columns)`.
+        """
+        for index, existing in enumerate(self.readers):
+            if existing.name == reader.name and not first:
+                # Replacing a reader keeps its place in the sniffing order
+                self.readers[index] = reader
+                return
+        self.readers = [existing for existing in self.readers if existing.name != reader.name]
+        if first:
+            self.readers.insert(0, reader)
+        else:
+            self.readers.append(reader)
+
+    def get_reader(self, name):
+        for reader in self.readers:
+            if reader.name == name:
+                return reader
+        raise ValueError(f"Unknown dataset format: {name}")
+
+    def sniff(self, file_path):
+        """
+        Return the reader for a file: the one claiming its extension, otherwise the first whose
+        sniff accepts the content.
+        """
+        # Content alone is ambiguous (a .txt seed containing a comma looks like CSV)
+        extension = os.path.splitext(file_path)[1].lower()
+        for reader in self.readers:
+            if extension in reader.extensions:
+                return reader
+
+        with open(file_path, 'rb') as f:
+            head = f.read(self.SNIFF_BYTES)
+        if head.startswith(b'\xef\xbb\xbf'):
+            head = head[3:]
+        for reader in self.readers:
+            if reader.sniff(head):
+                return reader
+        raise ValueError(f"Unable to detect the format of {file_path}")
+
+    def iter_batches(self, file_path, batch_size=None, columns=None, format=None):
+        """
+        Yield record batches from any supported file.
+
+        :param batch_size: Rows per batch; defaults to the registry's batch size
+        :param columns: Columns to read (for `$("...")` text, the names to lay the groups out over)
+        :param format: Reader name to use instead of sniffing
+        """
+        reader = self.get_reader(format) if format else self.sniff(file_path)
+        self.logger.debug(f"Reading {file_path} as {reader.name}")
+        yield from reader.iter_batches(file_path, batch_size or self.batch_size, columns)
+
+    def read_table(self, file_path, columns=None, format=None):
+        batches = list(self.iter_batches(file_path, columns=columns, format=format))
+        if not batches:
+            return pa.table({name: pa.array([], pa.string()) for name in columns or []})
+        # Inferred schemas can differ between batches (e.g. a column that is all null in one)
+        return pa.concat_tables([pa.Table.from_batches([batch]) for batch in batches], promote_options='default')
+
+    def read_dataframe(self, file_path, columns=None, format=None):
+        return self.read_table(file_path, columns=columns, format=format).to_pandas()
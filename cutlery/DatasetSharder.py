@@ -0,0 +1,346 @@
+import os
+import glob
+import math
+import json
+import time
+import hashlib
+import logging
+import argparse
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+MANIFEST_NAME = 'manifest.json'
+DEFAULT_SPLITS = {'train': 0.9, 'validation': 0.05, 'test': 0.05}
+
+def _sha256(path, chunk_size=1 << 24):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _allocate(count, ratios):
+    """
+    Split `count` rows between the ratios by largest remainder, so the parts always add up.
+    """
+    exact = [count * ratio for ratio in ratios]
+    sizes = [int(math.floor(value)) for value in exact]
+    order = sorted(range(len(ratios)), key=lambda index: exact[index] - sizes[index], reverse=True)
+    for index in order[:count - sum(sizes)]:
+        sizes[index] += 1
+    return sizes
+
+class _ShardWriter:
+    """
+    Write one split as `{split}-00000-of-0000N.parquet` shards of `rows_per_shard` rows,
+    buffering incoming tables into full row groups. Each shard is written under a `.part`
+    name and renamed once closed.
+    """
+
+    def __init__(self, directory, split, total_rows, schema, rows_per_shard, row_group_size, compression, compression_level):
+        self.directory = directory
+        self.split = split
+        self.schema = schema
+        self.rows_per_shard = rows_per_shard
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.compression_level = compression_level
+        self.num_shards = max(1, math.ceil(total_rows / rows_per_shard))
+        self.shards = []
+        self._writer = None
+        self._shard_rows = 0
+        self._pending = []
+        self._pending_rows = 0
+
+    def _shard_path(self):
+        return os.path.join(self.directory, f"{self.split}-{len(self.shards):05d}-of-{self.num_shards:05d}.parquet")
+
+    def _write_group(self, table):
+        if self._writer is None:
+            path = self._shard_path()
+            self._writer = pq.ParquetWriter(f"{path}.part", self.schema, compression=self.compression,
+                                            compression_level=self.compression_level)
+            self.shards.append({'file': path, 'rows': 0, 'row_groups': 0})
+        self._writer.write_table(table, row_group_size=table.num_rows)
+        self.shards[-1]['rows'] += table.num_rows
+        self.shards[-1]['row_groups'] += 1
+        self._shard_rows += table.num_rows
+        if self._shard_rows >= self.rows_per_shard:
+            self._close_shard()
+
+    def _close_shard(self):
+        if self._writer is not None:
+            self._writer.close()
+            os.replace(f"{self.shards[-1]['file']}.part", self.shards[-1]['file'])
+            self._writer = None
+            self._shard_rows = 0
+
+    def _flush(self, final=False):
+        while self._pending_rows and (final or self._pending_rows >= self.row_group_size):
+            table = pa.concat_tables(self._pending)
+            # A row group never straddles two shards
+            size = min(self.row_group_size, self.rows_per_shard - self._shard_rows, table.num_rows)
+            self._write_group(table.slice(0, size))
+            rest = table.slice(size)
+            self._pending, self._pending_rows = ([rest] if rest.num_rows else []), rest.num_rows
+
+    def write(self, table):
+        if table.num_rows:
+            self._pending.append(table)
+            self._pending_rows += table.num_rows
+            self._flush()
+
+    def close(self):
+        self._flush(final=True)
+        if not self.shards:
+            # Keep an empty split readable and listed in the manifest
+            self._writer = pq.ParquetWriter(f"{self._shard_path()}.part", self.schema, compression=self.compression,
+                                            compression_level=self.compression_level)
+            self.shards.append({'file': self._shard_path(), 'rows': 0, 'row_groups': 0})
+        self._close_shard()
+        return self.shards
+
+class DatasetSharder:
+    """
+    Split a dish into train/validation/test and write each split as fixed-size, zstd-compressed
+    parquet shards for training handoff, with a manifest of row counts and checksums.
+
+    The input is read twice in record batches: first only the stratification column, to assign
+    every row to a split (split sizes by largest remainder over all rows, filled from seeded
+    per-stratum shuffles so each split keeps the stratum proportions), then all columns, routing
+    each batch's rows to their split's shard writer. Memory stays at one batch plus a few bytes
+    per row.
+
+    Row groups default to roughly `target_row_group_bytes` of uncompressed data, estimated from
+    the input's average row size, so loaders read well-sized groups regardless of row width.
+
+    Sharding into an existing folder first removes the shards and manifest of the earlier run,
+    so a split that now needs fewer shards leaves none of the old ones behind.
+    """
+
+    def __init__(self, rows_per_shard=100000, row_group_size=None, target_row_group_bytes=64 << 20,
+                 compression='zstd', compression_level=None, batch_size=65536):
+        self.rows_per_shard = rows_per_shard
+        self.row_group_size = row_group_size
+        self.target_row_group_bytes = target_row_group_bytes
+        self.compression = compression
+        self.compression_level = compression_level
+        self.batch_size = batch_size
+        self.logger = logging.getLogger(__name__)
+
+    def tuned_row_group_size(self, parquet_file):
+        if self.row_group_size:
+            return min(self.row_group_size, self.rows_per_shard)
+        metadata = parquet_file.metadata
+        if not metadata.num_rows:
+            return min(10000, self.rows_per_shard)
+        uncompressed = sum(metadata.row_group(index).total_byte_size for index in range(metadata.num_row_groups))
+        row_bytes = max(uncompressed / metadata.num_rows, 1)
+        size = int(self.target_row_group_bytes / row_bytes)
+        return max(1000, min(size, self.rows_per_shard))
+
+    def assign(self, parquet_file, ratios, stratify=None, seed=0):
+        """
+        :return: Tuple of (split index per row as an int8 array, {stratum: [rows per split]})
+        """
+        num_rows = parquet_file.metadata.num_rows
+        rng = np.random.default_rng(seed)
+        assignment = np.empty(num_rows, dtype=np.int8)
+
+        if stratify is None:
+            strata = {None: np.arange(num_rows)}
+        else:
+            if stratify not in parquet_file.schema_arrow.names:
+                raise ValueError(f"Stratify column '{stratify}' not found")
+            chunks = []
+            for batch in parquet_file.iter_batches(batch_size=self.batch_size, columns=[stratify]):
+                column = batch.column(0)
+                if pa.types.is_dictionary(column.type):
+                    column = column.cast(column.type.value_type)
+                chunks.append(column)
+            values = pa.chunked_array(chunks, type=chunks[0].type if chunks else pa.string())
+            encoded = pc.dictionary_encode(pc.cast(values, pa.string())).combine_chunks()
+            codes = pc.fill_null(encoded.indices, -1).to_numpy(zero_copy_only=False)
+            labels = encoded.dictionary.to_pylist()
+            order = np.argsort(codes, kind='stable')
+            boundaries = np.flatnonzero(np.diff(codes[order])) + 1
+            strata = {}
+            for rows in np.split(order, boundaries) if num_rows else []:
+                code = codes[rows[0]]
+                strata[labels[code] if code >= 0 else None] = rows
+
+        # Split totals are sized over all rows, so small strata cannot each round their share of
+        # a small split away. Each stratum's shuffled rows are spread evenly over [0, 1) from a
+        # random offset, and the rows, ordered by that position, are cut at the split totals:
+        # every split gets about its share of each stratum, give or take a row.
+        positions = np.empty(num_rows, dtype=np.float64)
+        for rows in strata.values():
+            positions[rng.permutation(rows)] = (np.arange(len(rows)) + rng.random()) / len(rows)
+        order = np.argsort(positions, kind='stable')
+        start = 0
+        for split_index, size in enumerate(_allocate(num_rows, ratios)):
+            assignment[order[start:start + size]] = split_index
+            start += size
+
+        counts = {stratum: np.bincount(assignment[rows], minlength=len(ratios)).tolist() for stratum, rows in strata.items()}
+        return assignment, counts
+
+    def shard(self, input_file, output_dir, splits=None, stratify='task', seed=0, hash_source=False):
+        """
+        Write the splits of `input_file` under `output_dir/<split>/` and a manifest.
+
+        :param splits: {split name: fraction}; fractions are normalized
+        :param stratify: Column whose value proportions are kept in every split, or None
+        :return: The manifest dict
+        """
+        started = time.time()
+        splits = dict(splits or DEFAULT_SPLITS)
+        if not splits or any(ratio < 0 for ratio in splits.values()) or not sum(splits.values()):
+            raise ValueError(f"Invalid split fractions: {splits}")
+        names = list(splits)
+        invalid = [name for name in names if name in ('', '.', '..') or os.sep in name or (os.altsep and os.altsep in name)]
+        if invalid:
+            raise ValueError(f"Invalid split names: {invalid}")
+        total = sum(splits.values())
+        ratios = [splits[name] / total for name in names]
+
+        parquet_file = pq.ParquetFile(input_file)
+        if stratify is not None and stratify not in parquet_file.schema_arrow.names:
+            self.logger.warning(f"Column '{stratify}' not in {input_file}; splitting without stratification")
+            stratify = None
+        schema = parquet_file.schema_arrow
+        row_group_size = self.tuned_row_group_size(parquet_file)
+        assignment, strata = self.assign(parquet_file, ratios, stratify=stratify, seed=seed)
+
+        split_rows = np.bincount(assignment, minlength=len(names))
+        self._clear(output_dir, names)
+        writers = []
+        for split_index, name in enumerate(names):
+            directory = os.path.join(output_dir, name)
+            os.makedirs(directory, exist_ok=True)
+            writers.append(_ShardWriter(directory, name, int(split_rows[split_index]), schema, self.rows_per_shard,
+                                        row_group_size, self.compression, self.compression_level))
+
+        offset = 0
+        for batch in parquet_file.iter_batches(batch_size=self.batch_size):
+            table = pa.Table.from_batches([batch], schema=schema)
+            batch_assignment = assignment[offset:offset + batch.num_rows]
+            for split_index, writer in enumerate(writers):
+                writer.write(table.filter(pa.array(batch_assignment == split_index)))
+            offset += batch.num_rows
+
+        manifest = {
+            'source': os.path.basename(input_file),
+            'source_rows': parquet_file.metadata.num_rows,
+            'source_sha256': _sha256(input_file) if hash_source else None,
+            'seed': seed,
+            'stratify': stratify,
+            'compression': self.compression,
+            'row_group_size': row_group_size,
+            'rows_per_shard': self.rows_per_shard,
+            'schema': {field.name: str(field.type) for field in schema},
+            'splits': {},
+            'created_at': time.time(),
+        }
+        for split_index, (name, writer) in enumerate(zip(names, writers)):
+            shards = writer.close()
+            for shard in shards:
+                shard['bytes'] = os.path.getsize(shard['file'])
+                shard['sha256'] = _sha256(shard['file'])
+                shard['file'] = os.path.relpath(shard['file'], output_dir)
+            manifest['splits'][name] = {
+                'fraction': ratios[split_index],
+                'rows': int(split_rows[split_index]),
+                'strata': {str(stratum): sizes[split_index] for stratum, sizes in strata.items()} if stratify else None,
+                'shards': shards,
+            }
+        manifest['seconds'] = round(time.time() - started, 3)
+
+        manifest_file = os.path.join(output_dir, MANIFEST_NAME)
+        with open(f"{manifest_file}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(f"{manifest_file}.tmp", manifest_file)
+        self.logger.info(f"Wrote {', '.join(f'{name}: {int(rows)}' for name, rows in zip(names, split_rows))} rows to {output_dir} in {manifest['seconds']}s")
+        return manifest
+
+    def _clear(self, output_dir, names):
+        # Shards of the previous run, including splits it had that this one does not
+        manifest_file = os.path.join(output_dir, MANIFEST_NAME)
+        previous = set(names)
+        try:
+            with open(manifest_file, 'r', encoding='utf-8') as f:
+                previous.update(name for name in json.load(f).get('splits', {}) if name not in ('', '.', '..') and os.sep not in name)
+        except (OSError, ValueError, AttributeError):
+            pass
+        if os.path.exists(manifest_file):
+            os.remove(manifest_file)
+        for name in previous:
+            for path in glob.glob(os.path.join(glob.escape(os.path.join(output_dir, name)), f"{glob.escape(name)}-*-of-*.parquet*")):
+                os.remove(path)
+                self.logger.info(f"Removed stale shard {path}")
+
+    @staticmethod
+    def verify(output_dir):
+        """
+        Check every shard listed in the manifest against its row count and checksum.
+
+        :return: List of problems; empty when the shards match
+        """
+        with open(os.path.join(output_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        problems = []
+        for name, split in manifest['splits'].items():
+            for shard in split['shards']:
+                path = os.path.join(output_dir, shard['file'])
+                if not os.path.exists(path):
+                    problems.append(f"{shard['file']}: missing")
+                elif _sha256(path) != shard['sha256']:
+                    problems.append(f"{shard['file']}: checksum mismatch")
+                elif pq.ParquetFile(path).metadata.num_rows != shard['rows']:
+                    problems.append(f"{shard['file']}: row count mismatch")
+        return problems
+
+def _parse_splits(value):
+    splits = {}
+    for part in value.split(','):
+        name, _, fraction = part.partition('=')
+        splits[name.strip()] = float(fraction)
+    return splits
+
+def main():
+    parser = argparse.ArgumentParser(description="Split a parquet dataset into train/validation/test shards with a manifest")
+    parser.add_argument("input", nargs="?", help="Input parquet")
+    parser.add_argument("output_dir", help="Directory for the split folders and manifest.json")
+    parser.add_argument("--splits", type=_parse_splits, default=DEFAULT_SPLITS, help="e.g. train=0.8,validation=0.1,test=0.1")
+    parser.add_argument("--stratify", default="task", help="Column to stratify on ('' to disable)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rows_per_shard", type=int, default=100000)
+    parser.add_argument("--row_group_size", type=int, help="Rows per row group (default: sized to ~64 MB uncompressed)")
+    parser.add_argument("--compression", default="zstd")
+    parser.add_argument("--compression_level", type=int)
+    parser.add_argument("--hash_source", action="store_true", help="Also record the input's sha256")
+    parser.add_argument("--verify", action="store_true", help="Only verify an existing output_dir against its manifest")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.verify:
+        problems = DatasetSharder.verify(args.output_dir)
+        for problem in problems:
+            print(f"error: {problem}")
+        print("ok" if not problems else f"{len(problems)} problem(s)")
+        return 1 if problems else 0
+    if not args.input:
+        parser.error("input is required unless --verify is given")
+
+    sharder = DatasetSharder(rows_per_shard=args.rows_per_shard, row_group_size=args.row_group_size,
+                             compression=args.compression, compression_level=args.compression_level)
+    manifest = sharder.shard(args.input, args.output_dir, splits=args.splits, stratify=args.stratify or None,
+                             seed=args.seed, hash_source=args.hash_source)
+    for name, split in manifest['splits'].items():
+        print(f"{name:12} {split['rows']:>9} rows in {len(split['shards'])} shard(s)")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
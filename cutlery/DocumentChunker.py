@@ -0,0 +1,84 @@
+import re
+import logging
+
+class DocumentChunker:
+    """
+    Split long documents into overlapping, context-sized windows.
+
+    Text is cut into blocks at blank lines and LaTeX sectioning commands, then blocks are packed
+    into windows of at most `chunk_chars` characters. Each window after the first starts with the
+    trailing blocks of the previous one (up to `overlap_chars`), so content near a boundary is seen
+    whole by at least one window. Blocks longer than a window are split at line, then word
+    boundaries.
+    """
+
+    BOUNDARY = re.compile(r'\n[ \t]*\n|(?=\\(?:part|chapter|section|subsection|subsubsection|paragraph)\*?\{)')
+
+    def __init__(self, chunk_chars=6000, overlap_chars=600):
+        if overlap_chars >= chunk_chars:
+            raise ValueError("overlap_chars must be smaller than chunk_chars")
+        self.chunk_chars = chunk_chars
+        self.overlap_chars = overlap_chars
+        self.logger = logging.getLogger(__name__)
+
+    def blocks(self, text):
+        """
+        Split text into paragraph/section blocks, none longer than `chunk_chars`.
+        """
+        for block in self.BOUNDARY.split(text):
+            block = block.strip('\n')
+            if not block.strip():
+                continue
+            if len(block) <= self.chunk_chars:
+                yield block
+            else:
+                yield from self._split_long(block)
+
+    def _split_long(self, block):
+        pieces = []
+        current = ''
+        for line in block.splitlines(keepends=True):
+            while len(line) > self.chunk_chars:
+                cut = line.rfind(' ', 0, self.chunk_chars)
+                cut = cut + 1 if cut > 0 else self.chunk_chars
+                if current:
+                    pieces.append(current)
+                    current = ''
+                pieces.append(line[:cut])
+                line = line[cut:]
+            if len(current) + len(line) > self.chunk_chars:
+                pieces.append(current)
+                current = ''
+            current += line
+        if current:
+            pieces.append(current)
+        return [piece.strip('\n') for piece in pieces if piece.strip()]
+
+    def windows(self, text):
+        """
+        Return the list of window strings covering `text` (a single window if it already fits).
+        """
+        if len(text) <= self.chunk_chars:
+            return [text] if text.strip() else []
+
+        windows = []
+        current, size = [], 0
+        for block in self.blocks(text):
+            added = len(block) + (2 if current else 0)
+            if current and size + added > self.chunk_chars:
+                windows.append('\n\n'.join(current))
+                # Carry the tail of this window into the next one as overlap
+                overlap, overlap_size = [], 0
+                for previous in reversed(current):
+                    if overlap_size + len(previous) + 2 > self.overlap_chars or overlap_size + len(previous) + 2 + len(block) > self.chunk_chars:
+                        break
+                    overlap.insert(0, previous)
+                    overlap_size += len(previous) + 2
+                current, size = overlap, overlap_size
+                added = len(block) + (2 if current else 0)
+            current.append(block)
+            size += added
+        if current:
+            windows.append('\n\n'.join(current))
+        self.logger.info(f"Split {len(text)} characters into {len(windows)} windows")
+        return windows
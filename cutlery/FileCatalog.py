@@ -0,0 +1,134 @@
+import os
+import time
+import hashlib
+import fnmatch
+import logging
+import threading
+import pyarrow.parquet as pq
+
+class FileCatalog:
+    """
+    In-memory index of the agent_chef_data directories.
+
+    Each category is scanned once and then refreshed incrementally by mtime polling: a
+    directory is re-listed as soon as its own mtime changes (files added, removed or
+    renamed into place) and otherwise at most every `refresh_interval` seconds, known files
+    are only re-stat'ed, and parquet footers are re-read only when a file's size or mtime
+    changed.
+    """
+
+    def __init__(self, categories, refresh_interval=2.0):
+        """
+        :param categories: Mapping of {category: (directory, extensions)}; extensions=None
+            indexes sub-directories instead of files
+        :param refresh_interval: Minimum number of seconds between two scans of a directory
+        """
+        self.categories = categories
+        self.refresh_interval = refresh_interval
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._entries = {category: {} for category in categories}
+        self._checked_at = {category: 0.0 for category in categories}
+        self._dir_mtimes = {category: None for category in categories}
+
+    def _read_parquet_footer(self, path):
+        try:
+            metadata = pq.read_metadata(path)
+            schema = metadata.schema.to_arrow_schema()
+            return {
+                'rows': metadata.num_rows,
+                'columns': schema.names,
+                'schema_fingerprint': hashlib.sha1(str(schema).encode('utf-8')).hexdigest()[:16],
+            }
+        except Exception as e:
+            self.logger.warning(f"Could not read parquet footer for {path}: {str(e)}")
+            return {'rows': None, 'columns': None, 'schema_fingerprint': None}
+
+    def _scan(self, category):
+        directory, extensions = self.categories[category]
+        known = self._entries[category]
+        current = {}
+
+        if not os.path.isdir(directory):
+            self._entries[category] = current
+            return
+
+        with os.scandir(directory) as it:
+            for entry in it:
+                if extensions is None:
+                    if not entry.is_dir():
+                        continue
+                elif not (entry.is_file() and entry.name.endswith(extensions)):
+                    continue
+
+                stat = entry.stat()
+                previous = known.get(entry.name)
+                if previous and previous['size'] == stat.st_size and previous['mtime'] == stat.st_mtime:
+                    current[entry.name] = previous
+                    continue
+
+                info = {'name': entry.name, 'size': stat.st_size, 'mtime': stat.st_mtime,
+                        'rows': None, 'columns': None, 'schema_fingerprint': None}
+                if entry.name.endswith('.parquet'):
+                    info.update(self._read_parquet_footer(entry.path))
+                current[entry.name] = info
+
+        self._entries[category] = current
+
+    def _dir_mtime(self, category):
+        try:
+            return os.stat(self.categories[category][0]).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def refresh(self, category=None, force=False):
+        categories = [category] if category else list(self.categories)
+        now = time.monotonic()
+        with self._lock:
+            for name in categories:
+                dir_mtime = self._dir_mtime(name)
+                if force or dir_mtime != self._dir_mtimes[name] or now - self._checked_at[name] >= self.refresh_interval:
+                    self._scan(name)
+                    self._checked_at[name] = now
+                    self._dir_mtimes[name] = dir_mtime
+
+    def invalidate(self, category=None):
+        """
+        Force the next lookup to rescan, e.g. right after the API wrote a new file.
+        """
+        with self._lock:
+            for name in ([category] if category else list(self.categories)):
+                self._checked_at[name] = 0.0
+
+    def names(self, category):
+        self.refresh(category)
+        return sorted(self._entries[category])
+
+    def list(self, category, pattern=None, extensions=None, sort='name', reverse=False, offset=0, limit=None):
+        """
+        Return a filtered, sorted page of catalog entries.
+
+        :param category: Category name as passed to the constructor
+        :param pattern: Optional glob matched against file names
+        :param extensions: Optional tuple of extensions to keep
+        :param sort: Entry field to sort by (name, size, mtime, rows)
+        :return: Tuple of (entries, total number of matching entries)
+        """
+        if category not in self.categories:
+            raise ValueError(f"Unknown catalog category: {category}")
+        if sort not in ('name', 'size', 'mtime', 'rows'):
+            raise ValueError(f"Invalid sort field: {sort}")
+
+        self.refresh(category)
+        entries = list(self._entries[category].values())
+        if pattern:
+            entries = [e for e in entries if fnmatch.fnmatch(e['name'], pattern)]
+        if extensions:
+            entries = [e for e in entries if e['name'].endswith(tuple(extensions))]
+
+        # Entries without a value for the sort field (e.g. rows of a .txt file) always go last
+        missing = [e for e in entries if e[sort] is None]
+        entries = sorted((e for e in entries if e[sort] is not None), key=lambda e: e[sort], reverse=reverse) + missing
+        total = len(entries)
+        end = None if limit is None else offset + limit
+        return [dict(e) for e in entries[offset:end]], total
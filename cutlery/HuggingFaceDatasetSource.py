@@ -0,0 +1,136 @@
+import os
+import logging
+import argparse
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+class HuggingFaceDatasetSource:
+    """
+    Stream a Hugging Face dataset as Arrow record batches without materializing the split.
+
+    Hub datasets are opened with `streaming=True`; a directory written by `save_to_disk` is
+    opened with `load_from_disk`, and `.arrow` cache files with `Dataset.from_file`, both of
+    which memory-map the data. Columns are projected and the rows sharded and limited before
+    anything is decoded, so a multi-GB dataset costs one batch of memory at a time.
+    """
+
+    def __init__(self, source, split='train', columns=None, limit=None, num_shards=1, shard_index=0,
+                 batch_size=1000, streaming=True, **load_kwargs):
+        if not 0 <= shard_index < num_shards:
+            raise ValueError(f"shard_index must be in [0, {num_shards})")
+        self.source = source
+        self.split = split
+        self.columns = list(columns) if columns else None
+        self.limit = limit
+        self.num_shards = num_shards
+        self.shard_index = shard_index
+        self.batch_size = batch_size
+        self.streaming = streaming
+        self.load_kwargs = load_kwargs
+        self.logger = logging.getLogger(__name__)
+
+    def _open(self):
+        import datasets
+
+        if os.path.isdir(self.source):
+            dataset = datasets.load_from_disk(self.source)
+        elif os.path.isfile(self.source) and self.source.endswith('.arrow'):
+            dataset = datasets.Dataset.from_file(self.source)
+        else:
+            return datasets.load_dataset(self.source, split=self.split, streaming=self.streaming, **self.load_kwargs)
+        if isinstance(dataset, datasets.DatasetDict):
+            if self.split not in dataset:
+                raise ValueError(f"Split '{self.split}' not found in {self.source}; available: {', '.join(dataset)}")
+            dataset = dataset[self.split]
+        return dataset
+
+    def _select_columns(self, dataset):
+        if self.columns is None:
+            return dataset
+        available = dataset.column_names
+        if available is not None:
+            missing = [column for column in self.columns if column not in available]
+            if missing:
+                raise ValueError(f"Columns not found in {self.source}: {', '.join(missing)}")
+        return dataset.select_columns(self.columns)
+
+    def iter_batches(self):
+        """
+        Yield `pa.RecordBatch`es of at most `batch_size` rows from the selected shard.
+        """
+        import datasets
+
+        dataset = self._select_columns(self._open())
+        modulo_shard = False
+        if isinstance(dataset, datasets.Dataset):
+            # Map-style (memory-mapped) data: shard and limit by index, then read Arrow slices
+            if self.num_shards > 1:
+                dataset = dataset.shard(self.num_shards, self.shard_index, contiguous=True)
+            if self.limit is not None:
+                dataset = dataset.select(range(min(self.limit, len(dataset))))
+            self.logger.info(f"Reading {len(dataset)} rows from {self.source}")
+            for table in dataset.with_format('arrow').iter(batch_size=self.batch_size):
+                yield from table.combine_chunks().to_batches()
+            return
+
+        # Streaming data: shard by file when there are enough of them, otherwise by row
+        if self.num_shards > 1:
+            if hasattr(dataset, 'shard') and dataset.n_shards >= self.num_shards:
+                dataset = dataset.shard(self.num_shards, self.shard_index)
+            else:
+                modulo_shard = True
+        if self.limit is not None and not modulo_shard:
+            dataset = dataset.take(self.limit)
+
+        rows = []
+        position = produced = 0
+        for row in dataset:
+            if modulo_shard:
+                position += 1
+                if (position - 1) % self.num_shards != self.shard_index:
+                    continue
+            rows.append(row)
+            produced += 1
+            if len(rows) >= self.batch_size:
+                yield pa.RecordBatch.from_pylist(rows)
+                rows = []
+            if self.limit is not None and produced >= self.limit:
+                break
+        if rows:
+            yield pa.RecordBatch.from_pylist(rows)
+
+    def iter_rows(self):
+        for batch in self.iter_batches():
+            yield from batch.to_pylist()
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a Hugging Face dataset (hub name, save_to_disk directory or .arrow file) into parquet")
+    parser.add_argument("source", help="Hub dataset name or local dataset path")
+    parser.add_argument("output_file", help="Parquet file to write")
+    parser.add_argument("--split", default="train", help="Split to read")
+    parser.add_argument("--columns", nargs="*", help="Columns to keep")
+    parser.add_argument("--limit", type=int, help="Maximum number of rows")
+    parser.add_argument("--num_shards", type=int, default=1, help="Number of shards to split the rows into")
+    parser.add_argument("--shard_index", type=int, default=0, help="Shard to read")
+    parser.add_argument("--batch_size", type=int, default=1000, help="Rows per record batch")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    source = HuggingFaceDatasetSource(args.source, split=args.split, columns=args.columns, limit=args.limit,
+                                      num_shards=args.num_shards, shard_index=args.shard_index, batch_size=args.batch_size)
+    writer = None
+    rows = 0
+    try:
+        for batch in source.iter_batches():
+            if writer is None:
+                writer = pq.ParquetWriter(args.output_file, batch.schema)
+            writer.write_batch(batch.cast(writer.schema) if batch.schema != writer.schema else batch)
+            rows += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    print(f"Wrote {rows} rows to {args.output_file}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
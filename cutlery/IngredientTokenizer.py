@@ -0,0 +1,143 @@
+import re
+import logging
+
+class IngredientTokenizer:
+    """
+    Incremental scanner for the $("...") ingredient format.
+
+    Produces the same groups as the old `\\$\\("((?:(?!\\$\\(").|\\n)*?)"\\)` regex: a group opens
+    at `$("` and closes at the first following `")`; if another `$("` starts before that, the
+    earlier group is malformed and scanning restarts at the new opener. Input is consumed in
+    chunks with plain substring searches, so each character is looked at a constant number
+    of times and only the group being read is kept in memory.
+
+    Values containing the delimiters are written with `escape()`: a backslash is added inside
+    every `"\\*)` and `$\\*(` that could close or open a group, so the raw text never holds a
+    delimiter. Groups are unescaped on the way out unless `unescape=False`.
+    """
+
+    OPEN = '$("'
+    CLOSE = '")'
+
+    # `"` + k backslashes + `)`, and `$` + k backslashes + `(` before a `"` or the end of the value
+    _ESCAPE = re.compile(r'(")(\\*\))|(\$)(\\*\()(?="|\Z)')
+    _UNESCAPE = re.compile(r'(")\\(\\*\))|(\$)\\(\\*\()(?="|\Z)')
+
+    def __init__(self, chunk_size=1 << 20, unescape=True):
+        self.chunk_size = chunk_size
+        self.unescape_groups = unescape
+        self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    def escape(cls, value):
+        """
+        Escape a value so that `$("{value}")` tokenizes back to exactly `value`.
+        """
+        if '")' not in value and '\\)' not in value and '$' not in value:
+            return value
+        return cls._ESCAPE.sub(lambda m: f"{m.group(1)}\\{m.group(2)}" if m.group(1) else f"{m.group(3)}\\{m.group(4)}", value)
+
+    @classmethod
+    def unescape(cls, value):
+        if '\\' not in value:
+            return value
+        return cls._UNESCAPE.sub(lambda m: f"{m.group(1)}{m.group(2)}" if m.group(1) else f"{m.group(3)}{m.group(4)}", value)
+
+    @classmethod
+    def format_group(cls, value):
+        return f'{cls.OPEN}{cls.escape(value)}{cls.CLOSE}'
+
+    def iter_file(self, file_path, errors=None, encoding='utf-8'):
+        with open(file_path, 'r', encoding=encoding) as f:
+            yield from self.iter_stream(f, errors=errors)
+
+    def iter_stream(self, stream, errors=None):
+        def chunks():
+            while True:
+                chunk = stream.read(self.chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+        return self.iter_groups(chunks(), errors=errors)
+
+    def iter_text(self, text, errors=None):
+        return self.iter_groups([text], errors=errors)
+
+    def iter_groups(self, chunks, errors=None):
+        """
+        Yield the content of every well-formed group from an iterable of text chunks.
+
+        :param chunks: Iterable of str pieces of the document, in order
+        :param errors: Optional list that receives {'line', 'column', 'message'} for each
+            malformed group (1-based position of its `$("`)
+        """
+        chunks = iter(chunks)
+        buffer = ''
+        # Line/column bookkeeping for buffer[cursor]
+        cursor, line, column = 0, 1, 1
+        # Index where the next search starts, and where the open group's content begins
+        search_from = 0
+        content_start = None
+        open_position = None
+        exhausted = False
+
+        def advance(index):
+            nonlocal cursor, line, column
+            newlines = buffer.count('\n', cursor, index)
+            if newlines:
+                line += newlines
+                column = index - buffer.rfind('\n', cursor, index)
+            else:
+                column += index - cursor
+            cursor = index
+
+        def report(position, message):
+            entry = {'line': position[0], 'column': position[1], 'message': message}
+            self.logger.warning(f"Malformed ingredient group at line {position[0]}, column {position[1]}: {message}")
+            if errors is not None:
+                errors.append(entry)
+
+        while True:
+            if content_start is None:
+                opener = buffer.find(self.OPEN, search_from)
+                if opener != -1:
+                    advance(opener)
+                    open_position = (line, column)
+                    content_start = search_from = opener + len(self.OPEN)
+                    continue
+                # Keep a possible partial `$(` at the end; everything before it is consumed
+                keep = search_from = max(search_from, len(buffer) - (len(self.OPEN) - 1))
+            else:
+                closer = buffer.find(self.CLOSE, search_from)
+                opener = buffer.find(self.OPEN, search_from)
+                if opener != -1 and (closer == -1 or opener < closer):
+                    report(open_position, 'group is not closed before the next $("')
+                    content_start = None
+                    search_from = opener
+                    continue
+                if closer != -1:
+                    group = buffer[content_start:closer]
+                    yield self.unescape(group) if self.unescape_groups else group
+                    content_start = None
+                    search_from = closer + len(self.CLOSE)
+                    continue
+                # Neither found yet: only the tail can still hold the start of a split delimiter
+                search_from = max(content_start, len(buffer) - (len(self.OPEN) - 1))
+                keep = content_start
+
+            # Drop the consumed prefix before reading more input
+            advance(keep)
+            buffer = buffer[keep:]
+            search_from -= keep
+            if content_start is not None:
+                content_start -= keep
+            cursor = 0
+
+            if exhausted:
+                if content_start is not None:
+                    report(open_position, 'group is not closed before the end of the input')
+                return
+            try:
+                buffer += next(chunks)
+            except StopIteration:
+                exhausted = True
@@ -0,0 +1,339 @@
+import os
+import re
+import json
+import bisect
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from .ParquetRowWriter import ParquetRowWriter
+
+class LatexSegmenter:
+    """
+    Split LaTeX documents into section, theorem-like, proof and equation segments.
+
+    The segment index of a file is cached in memory and on disk (one JSON per content hash under
+    `cache_dir`), so re-opening an unchanged paper skips both hashing and parsing, and an edited
+    file is only re-parsed once. Segments can be turned into seed rows for templates such as
+    `latexMath` and `latexTheory` and streamed straight into a parquet writer.
+    """
+
+    THEOREM_KINDS = {
+        'theorem': 'theorem', 'lemma': 'lemma', 'proposition': 'proposition', 'corollary': 'corollary',
+        'definition': 'definition', 'remark': 'remark', 'example': 'example', 'exercise': 'exercise',
+        'conjecture': 'conjecture', 'claim': 'claim', 'axiom': 'axiom', 'notation': 'notation',
+    }
+    EQUATION_ENVIRONMENTS = {'equation', 'align', 'gather', 'multline', 'eqnarray', 'displaymath', 'flalign', 'alignat', 'math'}
+    SECTION_LEVELS = {'part': 0, 'chapter': 1, 'section': 2, 'subsection': 3, 'subsubsection': 4, 'paragraph': 5}
+
+    # Segment kinds turned into rows for each template; other templates take every kind but proofs
+    TEMPLATE_KINDS = {
+        'latexMath': ('equation', 'theorem', 'lemma', 'proposition', 'corollary', 'definition'),
+        'latexTheory': ('theorem', 'lemma', 'proposition', 'corollary', 'definition', 'remark', 'conjecture', 'axiom'),
+        'latexSeries': ('equation',),
+    }
+    INSTRUCTIONS = {
+        'equation': "Explain the following equation and how it is derived.",
+        'definition': "State the following definition and explain its meaning.",
+        'section': "Summarize the following section.",
+    }
+
+    _COMMENT = re.compile(r'(?<!\\)%[^\n]*')
+    _NEWTHEOREM = re.compile(r'\\newtheorem\*?\{([A-Za-z@]+)\}(?:\[[^\]]*\])?\{([^}]*)\}')
+    _BEGIN = re.compile(r'\\begin\{([A-Za-z@]+\*?)\}')
+    _SECTION = re.compile(r'\\(part|chapter|section|subsection|subsubsection|paragraph)\*?\s*(?:\[[^\]]*\])?\s*\{')
+    _DISPLAY_MATH = re.compile(r'\\\[(.+?)\\\]|(?<!\\)\$\$(.+?)(?<!\\)\$\$', re.S)
+    _LABEL = re.compile(r'\\label\{([^}]*)\}')
+
+    def __init__(self, cache_dir=None, template_manager=None, max_cached=256):
+        self.cache_dir = cache_dir
+        self.template_manager = template_manager
+        self.max_cached = max_cached
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        # file path -> (mtime_ns, size, sha256) and sha256 -> index, both bounded LRUs
+        self._file_hashes = OrderedDict()
+        self._indexes = OrderedDict()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    # ---- Parsing ----
+
+    @staticmethod
+    def _matching_brace(text, open_index):
+        depth = 0
+        index = open_index
+        while index < len(text):
+            char = text[index]
+            if char == '\\':
+                index += 2
+                continue
+            if char == '{':
+                depth += 1
+            elif char == '}':
+                depth -= 1
+                if depth == 0:
+                    return index
+            index += 1
+        return -1
+
+    @staticmethod
+    def _optional_argument(text, start, stop):
+        """
+        Return (argument, end) for a `[...]` directly at `start` (after whitespace), honouring
+        nested braces and brackets, or (None, start).
+        """
+        index = start
+        while index < stop and text[index] in ' \t\n':
+            index += 1
+        if index >= stop or text[index] != '[':
+            return None, start
+        depth = 0
+        braces = 0
+        for position in range(index, stop):
+            char = text[position]
+            if char == '{':
+                braces += 1
+            elif char == '}':
+                braces -= 1
+            elif char == '[' and braces == 0:
+                depth += 1
+            elif char == ']' and braces == 0:
+                depth -= 1
+                if depth == 0:
+                    return text[index + 1:position], position + 1
+        return None, start
+
+    @staticmethod
+    def _matching_end(text, name, start):
+        pattern = re.compile(r'\\(begin|end)\{' + re.escape(name) + r'\}')
+        depth = 1
+        for match in pattern.finditer(text, start):
+            depth += 1 if match.group(1) == 'begin' else -1
+            if depth == 0:
+                return match.start(), match.end()
+        return -1, -1
+
+    def _theorem_environments(self, text):
+        environments = {name: kind for name, kind in self.THEOREM_KINDS.items()}
+        for name, display in self._NEWTHEOREM.findall(text):
+            kind = display.strip().lower()
+            environments[name] = self.THEOREM_KINDS.get(kind, kind or name.lower())
+        return environments
+
+    def segment_text(self, text):
+        """
+        Return the segments of a LaTeX document as a list of dicts ordered by position.
+
+        Each segment has `kind`, `environment`, `title`, `label`, `section`, `line`, `start`,
+        `end` and `text`; theorem-like segments directly followed by a proof carry it in `proof`.
+        """
+        # Blank out comments without shifting offsets
+        clean = self._COMMENT.sub(lambda m: ' ' * len(m.group(0)), text)
+        body_start = clean.find('\\begin{document}')
+        body_start = body_start + len('\\begin{document}') if body_start != -1 else 0
+        body_end = clean.find('\\end{document}', body_start)
+        body_end = body_end if body_end != -1 else len(clean)
+        theorem_envs = self._theorem_environments(clean[:body_start] or clean)
+
+        headings = []
+        for match in self._SECTION.finditer(clean, body_start, body_end):
+            close = self._matching_brace(clean, match.end() - 1)
+            if close == -1:
+                continue
+            title = ' '.join(clean[match.end():close].split())
+            headings.append({'start': match.start(), 'end': close + 1, 'level': self.SECTION_LEVELS[match.group(1)], 'title': title})
+
+        segments = []
+        covered = []
+        for match in self._BEGIN.finditer(clean, body_start, body_end):
+            name = match.group(1)
+            base = name.rstrip('*')
+            if base in theorem_envs:
+                kind = theorem_envs[base]
+            elif base == 'proof':
+                kind = 'proof'
+            elif base in self.EQUATION_ENVIRONMENTS:
+                kind = 'equation'
+            else:
+                continue
+            end_start, end_end = self._matching_end(clean, name, match.end())
+            if end_start == -1:
+                continue
+            content_start = match.end()
+            title = None
+            if kind != 'equation':
+                title, content_start = self._optional_argument(clean, content_start, end_start)
+                title = ' '.join(title.split()) if title else None
+            segments.append({
+                'kind': kind, 'environment': name, 'title': title,
+                'start': match.start(), 'end': end_end,
+                'text': clean[content_start:end_start].strip(),
+            })
+            if kind == 'equation':
+                covered.append((match.start(), end_end))
+
+        # Display math outside equation environments
+        covered.sort()
+        for match in self._DISPLAY_MATH.finditer(clean, body_start, body_end):
+            position = bisect.bisect_right(covered, (match.start(), float('inf'))) - 1
+            if position >= 0 and covered[position][1] > match.start():
+                continue
+            segments.append({
+                'kind': 'equation', 'environment': 'displaymath', 'title': None,
+                'start': match.start(), 'end': match.end(),
+                'text': (match.group(1) or match.group(2)).strip(),
+            })
+
+        for index, heading in enumerate(headings):
+            following = [other['start'] for other in headings[index + 1:] if other['level'] <= heading['level']]
+            section_end = following[0] if following else body_end
+            next_heading = headings[index + 1]['start'] if index + 1 < len(headings) else body_end
+            parents = [other['title'] for other in headings[:index] if other['level'] < heading['level']]
+            segments.append({
+                'kind': 'section', 'environment': None, 'title': heading['title'],
+                'start': heading['start'], 'end': section_end,
+                # Only the prose up to the next heading of any level
+                'text': clean[heading['end']:next_heading].strip(),
+                'section': parents[-1] if parents else None,
+            })
+
+        segments.sort(key=lambda segment: (segment['start'], -segment['end']))
+        heading_starts = [heading['start'] for heading in headings]
+        line_starts = [0] + [match.end() for match in re.finditer(r'\n', clean)]
+        previous = None
+        for index, segment in enumerate(segments):
+            segment['id'] = index
+            segment['line'] = bisect.bisect_right(line_starts, segment['start'])
+            # A section's own label follows its heading; later ones belong to its contents
+            label = self._LABEL.match(segment['text']) if segment['kind'] == 'section' else self._LABEL.search(segment['text'])
+            segment['label'] = label.group(1) if label else None
+            if segment['kind'] != 'section':
+                position = bisect.bisect_right(heading_starts, segment['start']) - 1
+                segment['section'] = headings[position]['title'] if position >= 0 else None
+            if segment['kind'] == 'equation':
+                segment['text'] = self._LABEL.sub('', segment['text']).strip()
+            # A proof right after a theorem-like block belongs to it
+            if segment['kind'] == 'proof' and previous is not None and not clean[previous['end']:segment['start']].strip():
+                previous['proof'] = segment['text']
+            if segment['kind'] not in ('section', 'equation', 'proof'):
+                previous = segment
+            elif segment['kind'] != 'equation':
+                previous = None
+        return segments
+
+    # ---- Cached index ----
+
+    def _cache_path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}.json") if self.cache_dir else None
+
+    def _remember(self, cache, key, value):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > self.max_cached:
+            cache.popitem(last=False)
+
+    def get_index(self, file_path):
+        """
+        Return {'file', 'sha256', 'counts', 'segments'} for a .tex file, parsing it only when
+        its content hash has not been seen before.
+        """
+        stat = os.stat(file_path)
+        key = os.path.realpath(file_path)
+        with self._lock:
+            known = self._file_hashes.get(key)
+            if known and known[:2] == (stat.st_mtime_ns, stat.st_size) and known[2] in self._indexes:
+                self._indexes.move_to_end(known[2])
+                return self._indexes[known[2]]
+
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            self._remember(self._file_hashes, key, (stat.st_mtime_ns, stat.st_size, digest))
+            index = self._indexes.get(digest)
+        if index is None:
+            index = self._load_cached(digest)
+        if index is None:
+            segments = self.segment_text(data.decode('utf-8', errors='replace'))
+            counts = {}
+            for segment in segments:
+                counts[segment['kind']] = counts.get(segment['kind'], 0) + 1
+            index = {'sha256': digest, 'counts': counts, 'segments': segments}
+            self._store_cached(digest, index)
+            self.logger.info(f"Segmented {file_path}: {counts}")
+        index = dict(index, file=os.path.basename(file_path))
+        with self._lock:
+            self._remember(self._indexes, digest, index)
+        return index
+
+    def _load_cached(self, digest):
+        cache_path = self._cache_path(digest)
+        if not cache_path or not os.path.exists(cache_path):
+            return None
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable segment cache {cache_path}: {str(e)}")
+            return None
+
+    def _store_cached(self, digest, index):
+        cache_path = self._cache_path(digest)
+        if not cache_path:
+            return
+        tmp_file = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp_file, cache_path)
+
+    # ---- Seed rows ----
+
+    def _seed_values(self, segment, file_name):
+        kind = segment['kind']
+        context = ', '.join(part for part in (segment.get('section'), segment.get('title')) if part)
+        is_equation = kind == 'equation'
+        formula = segment['text'] if is_equation else ' '.join(
+            (match.group(1) or match.group(2)).strip() for match in self._DISPLAY_MATH.finditer(segment['text']))
+        return {
+            'task': f"latex_{kind}",
+            'instruction': self.INSTRUCTIONS.get(kind, f"State the following {kind} and explain it."),
+            'input': f"{file_name}: {context}" if context else file_name,
+            'output': '',
+            'formula': formula,
+            'solution': '',
+            'theory': '' if is_equation else segment['text'],
+            'explanation': segment.get('proof') or '',
+            'concept': segment.get('title') or '',
+            'definition': segment['text'] if kind == 'definition' else '',
+        }
+
+    def iter_seed_rows(self, file_paths, template_name, kinds=None):
+        """
+        Yield seed rows (keyed by the template's columns) for every matching segment, file by file.
+        """
+        template_schema = self.template_manager.get_schema(template_name)
+        if kinds is None:
+            kinds = self.TEMPLATE_KINDS.get(template_name)
+        for file_path in file_paths:
+            index = self.get_index(file_path)
+            for segment in index['segments']:
+                if kinds is not None and segment['kind'] not in kinds:
+                    continue
+                if kinds is None and segment['kind'] == 'proof':
+                    continue
+                values = self._seed_values(segment, index['file'])
+                yield {column: values.get(field, '') for column, field in zip(template_schema.columns, template_schema.field_names)}
+
+    def write_seed_parquet(self, file_paths, template_name, output_file, kinds=None):
+        """
+        Stream seed rows for `file_paths` into a parquet file typed by the template schema.
+
+        :return: Number of rows written
+        """
+        template_schema = self.template_manager.get_schema(template_name)
+        with ParquetRowWriter(output_file, template_schema=template_schema) as writer:
+            writer.write_rows(self.iter_seed_rows(file_paths, template_name, kinds=kinds))
+        for issue in dict.fromkeys(writer.issues):
+            self.logger.warning(f"Template '{template_name}' validation: {issue}")
+        return writer.rows_written
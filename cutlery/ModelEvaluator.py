@@ -0,0 +1,338 @@
+import os
+import re
+import json
+import time
+import string
+import hashlib
+import logging
+import argparse
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    from .OllamaInterface import OllamaInterface
+except ImportError:
+    from OllamaInterface import OllamaInterface
+
+_PUNCTUATION = string.punctuation.replace('/', '').replace('-', '').replace('_', '')
+_TOKEN = re.compile(r"[/\w][\w\-/.]*")
+
+def normalize_text(text):
+    """
+    Lowercase, drop quotes and punctuation (keeping the `/`, `-` and `_` that commands use)
+    and collapse whitespace.
+    """
+    text = str(text or '').lower()
+    text = text.translate(str.maketrans(_PUNCTUATION, ' ' * len(_PUNCTUATION)))
+    return ' '.join(text.split())
+
+def tokenize(text):
+    return _TOKEN.findall(normalize_text(text))
+
+def exact_match(prediction, target):
+    return float(str(prediction or '').strip() == str(target or '').strip())
+
+def normalized_match(prediction, target):
+    return float(normalize_text(prediction) == normalize_text(target))
+
+def contains_match(prediction, target):
+    target_tokens = tokenize(target)
+    if not target_tokens:
+        return 0.0
+    prediction_tokens = tokenize(prediction)
+    size = len(target_tokens)
+    return float(any(prediction_tokens[i:i + size] == target_tokens for i in range(len(prediction_tokens) - size + 1)))
+
+def token_f1(prediction, target):
+    prediction_tokens, target_tokens = tokenize(prediction), tokenize(target)
+    if not prediction_tokens or not target_tokens:
+        return float(prediction_tokens == target_tokens)
+    overlap = sum((Counter(prediction_tokens) & Counter(target_tokens)).values())
+    if not overlap:
+        return 0.0
+    precision, recall = overlap / len(prediction_tokens), overlap / len(target_tokens)
+    return 2 * precision * recall / (precision + recall)
+
+# name: function(prediction, target) -> score in [0, 1]
+METRICS = {
+    'exact': exact_match,
+    'normalized': normalized_match,
+    'contains': contains_match,
+    'token_f1': token_f1,
+}
+
+class ModelEvaluator:
+    """
+    Score an Ollama model against a validation dish (e.g. OARC_Commander_v001_validation).
+
+    Each row becomes a chat with the `instruction` column as the system message and `input`
+    as the user message; the reply is compared with the `command` column using every metric in
+    METRICS, averaged overall and per `task`. The dish is streamed in record batches and rows
+    are queried on a thread pool (Ollama serves them in parallel up to OLLAMA_NUM_PARALLEL).
+
+    Replies are cached in a `<model>.predictions.jsonl` file under `cache_dir`, keyed by model,
+    messages and generation options, so evaluating again (with new metrics, another target
+    column or after an interruption) only queries the rows that were never answered.
+    """
+
+    def __init__(self, ollama_interface=None, cache_dir='evaluations', max_workers=4, batch_size=256,
+                 options=None, metrics=None):
+        self.ollama_interface = ollama_interface or OllamaInterface(None)
+        self.cache_dir = cache_dir
+        self.max_workers = max(1, max_workers)
+        self.batch_size = batch_size
+        # Greedy decoding so scores are reproducible and cached replies stay valid
+        self.options = {'temperature': 0} if options is None else options
+        self.metrics = dict(METRICS) if metrics is None else metrics
+        self.logger = logging.getLogger(__name__)
+        self._cache_lock = threading.Lock()
+        self._caches = {}
+
+    def cache_path(self, model):
+        safe_name = re.sub(r'[^\w.-]+', '_', model)
+        return os.path.join(self.cache_dir, f"{safe_name}.predictions.jsonl")
+
+    def _cache_key(self, model, messages):
+        payload = json.dumps([model, messages, self.options], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _load_cache(self, model):
+        with self._cache_lock:
+            if model in self._caches:
+                return self._caches[model]
+            cache = {}
+            path = self.cache_path(model)
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except json.JSONDecodeError:
+                            # A line cut off by an interrupted run
+                            continue
+                        cache[entry['key']] = entry['prediction']
+            self._caches[model] = cache
+            return cache
+
+    def _store(self, model, entries):
+        if not entries:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self._cache_lock:
+            self._caches.setdefault(model, {}).update((entry['key'], entry['prediction']) for entry in entries)
+            with open(self.cache_path(model), 'a', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def build_messages(self, row, system_column='instruction', input_column='input'):
+        messages = []
+        if system_column and row.get(system_column):
+            messages.append({'role': 'system', 'content': str(row[system_column])})
+        messages.append({'role': 'user', 'content': str(row.get(input_column) or '')})
+        return messages
+
+    def _query(self, interface, messages):
+        start = time.perf_counter()
+        prediction = interface.complete(messages, options=self.options)
+        return prediction.strip(), time.perf_counter() - start
+
+    def predict(self, rows, model, system_column='instruction', input_column='input'):
+        """
+        Attach a `prediction` to each row, querying only rows missing from the cache.
+
+        :return: Tuple of (rows, number of model queries, seconds spent in queries)
+        """
+        cache = self._load_cache(model)
+        keys = [self._cache_key(model, self.build_messages(row, system_column, input_column)) for row in rows]
+        missing = {}
+        for row, key in zip(rows, keys):
+            if key not in cache and key not in missing:
+                missing[key] = self.build_messages(row, system_column, input_column)
+
+        entries, query_seconds = [], 0.0
+        if missing:
+            interface = self.ollama_interface if self.ollama_interface.model == model else OllamaInterface(model)
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {key: executor.submit(self._query, interface, messages) for key, messages in missing.items()}
+                for key, future in futures.items():
+                    try:
+                        prediction, seconds = future.result()
+                    except Exception as e:
+                        # Not cached, so the row is retried on the next run
+                        self.logger.error(f"Query failed for {model}: {e}")
+                        continue
+                    query_seconds += seconds
+                    entries.append({'key': key, 'prediction': prediction, 'seconds': round(seconds, 3)})
+            self._store(model, entries)
+
+        for row, key in zip(rows, keys):
+            row['prediction'] = cache.get(key)
+        return rows, len(entries), query_seconds
+
+    def score_rows(self, rows, summary, target_column='command', task_column='task'):
+        """
+        Add one column per metric to each row and accumulate totals into `summary`.
+        Rows without a prediction (failed queries) are counted but not scored.
+        """
+        for row in rows:
+            task = str(row.get(task_column) or 'all') if task_column else 'all'
+            groups = [summary['overall'], summary['tasks'].setdefault(task, self._empty_totals())]
+            for totals in groups:
+                totals['rows'] += 1
+            if row.get('prediction') is None:
+                for totals in groups:
+                    totals['missing'] += 1
+                continue
+            for name, metric in self.metrics.items():
+                value = metric(row['prediction'], row.get(target_column))
+                row[name] = value
+                for totals in groups:
+                    totals['sums'][name] = totals['sums'].get(name, 0.0) + value
+                    totals['scored'][name] = totals['scored'].get(name, 0) + 1
+        return rows
+
+    def _empty_totals(self):
+        return {'rows': 0, 'missing': 0, 'sums': {}, 'scored': {}}
+
+    def _finish(self, summary):
+        def averages(totals):
+            result = {'rows': totals['rows'], 'missing': totals['missing']}
+            for name in self.metrics:
+                scored = totals['scored'].get(name, 0)
+                result[name] = round(totals['sums'].get(name, 0.0) / scored, 4) if scored else None
+            return result
+        return {'overall': averages(summary['overall']),
+                'tasks': {task: averages(totals) for task, totals in sorted(summary['tasks'].items())}}
+
+    def evaluate(self, dataset_file, model, output_file=None, target_column='command', task_column='task',
+                 system_column='instruction', input_column='input', limit=None):
+        """
+        Stream `dataset_file`, query the model for rows not in the cache and score every row.
+
+        :param output_file: Optional parquet to write the rows with their prediction and per-metric scores
+            (a string `prediction` column and one float64 column per metric, replacing any already
+            in the dataset)
+        :return: Report dict with overall and per-task averages and throughput
+        """
+        parquet_file = pq.ParquetFile(dataset_file)
+        source_schema = parquet_file.schema_arrow
+        if target_column not in source_schema.names:
+            raise ValueError(f"Target column '{target_column}' not found in {dataset_file}")
+        if task_column not in source_schema.names:
+            task_column = None
+        # The output schema is fixed up front, so a first batch of failed queries (all-null
+        # predictions and no scores) cannot decide the column types
+        kept = [name for name in source_schema.names if name != 'prediction' and name not in self.metrics]
+        output_schema = pa.schema(
+            [source_schema.field(name) for name in kept]
+            + [pa.field('prediction', pa.string())]
+            + [pa.field(name, pa.float64()) for name in self.metrics],
+            metadata=source_schema.metadata,
+        )
+
+        start = time.perf_counter()
+        summary = {'overall': self._empty_totals(), 'tasks': {}}
+        rows_done = queries = 0
+        query_seconds = 0.0
+        writer = pq.ParquetWriter(output_file, output_schema) if output_file else None
+        try:
+            for batch in parquet_file.iter_batches(batch_size=self.batch_size):
+                if limit is not None:
+                    batch = batch.slice(0, max(limit - rows_done, 0))
+                if not batch.num_rows:
+                    break
+                batch = batch.select(kept)
+                rows, batch_queries, batch_seconds = self.predict(batch.to_pylist(), model, system_column, input_column)
+                self.score_rows(rows, summary, target_column, task_column)
+                if writer is not None:
+                    columns = batch.columns + [pa.array([row['prediction'] for row in rows], pa.string())]
+                    columns += [pa.array([None if row.get(name) is None else float(row[name]) for row in rows], pa.float64())
+                                for name in self.metrics]
+                    writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=output_schema))
+                rows_done += len(rows)
+                queries += batch_queries
+                query_seconds += batch_seconds
+                self.logger.info(f"Evaluated {rows_done} rows ({queries} queried)")
+        finally:
+            if writer is not None:
+                writer.close()
+
+        elapsed = time.perf_counter() - start
+        report = self._finish(summary)
+        report.update({
+            'dataset': os.path.basename(dataset_file),
+            'model': model,
+            'target_column': target_column,
+            'output_file': output_file,
+            'queries': queries,
+            'cached': rows_done - queries - report['overall']['missing'],
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(rows_done / elapsed, 2) if elapsed else None,
+            'average_query_seconds': round(query_seconds / queries, 3) if queries else None,
+        })
+        return report
+
+    def score_file(self, predictions_file, target_column='command', task_column='task'):
+        """
+        Re-score a predictions parquet written by `evaluate` without touching the model.
+        """
+        parquet_file = pq.ParquetFile(predictions_file)
+        names = parquet_file.schema_arrow.names
+        if 'prediction' not in names or target_column not in names:
+            raise ValueError(f"{predictions_file} needs 'prediction' and '{target_column}' columns")
+        columns = ['prediction', target_column] + ([task_column] if task_column in names else [])
+        summary = {'overall': self._empty_totals(), 'tasks': {}}
+        for batch in parquet_file.iter_batches(batch_size=self.batch_size, columns=columns):
+            self.score_rows(batch.to_pylist(), summary, target_column, task_column if task_column in names else None)
+        report = self._finish(summary)
+        report.update({'predictions_file': os.path.basename(predictions_file), 'target_column': target_column})
+        return report
+
+def _print_report(report):
+    metric_names = [name for name in report['overall'] if name not in ('rows', 'missing')]
+    print(f"{'task':32} {'rows':>6} " + ' '.join(f"{name:>10}" for name in metric_names))
+    for task, scores in list(report['tasks'].items()) + [('OVERALL', report['overall'])]:
+        values = ' '.join(f"{scores[name]:10.4f}" if scores[name] is not None else f"{'-':>10}" for name in metric_names)
+        print(f"{task[:32]:32} {scores['rows']:6} {values}")
+    if 'seconds' in report:
+        print(f"{report['queries']} queried, {report['cached']} cached, {report['overall']['missing']} failed "
+              f"in {report['seconds']:.1f}s ({report['rows_per_second']} rows/s)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Score an Ollama model against a validation parquet")
+    parser.add_argument("dataset", help="Validation parquet, or a predictions parquet with --rescore")
+    parser.add_argument("--model", help="Ollama model to evaluate")
+    parser.add_argument("--target", default="command", help="Column the reply is compared with")
+    parser.add_argument("--task_column", default="task")
+    parser.add_argument("--system_column", default="instruction")
+    parser.add_argument("--input_column", default="input")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent model queries")
+    parser.add_argument("--limit", type=int, help="Only the first N rows")
+    parser.add_argument("--cache_dir", default=os.path.join("agent_chef_data", "evaluations"))
+    parser.add_argument("--output", help="Parquet to write rows with predictions and scores")
+    parser.add_argument("--report", help="Write the JSON report here")
+    parser.add_argument("--rescore", action="store_true", help="Score an existing predictions parquet without querying")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    evaluator = ModelEvaluator(cache_dir=args.cache_dir, max_workers=args.workers)
+    if args.rescore:
+        report = evaluator.score_file(args.dataset, target_column=args.target, task_column=args.task_column)
+    else:
+        if not args.model:
+            parser.error("--model is required unless --rescore is given")
+        report = evaluator.evaluate(args.dataset, args.model, output_file=args.output, target_column=args.target,
+                                    task_column=args.task_column, system_column=args.system_column,
+                                    input_column=args.input_column, limit=args.limit)
+    _print_report(report)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,12 +1,20 @@
-import ollama
 import json
 from colorama import Fore, Back, Style
 from colorama import init
+from .StructuredOutput import StructuredOutput
 init(autoreset=True)
 
+def _ollama():
+    # Imported on first request: the ollama client (and httpx) is slow to import and most
+    # processes that construct an OllamaInterface never chat
+    import ollama
+    return ollama
+
 class OllamaInterface:
     def __init__(self, model):
         self.model = model
+        # Compiled validators, keyed by schema and retry count
+        self._structured = {}
 
     def set_model(self, model):
         self.model = model
@@ -17,11 +25,11 @@ class OllamaInterface:
     def chat(self, messages):
         try:
             if self.is_llama_3_1():
-                response = ollama.chat(model=self.model, messages=messages)
+                response = _ollama().chat(model=self.model, messages=messages)
                 print(f"{Fore.YELLOW}Model Response:{Style.RESET_ALL} {response['message']['content']}")
                 return response
             else:
-                response = ollama.chat(model=self.model, messages=messages)
+                response = _ollama().chat(model=self.model, messages=messages)
                 content = response['message']['content']
                 print(f"{Fore.YELLOW}Model Response:{Style.RESET_ALL} {content}")
                 return {"message": {"content": content}}
@@ -29,22 +37,52 @@ class OllamaInterface:
             print(f"{Fore.RED}Error in Ollama chat: {str(e)}{Style.RESET_ALL}")
             return {"message": {"content": f"Error: {str(e)}"}}
 
-    def chat_json(self, messages):
+    def complete(self, messages, options=None):
+        """
+        Return the reply text only, without printing it. Unlike `chat`, errors are raised
+        rather than returned as content, so batch callers never mistake them for a reply.
+
+        :param options: Ollama generation options, e.g. {'temperature': 0}
+        """
+        response = _ollama().chat(model=self.model, messages=messages, options=options)
+        return response['message']['content']
+
+    def chat_json(self, messages, schema=None, max_retries=2):
+        """
+        Chat in JSON mode and return the parsed reply, or None if it is not valid JSON.
+
+        :param schema: Optional JSON schema sent as the `format`, constraining the reply; fields
+            that still fail validation are retried on their own up to `max_retries` times
+        """
         try:
-            if self.is_llama_3_1():
-                response = ollama.chat(model=self.model, messages=messages, format='json')
-                return response.json
-            else:
-                response = ollama.chat(model=self.model, messages=messages)
-                try:
-                    return json.loads(response['message']['content'])
-                except json.JSONDecodeError:
-                    print(f"{Fore.RED}Error: Response is not valid JSON{Style.RESET_ALL}")
+            if schema is not None:
+                value, errors = self.chat_structured(messages, schema, max_retries=max_retries)
+                if errors:
+                    print(f"{Fore.RED}Error: Response does not match the schema: {errors[:5]}{Style.RESET_ALL}")
                     return None
+                return value
+            response = _ollama().chat(model=self.model, messages=messages, format='json')
+            try:
+                return json.loads(response['message']['content'])
+            except json.JSONDecodeError:
+                print(f"{Fore.RED}Error: Response is not valid JSON{Style.RESET_ALL}")
+                return None
         except Exception as e:
             print(f"{Fore.RED}Error in Ollama chat JSON mode: {str(e)}{Style.RESET_ALL}")
             return None
 
+    def chat_structured(self, messages, schema, max_retries=2):
+        """
+        Schema-constrained chat; see StructuredOutput.
+
+        :return: Tuple of (value, errors)
+        """
+        key = (json.dumps(schema, sort_keys=True), max_retries)
+        structured = self._structured.get(key)
+        if structured is None:
+            structured = self._structured[key] = StructuredOutput(schema, max_retries=max_retries)
+        return structured.generate(lambda messages, format: _ollama().chat(model=self.model, messages=messages, format=format), messages)
+
     def list_models(self):
-        models = ollama.list()
-        return [model['name'] for model in models['models']]
\ No newline at end of file
+        models = _ollama().list()
+        return [model['model'] for model in models['models']]
\ No newline at end of file
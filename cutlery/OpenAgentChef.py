@@ -18,9 +18,16 @@ import pandas as pd
 from tqdm import tqdm
 import os
 import json
-from datasets import load_dataset
+import itertools
+import threading
+import pyarrow as pa
+import pyarrow.parquet as pq
+from concurrent.futures import ThreadPoolExecutor
 from halo import Halo
 from colorama import init, Fore, Style
+from .HuggingFaceDatasetSource import HuggingFaceDatasetSource
+from .ParquetRowWriter import ParquetRowWriter
+from .StructuredOutput import StructuredOutput
 
 # Initialize colorama
 init(autoreset=True)
@@ -31,7 +38,8 @@ init(autoreset=True)
 # c. SHOULD BE ABLE TO PROVIDE SYSTEM PROMPT FOR MODEL, either load exisiting system prompt from library or make new.
 
 class Open_Agent_Chef:
-    def __init__(self, dataset_params=None, seed_file=None, mode='custom', user_json=None): 
+    def __init__(self, dataset_params=None, seed_file=None, mode='custom', user_json=None, hf_options=None,
+                 max_workers=4, duplicates=10, row_group_size=100, structured=True, max_retries=2): 
         
         self.base_dir = r"D:\CodingGit_StorageHDD\Ollama_Custom_Mods\Agent_Chef\agent_chef_data"
         self.latex_dir = os.path.join(self.base_dir, "latex_library")
@@ -62,6 +70,21 @@ class Open_Agent_Chef:
         self.seed_file = seed_file
         # self.mode = mode
         self.user_json = user_json
+        # Hugging Face streaming options: split, columns, limit, num_shards, shard_index, batch_size
+        self.hf_options = hf_options or {}
+        # Concurrent model requests, synthetic copies per seed row, and rows per parquet row group
+        self.max_workers = max(1, max_workers)
+        self.duplicates = duplicates
+        self.row_group_size = row_group_size
+        # One client (and HTTP connection pool) shared by all worker threads
+        self.client = ollama.Client()
+        # Row and field pools both issue requests; this caps the total at max_workers
+        self._requests = threading.BoundedSemaphore(self.max_workers)
+        self._row_pool = self._field_pool = None
+        # Schema-constrained data points: one request per row, retrying only the failed fields
+        self.structured = structured
+        self.max_retries = max_retries
+        self._structured_outputs = {}
         self.template = None  # Will store the structure template
         self.system_prompt = None  # Will store the system prompt
         os.makedirs(self.input_dir, exist_ok=True)
@@ -86,23 +109,6 @@ class Open_Agent_Chef:
                     },
                 },
             },
-            {
-                'type': 'function',
-                'function': {
-                    'name': 'load_dataset',
-                    'description': 'Load a dataset from Hugging Face',
-                    'parameters': {
-                        'type': 'object',
-                        'properties': {
-                            'dataset_name': {
-                                'type': 'string',
-                                'description': 'The name of the dataset on Hugging Face',
-                            },
-                        },
-                        'required': ['dataset_name'],
-                    },
-                },
-            },
         ]
 
     def load_json_file(self, filename):
@@ -123,84 +129,253 @@ class Open_Agent_Chef:
         df.to_parquet(file_path, engine='pyarrow')
         return file_path
 
-    def clone_huggingface_dataset(self, dataset_name):
-        response = ollama.chat(
-            model=self.model,
-            messages=[
-                {'role': 'system', 'content': 'You are a data loading assistant.'},
-                {'role': 'user', 'content': f"Load the dataset '{dataset_name}' from Hugging Face"}
+    def clone_huggingface_dataset(self, dataset_name, **options):
+        """
+        Stream a Hugging Face dataset (hub name, `save_to_disk` directory or `.arrow` file) as
+        record batches instead of loading the whole train split into a DataFrame.
+
+        :param options: HuggingFaceDatasetSource options (split, columns, limit, num_shards,
+            shard_index, batch_size), defaulting to `self.hf_options`
+        """
+        options = {**self.hf_options, **options}
+        return HuggingFaceDatasetSource(dataset_name, **options).iter_batches()
+
+    def iter_rows(self, data):
+        """
+        Yield row dicts from a DataFrame, a list of dicts or an iterable of Arrow record batches.
+        """
+        if isinstance(data, pd.DataFrame):
+            for _, row in data.iterrows():
+                yield row.to_dict()
+            return
+        for item in data:
+            if isinstance(item, (pa.RecordBatch, pa.Table)):
+                yield from item.to_pylist()
+            else:
+                yield item
+
+    def _chat(self, messages, **kwargs):
+        with self._requests:
+            return self.client.chat(model=self.model, messages=messages, **kwargs)
+
+    @staticmethod
+    def _text(value):
+        # Generated values may be parsed JSON; store them as JSON text in string columns
+        if value is None or isinstance(value, str):
+            return value
+        return json.dumps(value, ensure_ascii=False)
+
+    def dataset_schema(self):
+        """
+        Arrow schema of `generate_dataset` rows: the seed data's columns followed by the
+        generated fields, which are always strings.
+        """
+        names = [field['name'] for field in self.dataset_params['fields']]
+        seed_data = getattr(self, 'seed_data', None)
+        seed_fields = list(pa.Schema.from_pandas(seed_data, preserve_index=False)) if seed_data is not None else []
+        fields = [pa.field(field.name, pa.string()) if field.name in names else field for field in seed_fields]
+        seed_names = {field.name for field in seed_fields}
+        return pa.schema(fields + [pa.field(name, pa.string()) for name in names if name not in seed_names])
+
+    def synthetic_schema(self, columns):
+        """
+        Arrow schema of `generate_synthetic_data` rows, whose paraphrased values are all strings.
+        """
+        return pa.schema([pa.field(column, pa.string()) for column in columns])
+
+    def source_columns(self, data):
+        """
+        Return the columns of synthetic source data and the data to use from then on; an
+        iterable of record batches is peeked at, so it must not be iterated again.
+        """
+        if isinstance(data, pd.DataFrame):
+            return [str(column) for column in data.columns], data
+        if isinstance(data, list):
+            return list({key: None for row in data for key in row}), data
+        data = iter(data)
+        first = next(data, None)
+        if first is None:
+            return [], []
+        if isinstance(first, (pa.RecordBatch, pa.Table)):
+            columns = first.schema.names
+        else:
+            columns = list(first)
+        return columns, itertools.chain([first], data)
+
+    def parse_json_response(self, name, text):
+        """
+        Parse a model reply as JSON, falling back to the raw text when it is not valid JSON.
+        """
+        text = text.strip() if isinstance(text, str) else text
+        if not isinstance(text, str):
+            return text
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            print(f"Failed to parse JSON for {name}. Using raw response.")
+            return text
+
+    def generate_field(self, field):
+        prompt = f"Generate data for {field['name']}: {field['prompt']}"
+        response = self._chat(
+            [
+                {'role': 'system', 'content': 'You are a data generation assistant. Respond only with the requested data point as a valid JSON object, nothing else.'},
+                {'role': 'user', 'content': prompt}
             ],
             tools=self.tools
         )
-        
-        if 'tool_calls' in response['message']:
+
+        if response['message'].get('tool_calls'):
             tool_call = response['message']['tool_calls'][0]
-            if tool_call['function']['name'] == 'load_dataset':
-                # Here we're still using the actual load_dataset function
-                # In a full implementation, you might want to handle this differently
-                dataset = load_dataset(dataset_name)
-                return dataset['train'].to_pandas()
-        
-        # Fallback to the original method if the tool wasn't used
-        dataset = load_dataset(dataset_name)
-        return dataset['train'].to_pandas()
+            if tool_call['function']['name'] == 'generate_random_data':
+                return self.parse_json_response(field['name'], tool_call['function']['arguments'])
+            return None
+        return self.parse_json_response(field['name'], response['message']['content'])
 
-    def generate_data_point(self, fields):
-        data_point = {}
-        for field in fields:
-            prompt = f"Generate data for {field['name']}: {field['prompt']}"
-            response = ollama.chat(
-                model=self.model,
-                messages=[
-                    {'role': 'system', 'content': 'You are a data generation assistant. Respond only with the requested data point as a valid JSON object, nothing else.'},
-                    {'role': 'user', 'content': prompt}
-                ],
-                tools=self.tools
-            )
-            
-            if 'tool_calls' in response['message']:
-                tool_call = response['message']['tool_calls'][0]
-                if tool_call['function']['name'] == 'generate_random_data':
-                    try:
-                        data_point[field['name']] = json.loads(tool_call['function']['arguments'])
-                    except json.JSONDecodeError:
-                        print(f"Failed to parse JSON for {field['name']}. Using raw response.")
-                        data_point[field['name']] = tool_call['function']['arguments']
-            else:
-                try:
-                    data_point[field['name']] = json.loads(response['message']['content'].strip())
-                except json.JSONDecodeError:
-                    print(f"Failed to parse JSON for {field['name']}. Using raw response.")
-                    data_point[field['name']] = response['message']['content'].strip()
-        return data_point
-
-    def generate_dataset(self):
-        dataset = []
-        if hasattr(self, 'seed_data') and self.seed_data is not None:
-            dataset.extend(self.seed_data.to_dict(orient='records'))
-            remaining_size = self.dataset_params['size'] - len(dataset)
+    def _map_fields(self, func, items):
+        # Fields of one row go out concurrently on the shared field pool; _chat still caps the requests
+        if self._field_pool is None or len(items) < 2:
+            return [func(item) for item in items]
+        return list(self._field_pool.map(func, items))
+
+    def _iter_ordered(self, func, items):
+        """
+        Run `func` over `items` on the row pool and yield results in input order, keeping at
+        most twice the pool size in flight so an unbounded input is never queued whole.
+        """
+        if self._row_pool is None:
+            for item in items:
+                yield func(item)
+            return
+        pending = []
+        for item in items:
+            pending.append(self._row_pool.submit(func, item))
+            if len(pending) >= 2 * self.max_workers:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+    def _run(self, rows, writer):
+        """
+        Write rows to `writer` if given (returning the count), otherwise collect them in a list.
+        """
+        if writer is None:
+            return list(rows)
+        count = 0
+        for row in rows:
+            writer.write_row(row)
+            count += 1
+        return count
+
+    def _open_pools(self):
+        if self.max_workers > 1:
+            self._row_pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='chef-row')
+            self._field_pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='chef-field')
         else:
-            remaining_size = self.dataset_params['size']
-
-        for _ in tqdm(range(remaining_size), desc="Generating dataset"):
-            data_point = self.generate_data_point(self.dataset_params['fields'])
-            dataset.append(data_point)
-        return dataset
-
-    def generate_synthetic_data(self, original_data):
-        synthetic_data = []
-        for _, row in tqdm(original_data.iterrows(), desc="Generating synthetic data"):
-            for _ in range(10):  # Generate 10 duplicates for each data point
-                synthetic_row = {}
-                for column in original_data.columns:
-                    prompt = f"Generate a similar but different {column} based on: {row[column]}. Maintain the same meaning but use different phrasing."
-                    response = ollama.chat(model=self.model, messages=[
-                        {'role': 'system', 'content': 'You are a data generation assistant. Respond only with the requested data point, nothing else.'},
-                        {'role': 'user', 'content': prompt}
-                    ])
-                    synthetic_row[column] = response['message']['content'].strip()
-                synthetic_data.append(synthetic_row)
-        return synthetic_data
+            self._row_pool = self._field_pool = None
+
+    def _close_pools(self):
+        for pool in (self._row_pool, self._field_pool):
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=True)
+        self._row_pool = self._field_pool = None
+
+    def structured_output(self, fields):
+        key = tuple(json.dumps(field, sort_keys=True) for field in fields)
+        structured = self._structured_outputs.get(key)
+        if structured is None:
+            structured = self._structured_outputs[key] = StructuredOutput(StructuredOutput.for_fields(fields), max_retries=self.max_retries)
+        return structured
+
+    def generate_structured_data_point(self, fields):
+        """
+        Generate all fields in one request whose reply is constrained to a JSON schema built
+        from the field specs (a field may give its own `schema`); invalid fields are regenerated.
+        """
+        structured = self.structured_output(fields)
+        field_list = '\n'.join(f"- {field['name']}: {field['prompt']}" for field in fields)
+        messages = [
+            {'role': 'system', 'content': self.system_prompt or 'You are a data generation assistant. Respond only with the requested data point as a valid JSON object, nothing else.'},
+            {'role': 'user', 'content': f"Generate one data point as a JSON object with these fields:\n{field_list}"}
+        ]
+        value, errors = structured.generate(lambda messages, format: self._chat(messages, format=format), messages)
+        if errors:
+            print(f"{Fore.RED}Data point still invalid after {self.max_retries} retries: {errors[:5]}")
+        return value if isinstance(value, dict) else {}
+
+    def generate_data_point(self, fields):
+        if self.structured:
+            return self.generate_structured_data_point(fields)
+        values = self._map_fields(self.generate_field, fields)
+        return {field['name']: value for field, value in zip(fields, values) if value is not None}
+
+    def generate_dataset(self, writer=None):
+        """
+        Generate `dataset_params['size']` rows, seed rows first.
+
+        :param writer: Optional ParquetRowWriter to stream rows into, opened with
+            `dataset_schema()`; the row count is then returned instead of a list
+        """
+        fields = self.dataset_params['fields']
+        names = [field['name'] for field in fields]
+
+        def rows():
+            produced = 0
+            if hasattr(self, 'seed_data') and self.seed_data is not None:
+                for row in self.seed_data.to_dict(orient='records'):
+                    produced += 1
+                    yield {**row, **{name: self._text(row[name]) for name in names if name in row}}
+            remaining_size = self.dataset_params['size'] - produced
+            points = self._iter_ordered(lambda _: self.generate_data_point(fields), range(max(remaining_size, 0)))
+            for point in tqdm(points, total=max(remaining_size, 0), desc="Generating dataset"):
+                yield {name: self._text(point.get(name)) for name in names}
+
+        self._open_pools()
+        try:
+            return self._run(rows(), writer)
+        finally:
+            self._close_pools()
+
+    def synthesize_row(self, row):
+        def synthesize(column):
+            prompt = f"Generate a similar but different {column} based on: {row[column]}. Maintain the same meaning but use different phrasing."
+            response = self._chat([
+                {'role': 'system', 'content': 'You are a data generation assistant. Respond only with the requested data point, nothing else.'},
+                {'role': 'user', 'content': prompt}
+            ])
+            return response['message']['content'].strip()
+
+        columns = list(row)
+        return dict(zip(columns, self._map_fields(synthesize, columns)))
+
+    def generate_synthetic_data(self, original_data, writer=None):
+        """
+        Generate `duplicates` paraphrased copies of every row of `original_data` (a DataFrame,
+        list of dicts or iterable of record batches), `max_workers` model requests at a time.
+
+        :param writer: Optional ParquetRowWriter to stream rows into, opened with
+            `synthetic_schema(columns)`; the row count is then returned instead of a list
+        """
+        def copies():
+            for row in self.iter_rows(original_data):
+                for _ in range(self.duplicates):
+                    yield row
+
+        self._open_pools()
+        try:
+            rows = tqdm(self._iter_ordered(self.synthesize_row, copies()), desc="Generating synthetic data")
+            return self._run(rows, writer)
+        finally:
+            self._close_pools()
+
+    def open_writer(self, filename, schema=None):
+        """
+        Open a ParquetRowWriter in the output directory for generated rows.
+
+        :param schema: Arrow schema of the rows (see `dataset_schema` and `synthetic_schema`);
+            without it the first row group decides the file's schema
+        """
+        return ParquetRowWriter(os.path.join(self.output_dir, filename), schema=schema, row_group_size=self.row_group_size)
 
     def save_json_to_parquet(self):
         json_path = os.path.join(self.input_dir, self.user_json)
@@ -215,11 +390,15 @@ class Open_Agent_Chef:
             print(f"{Fore.RED}JSON file {self.user_json} not found in the ingredients directory.")
             return None
         
-    def save_to_parquet(self, dataset, filename='dataset.parquet'):
+    def dish_filename(self, filename='dataset.parquet'):
         # TODO: Implement unique naming scheme derived from base JSON name
         if self.user_json:
             base_name = os.path.splitext(self.user_json)[0]
             filename = f"{base_name}_dish.parquet"
+        return filename
+
+    def save_to_parquet(self, dataset, filename='dataset.parquet'):
+        filename = self.dish_filename(filename)
         file_path = os.path.join(self.output_dir, filename)
         df = pd.DataFrame(dataset)
         df.to_parquet(file_path, engine='pyarrow')
@@ -381,26 +560,38 @@ class Open_Agent_Chef:
         spinner.start()
 
         try:
-            if self.mode == 'custom':
-                print(Fore.GREEN + "Preparing a fresh synthetic dataset...")
-                dataset = self.generate_dataset()
-            elif self.mode == 'huggingface':
-                print(Fore.GREEN + f"Fetching Hugging Face dataset: {self.dataset_name}")
-                original_data = self.clone_huggingface_dataset(self.dataset_name)
-                print(Fore.GREEN + "Adding our special sauce to create a synthetic dataset...")
-                dataset = self.generate_synthetic_data(original_data)
-            elif self.mode == 'json':
+            if self.mode == 'json':
                 print(Fore.GREEN + f"Transforming JSON ingredients into Parquet: {self.user_json}")
                 parquet_file = self.save_json_to_parquet()
                 if not parquet_file:
                     raise ValueError("Failed to process JSON ingredients.")
-                print(Fore.GREEN + f"Cooking up a synthetic dataset from the ingredients in {parquet_file}...")
-                original_data = pd.read_parquet(parquet_file)
-                dataset = self.generate_synthetic_data(original_data)
 
-            saved_path = self.save_to_parquet(dataset)
+            if self.mode == 'custom':
+                schema = self.dataset_schema()
+            elif self.mode == 'huggingface':
+                print(Fore.GREEN + f"Fetching Hugging Face dataset: {self.dataset_name}")
+                columns, original_data = self.source_columns(self.clone_huggingface_dataset(self.dataset_name))
+                schema = self.synthetic_schema(columns)
+            elif self.mode == 'json':
+                source = pq.ParquetFile(parquet_file)
+                original_data = source.iter_batches()
+                schema = self.synthetic_schema(source.schema_arrow.names)
+
+            # Rows are streamed into the dish as they are generated
+            with self.open_writer(self.dish_filename(), schema=schema) as writer:
+                if self.mode == 'custom':
+                    print(Fore.GREEN + "Preparing a fresh synthetic dataset...")
+                    count = self.generate_dataset(writer)
+                elif self.mode == 'huggingface':
+                    print(Fore.GREEN + "Adding our special sauce to create a synthetic dataset...")
+                    count = self.generate_synthetic_data(original_data, writer)
+                elif self.mode == 'json':
+                    print(Fore.GREEN + f"Cooking up a synthetic dataset from the ingredients in {parquet_file}...")
+                    count = self.generate_synthetic_data(original_data, writer)
+
+            saved_path = writer.output_file
             spinner.stop()
-            print(Fore.BLUE + f"A delicious dataset with {len(dataset)} entries has been served in Parquet format at: {saved_path}")
+            print(Fore.BLUE + f"A delicious dataset with {count} entries has been served in Parquet format at: {saved_path}")
         
         except Exception as e:
             spinner.stop()
@@ -409,17 +600,17 @@ class Open_Agent_Chef:
 
     def main(self):
         try:
+            # Checked before the writer exists, so no empty dish is left behind
+            if self.mode not in ('custom', 'huggingface'):
+                raise ValueError(f"Unsupported mode: {self.mode} (expected 'custom' or 'huggingface')")
             if self.mode == 'custom':
-                json_data = self.load_json_file(self.user_json)
-                dataset = self.generate_synthetic_data(json_data)
-            elif self.mode == 'huggingface':
-                original_data = load_dataset(self.dataset_name)['train'].to_pandas()
-                dataset = self.generate_synthetic_data(original_data)
-            elif self.mode == 'latex':
-                # Implement latex processing logic here
-                pass
-            
-            saved_path = self.save_to_parquet(dataset, f"{self.mode}_output.parquet")
+                columns, original_data = self.source_columns(self.load_json_file(self.user_json))
+            else:
+                columns, original_data = self.source_columns(self.clone_huggingface_dataset(self.dataset_name))
+            with self.open_writer(self.dish_filename(f"{self.mode}_output.parquet"), schema=self.synthetic_schema(columns)) as writer:
+                self.generate_synthetic_data(original_data, writer)
+
+            saved_path = writer.output_file
             return f"Dataset saved to {saved_path}"
         except Exception as e:
             return f"An error occurred: {str(e)}"
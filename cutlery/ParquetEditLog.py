@@ -0,0 +1,313 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import logging
+import threading
+import pandas as pd
+import pyarrow as pa
+from filelock import FileLock
+
+class _PathLock:
+    """
+    A thread lock plus a file lock next to the edit log, so appends and compactions are
+    serialized across threads and across server worker processes.
+    """
+
+    def __init__(self, lock_file):
+        self._thread_lock = threading.RLock()
+        # Re-entrancy is tracked by the thread lock, so the file lock is shared by all threads
+        self._file_lock = FileLock(lock_file, thread_local=False)
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            self._file_lock.acquire()
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self._file_lock.release()
+        finally:
+            self._thread_lock.release()
+        return False
+
+class ParquetEditLog:
+    """
+    Append-only cell edit log kept next to a parquet file as a `.edits.jsonl` sidecar.
+
+    Saving edits only appends one JSON line per changed cell, readers overlay the pending
+    edits onto the rows they return, and compaction folds the log back into the parquet
+    file (on demand or in a background thread once the log grows past `compact_threshold`).
+    """
+
+    SUFFIX = '.edits.jsonl'
+
+    def __init__(self, compact_threshold=5000):
+        self.compact_threshold = compact_threshold
+        self.logger = logging.getLogger(__name__)
+        self._guard = threading.Lock()
+        self._locks = {}
+        self._compact_locks = {}
+        self._cache = {}
+        self._compacting = set()
+
+    def log_path(self, parquet_path):
+        return f"{parquet_path}{self.SUFFIX}"
+
+    def _lock_for(self, parquet_path):
+        key = os.path.abspath(parquet_path)
+        with self._guard:
+            if key not in self._locks:
+                self._locks[key] = _PathLock(f"{self.log_path(parquet_path)}.lock")
+            return self._locks[key]
+
+    def _compact_lock_for(self, parquet_path):
+        key = os.path.abspath(parquet_path)
+        with self._guard:
+            if key not in self._compact_locks:
+                self._compact_locks[key] = _PathLock(f"{self.log_path(parquet_path)}.compact.lock")
+            return self._compact_locks[key]
+
+    def append(self, parquet_path, edits):
+        """
+        Append edits to the dataset's log.
+
+        :param parquet_path: Path to the parquet file being edited
+        :param edits: Mapping of {row_index: {column: value}} as sent by the UI
+        :return: Number of cell edits written
+        """
+        timestamp = time.time()
+        lines = []
+        for row_index, row_edits in edits.items():
+            for column, value in row_edits.items():
+                lines.append(json.dumps({'row': int(row_index), 'column': column, 'value': value, 'ts': timestamp}, ensure_ascii=False))
+        if not lines:
+            return 0
+
+        with self._lock_for(parquet_path):
+            with open(self.log_path(parquet_path), 'a', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+
+        if self.pending_count(parquet_path) >= self.compact_threshold:
+            self.compact_async(parquet_path)
+        return len(lines)
+
+    def _read_entries(self, log_file, offset=0):
+        entries = []
+        with open(log_file, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # A partially written trailing line is picked up on the next read.
+                    break
+                offset += len(line)
+                if line.strip():
+                    entries.append(json.loads(line.decode('utf-8')))
+        return entries, offset
+
+    def pending_edits(self, parquet_path):
+        """
+        Return the pending edits as {row_index: {column: value}}, reading only the part of the
+        log appended since the last call.
+        """
+        log_file = self.log_path(parquet_path)
+        key = os.path.abspath(parquet_path)
+        with self._lock_for(parquet_path):
+            try:
+                stat = os.stat(log_file)
+            except FileNotFoundError:
+                self._cache.pop(key, None)
+                return {}
+
+            cached = self._cache.get(key)
+            if cached is None or cached['inode'] != stat.st_ino or cached['offset'] > stat.st_size:
+                cached = {'inode': stat.st_ino, 'offset': 0, 'edits': {}, 'count': 0}
+
+            if cached['offset'] < stat.st_size:
+                entries, cached['offset'] = self._read_entries(log_file, cached['offset'])
+                for entry in entries:
+                    cached['edits'].setdefault(entry['row'], {})[entry['column']] = entry['value']
+                cached['count'] += len(entries)
+
+            self._cache[key] = cached
+            return cached['edits']
+
+    def pending_count(self, parquet_path):
+        self.pending_edits(parquet_path)
+        cached = self._cache.get(os.path.abspath(parquet_path))
+        return cached['count'] if cached else 0
+
+    def has_pending(self, parquet_path):
+        return bool(self.pending_edits(parquet_path))
+
+    def overlay_records(self, parquet_path, records, start=0):
+        """
+        Apply pending edits to a page of row dictionaries that starts at row `start`.
+        """
+        edits = self.pending_edits(parquet_path)
+        if not edits:
+            return records
+        for i, record in enumerate(records):
+            row_edits = edits.get(start + i)
+            if row_edits:
+                record.update(row_edits)
+        return records
+
+    def overlay_batch(self, parquet_path, batch, offset=0):
+        """
+        Apply pending edits to an Arrow record batch holding rows [offset, offset + num_rows).
+        """
+        edits = self.pending_edits(parquet_path)
+        if not edits:
+            return batch
+
+        by_column = {}
+        for row_index in range(offset, offset + batch.num_rows):
+            for column, value in edits.get(row_index, {}).items():
+                if column in batch.schema.names:
+                    by_column.setdefault(column, {})[row_index - offset] = value
+        if not by_column:
+            return batch
+
+        arrays = list(batch.columns)
+        for column, column_edits in by_column.items():
+            index = batch.schema.get_field_index(column)
+            values = arrays[index].to_pylist()
+            for position, value in column_edits.items():
+                values[position] = value
+            try:
+                arrays[index] = pa.array(values, type=batch.schema.field(index).type)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                arrays[index] = pa.array([None if v is None else str(v) for v in values], type=pa.string())
+        return pa.RecordBatch.from_arrays(arrays, names=batch.schema.names)
+
+    def apply_to_dataframe(self, df, edits):
+        """
+        Apply {row_index: {column: value}} edits to a DataFrame, one column at a time.
+        """
+        by_column = {}
+        for row_index, row_edits in edits.items():
+            if not 0 <= row_index < len(df):
+                self.logger.warning(f"Skipping edit for out-of-range row {row_index}")
+                continue
+            for column, value in row_edits.items():
+                by_column.setdefault(column, {})[row_index] = value
+
+        for column, column_edits in by_column.items():
+            values = df[column].tolist() if column in df.columns else [None] * len(df)
+            for row_index, value in column_edits.items():
+                values[row_index] = value
+            df[column] = values
+        return df
+
+    def read_dataframe(self, parquet_path):
+        """
+        Read a parquet file with its pending edits applied in memory.
+        """
+        df = pd.read_parquet(parquet_path)
+        edits = self.pending_edits(parquet_path)
+        if edits:
+            df = self.apply_to_dataframe(df.reset_index(drop=True), edits)
+        return df
+
+    def copy_with_edits(self, parquet_path, new_path, edits=None):
+        """
+        Save a dataset under a new name without rewriting it: the parquet file is copied
+        as-is and the source's pending edits plus `edits` go into the copy's log.
+        """
+        with self._lock_for(parquet_path):
+            shutil.copyfile(parquet_path, new_path)
+            new_log = self.log_path(new_path)
+            if os.path.exists(self.log_path(parquet_path)):
+                shutil.copyfile(self.log_path(parquet_path), new_log)
+            elif os.path.exists(new_log):
+                os.remove(new_log)
+        self._cache.pop(os.path.abspath(new_path), None)
+        if edits:
+            self.append(new_path, edits)
+        return new_path
+
+    def compact(self, parquet_path):
+        """
+        Fold the pending edits into the parquet file and trim them from the log.
+
+        The parquet file is rewritten outside the lock, so edits saved while compaction
+        runs are kept in the log and still overlaid afterwards. Both locks are also file locks,
+        so this holds across server worker processes.
+
+        :return: Number of cell edits compacted
+        """
+        with self._compact_lock_for(parquet_path):
+            return self._compact(parquet_path)
+
+    def _compact(self, parquet_path):
+        log_file = self.log_path(parquet_path)
+        lock = self._lock_for(parquet_path)
+        with lock:
+            if not os.path.exists(log_file):
+                return 0
+            entries, offset = self._read_entries(log_file)
+        if not entries:
+            return 0
+
+        edits = {}
+        for entry in entries:
+            edits.setdefault(entry['row'], {})[entry['column']] = entry['value']
+
+        df = self.apply_to_dataframe(pd.read_parquet(parquet_path).reset_index(drop=True), edits)
+        # Unique name, so concurrent writers never share a temporary file
+        fd, tmp_file = tempfile.mkstemp(prefix=f".{os.path.basename(parquet_path)}.", suffix='.compact.tmp',
+                                        dir=os.path.dirname(os.path.abspath(parquet_path)))
+        os.close(fd)
+        try:
+            df.to_parquet(tmp_file, engine='pyarrow')
+        except BaseException:
+            os.remove(tmp_file)
+            raise
+
+        with lock:
+            shutil.copymode(parquet_path, tmp_file)
+            os.replace(tmp_file, parquet_path)
+            with open(log_file, 'rb') as f:
+                f.seek(offset)
+                tail = f.read()
+            if tail:
+                fd, tmp_log = tempfile.mkstemp(prefix=f".{os.path.basename(log_file)}.", suffix='.tmp',
+                                               dir=os.path.dirname(os.path.abspath(log_file)))
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(tail)
+                shutil.copymode(log_file, tmp_log)
+                os.replace(tmp_log, log_file)
+            else:
+                os.remove(log_file)
+            self._cache.pop(os.path.abspath(parquet_path), None)
+
+        self.logger.info(f"Compacted {len(entries)} edits into {parquet_path}")
+        return len(entries)
+
+    def compact_async(self, parquet_path):
+        """
+        Compact in a background thread; returns False if a compaction is already running.
+        """
+        key = os.path.abspath(parquet_path)
+        with self._guard:
+            if key in self._compacting:
+                return False
+            self._compacting.add(key)
+
+        def worker():
+            try:
+                self.compact(parquet_path)
+            except Exception as e:
+                self.logger.exception(f"Error compacting edits for {parquet_path}: {str(e)}")
+            finally:
+                with self._guard:
+                    self._compacting.discard(key)
+
+        threading.Thread(target=worker, daemon=True).start()
+        return True
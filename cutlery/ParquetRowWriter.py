@@ -0,0 +1,130 @@
+import queue
+import logging
+import threading
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+class ParquetRowWriter:
+    """
+    Write rows to a parquet file one row group at a time.
+
+    Rows are buffered until `row_group_size` is reached and then flushed as a row group, so
+    memory stays bounded by one group. With `background=True` the Arrow conversion and file
+    writes run on a separate thread fed through a bounded queue, letting the producer keep
+    parsing while the previous group is written.
+
+    Without a `schema` the first row group decides it, with all-null columns stored as strings.
+    Parquet files cannot change schema midway, so a later row with a field the schema lacks
+    raises ValueError instead of being silently dropped; pass `schema` when rows vary.
+
+    Given a `template_schema` (a TemplateSchema), each row group is cast to the template's Arrow
+    schema and validated; problems are collected in `issues` rather than failing the write.
+    """
+
+    def __init__(self, output_file, schema=None, row_group_size=10000, compression='snappy', background=False, max_pending_groups=2, template_schema=None):
+        self.output_file = output_file
+        self.template_schema = template_schema if template_schema is not None and template_schema.record_schema is not None else None
+        self.schema = self.template_schema.schema if self.template_schema is not None else schema
+        self.issues = []
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.rows_written = 0
+        self.logger = logging.getLogger(__name__)
+        self._rows = []
+        self._writer = None
+        self._error = None
+        self._queue = None
+        self._thread = None
+        if background:
+            self._queue = queue.Queue(maxsize=max_pending_groups)
+            self._thread = threading.Thread(target=self._drain, daemon=True)
+            self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    @staticmethod
+    def _infer_table(rows):
+        # from_pylist only looks at the first row's keys; collect every field in the group
+        names = {}
+        for row in rows:
+            names.update(dict.fromkeys(row))
+        return pa.table({name: [row.get(name) for row in rows] for name in names})
+
+    def _write_group(self, rows):
+        if self.template_schema is not None:
+            table = self._infer_table(rows)
+            self.issues.extend(self.template_schema.validate(table))
+            table = self.template_schema.conform(table)
+        elif self.schema is not None:
+            unknown = set().union(*rows) - set(self.schema.names)
+            if unknown:
+                raise ValueError(f"Row fields not in the parquet schema: {', '.join(sorted(unknown))}")
+            table = pa.Table.from_pylist(rows, schema=self.schema)
+        else:
+            table = self._infer_table(rows)
+            # The first group fixes the file schema, so all-null columns are kept as strings rather than the null type
+            table = table.cast(pa.schema([
+                pa.field(field.name, pa.string()) if pa.types.is_null(field.type) else field
+                for field in table.schema
+            ]))
+        if self._writer is None:
+            self.schema = table.schema
+            self._writer = pq.ParquetWriter(self.output_file, self.schema, compression=self.compression)
+        self._writer.write_table(table, row_group_size=len(rows))
+
+    def _drain(self):
+        while True:
+            rows = self._queue.get()
+            if rows is None:
+                return
+            if self._error is None:
+                try:
+                    self._write_group(rows)
+                except Exception as e:
+                    self._error = e
+
+    def _flush(self):
+        rows, self._rows = self._rows, []
+        if not rows:
+            return
+        if self._error is not None:
+            raise self._error
+        if self._queue is not None:
+            self._queue.put(rows)
+        else:
+            self._write_group(rows)
+
+    def write_row(self, row):
+        self._rows.append(row)
+        self.rows_written += 1
+        if len(self._rows) >= self.row_group_size:
+            self._flush()
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.write_row(row)
+
+    def close(self):
+        """
+        Flush buffered rows and finish the file; an empty file still gets the schema if known.
+        """
+        try:
+            self._flush()
+        finally:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread.join()
+                self._thread = None
+        if self._error is not None:
+            raise self._error
+        if self._writer is None:
+            schema = self.schema if self.schema is not None else pa.schema([])
+            self._writer = pq.ParquetWriter(self.output_file, schema, compression=self.compression)
+        self._writer.close()
+        self.logger.info(f"Wrote {self.rows_written} rows to {self.output_file}")
+        return self.rows_written
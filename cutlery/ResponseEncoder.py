@@ -0,0 +1,164 @@
+import json
+import math
+import gzip
+import zlib
+import datetime
+import decimal
+import logging
+from flask import Response, request, stream_with_context
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+class ResponseEncoder:
+    """
+    JSON/NDJSON responses for dataframe pages.
+
+    Rows are taken straight from Arrow tables with `to_pylist()` and encoded with orjson when
+    it is installed (falling back to the json module); numpy values serialize cleanly and NaN
+    or infinite floats become null either way. Bodies are compressed with br or gzip when the client's Accept-Encoding allows.
+    """
+
+    def __init__(self, compress_min_size=1024, gzip_level=6, brotli_quality=5):
+        self.compress_min_size = compress_min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def _finite(obj):
+        """
+        Replace NaN and infinities with None, as orjson does; the json module would reject them.
+        """
+        if isinstance(obj, float):
+            return obj if math.isfinite(obj) else None
+        if isinstance(obj, dict):
+            return {key: ResponseEncoder._finite(value) for key, value in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            return [ResponseEncoder._finite(value) for value in obj]
+        return obj
+
+    @staticmethod
+    def _default(obj):
+        # Arrays before scalars: numpy arrays also have item(), which fails unless they hold one value
+        if getattr(obj, 'ndim', 0) and hasattr(obj, 'tolist'):
+            return ResponseEncoder._finite(obj.tolist())
+        if hasattr(obj, 'item'):
+            return ResponseEncoder._finite(obj.item())
+        if hasattr(obj, 'tolist'):
+            return ResponseEncoder._finite(obj.tolist())
+        if isinstance(obj, (datetime.date, datetime.time)):
+            return obj.isoformat()
+        if isinstance(obj, datetime.timedelta):
+            return obj.total_seconds()
+        if isinstance(obj, decimal.Decimal):
+            return float(obj)
+        if isinstance(obj, (bytes, bytearray)):
+            return obj.decode('utf-8', errors='replace')
+        if isinstance(obj, (set, frozenset)):
+            return list(obj)
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+    def dumps(self, obj):
+        if orjson is not None:
+            return orjson.dumps(obj, default=self._default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        return json.dumps(self._finite(obj), default=self._default, ensure_ascii=False, allow_nan=False).encode('utf-8')
+
+    def table_records(self, table):
+        return table.to_pylist()
+
+    def negotiate_encoding(self, accept_encoding=None):
+        """
+        Pick 'br', 'gzip' or None from an Accept-Encoding header, honouring q-values.
+        """
+        if accept_encoding is None:
+            accept_encoding = request.headers.get('Accept-Encoding', '')
+        accepted = {}
+        for part in accept_encoding.split(','):
+            fields = part.strip().split(';')
+            coding = fields[0].strip().lower()
+            if not coding:
+                continue
+            quality = 1.0
+            for param in fields[1:]:
+                name, _, value = param.strip().partition('=')
+                if name == 'q':
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            accepted[coding] = quality
+
+        candidates = (['br'] if brotli is not None else []) + ['gzip']
+        best = None
+        for coding in candidates:
+            quality = accepted.get(coding, accepted.get('*', 0.0))
+            if quality > 0 and (best is None or quality > best[1]):
+                best = (coding, quality)
+        return best[0] if best else None
+
+    def _compressor(self, encoding):
+        if encoding == 'br':
+            return brotli.Compressor(quality=self.brotli_quality)
+        if encoding == 'gzip':
+            return zlib.compressobj(self.gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return None
+
+    def json_response(self, payload, status=200):
+        body = self.dumps(payload)
+        headers = {'Vary': 'Accept-Encoding'}
+        encoding = self.negotiate_encoding() if len(body) >= self.compress_min_size else None
+        if encoding == 'br':
+            body = brotli.compress(body, quality=self.brotli_quality)
+        elif encoding == 'gzip':
+            body = gzip.compress(body, compresslevel=self.gzip_level)
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        return Response(body, status=status, mimetype='application/json', headers=headers)
+
+    def iter_ndjson(self, records, header=None):
+        """
+        Yield NDJSON lines, optionally preceded by a header object (e.g. total_rows/columns).
+        """
+        if header is not None:
+            yield self.dumps(header) + b'\n'
+        for record in records:
+            yield self.dumps(record) + b'\n'
+
+    def stream_response(self, chunks, mimetype='application/x-ndjson', status=200, headers=None, encoding=None):
+        """
+        Stream an iterator of byte chunks with chunked transfer encoding, compressing on the fly
+        with the negotiated (or given) content encoding.
+        """
+        headers = dict(headers or {})
+        headers['Vary'] = 'Accept-Encoding'
+        if encoding is None:
+            encoding = self.negotiate_encoding()
+        compressor = self._compressor(encoding)
+        if encoding:
+            headers['Content-Encoding'] = encoding
+
+        def generate():
+            for chunk in chunks:
+                if compressor is None:
+                    yield chunk
+                    continue
+                data = compressor.process(chunk) if encoding == 'br' else compressor.compress(chunk)
+                if data:
+                    yield data
+            if compressor is not None:
+                tail = compressor.finish() if encoding == 'br' else compressor.flush()
+                if tail:
+                    yield tail
+
+        return Response(stream_with_context(generate()), status=status, mimetype=mimetype, headers=headers)
+
+    def ndjson_response(self, records, header=None):
+        return self.stream_response(self.iter_ndjson(records, header))
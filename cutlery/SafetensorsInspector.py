@@ -0,0 +1,262 @@
+import os
+import json
+import mmap
+import glob
+import math
+import time
+import struct
+import logging
+import argparse
+
+class SafetensorsInspector:
+    """
+    Inspect safetensors checkpoints from their headers, without loading any tensor data.
+
+    A safetensors file starts with an 8-byte little-endian header length followed by a JSON
+    header mapping tensor names to dtype, shape and byte offsets, so a model's structure and
+    size can be read in milliseconds. Sharded checkpoints (`model-0000x-of-0000y.safetensors`)
+    are resolved through `model.safetensors.index.json`. Tensor data is memory-mapped only when
+    a tensor is asked for with `tensor()`.
+    """
+
+    DTYPE_SIZES = {
+        'F64': 8, 'F32': 4, 'F16': 2, 'BF16': 2, 'F8_E4M3': 1, 'F8_E5M2': 1,
+        'I64': 8, 'I32': 4, 'I16': 2, 'I8': 1,
+        'U64': 8, 'U32': 4, 'U16': 2, 'U8': 1, 'BOOL': 1,
+    }
+    NUMPY_DTYPES = {
+        'F64': 'float64', 'F32': 'float32', 'F16': 'float16',
+        'I64': 'int64', 'I32': 'int32', 'I16': 'int16', 'I8': 'int8',
+        'U64': 'uint64', 'U32': 'uint32', 'U16': 'uint16', 'U8': 'uint8', 'BOOL': 'bool',
+        # No native numpy type: exposed as raw bits
+        'BF16': 'uint16', 'F8_E4M3': 'uint8', 'F8_E5M2': 'uint8',
+    }
+    INDEX_NAME = 'model.safetensors.index.json'
+    MAX_HEADER_BYTES = 100 << 20
+
+    def __init__(self, path):
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+        self.index_file, self.files = self._resolve(path)
+        self.tensors = {}
+        self.metadata = {}
+        self.errors = []
+        self._maps = {}
+
+    def _resolve(self, path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No such model path: {path}")
+        if os.path.isdir(path):
+            index_file = os.path.join(path, self.INDEX_NAME)
+            if os.path.exists(index_file):
+                return index_file, self._index_files(index_file)
+            files = sorted(glob.glob(os.path.join(path, '*.safetensors')))
+            if not files:
+                raise FileNotFoundError(f"No safetensors files in {path}")
+            return None, files
+        if path.endswith('.index.json'):
+            return path, self._index_files(path)
+        return None, [path]
+
+    def _index_files(self, index_file):
+        with open(index_file, 'r', encoding='utf-8') as f:
+            self.index = json.load(f)
+        directory = os.path.dirname(index_file)
+        return [os.path.join(directory, name) for name in sorted(set(self.index.get('weight_map', {}).values()))]
+
+    @classmethod
+    def read_header(cls, file_path):
+        """
+        Read one file's header.
+
+        :return: Tuple of (header dict, data start offset, file size)
+        """
+        file_size = os.path.getsize(file_path)
+        with open(file_path, 'rb') as f:
+            prefix = f.read(8)
+            if len(prefix) < 8:
+                raise ValueError(f"{file_path}: file too short for a safetensors header")
+            (header_size,) = struct.unpack('<Q', prefix)
+            if header_size > min(cls.MAX_HEADER_BYTES, file_size - 8):
+                raise ValueError(f"{file_path}: invalid header length {header_size}")
+            header = json.loads(f.read(header_size))
+        return header, 8 + header_size, file_size
+
+    def inspect(self):
+        """
+        Read every header, check offsets and sizes, and return a summary report.
+        """
+        start = time.perf_counter()
+        self.tensors, self.metadata, self.errors = {}, {}, []
+        for file_path in self.files:
+            if not os.path.exists(file_path):
+                self.errors.append(f"missing shard: {os.path.basename(file_path)}")
+                continue
+            try:
+                header, data_start, file_size = self.read_header(file_path)
+            except (OSError, ValueError) as e:
+                self.errors.append(str(e))
+                continue
+            self.metadata[os.path.basename(file_path)] = header.pop('__metadata__', {}) or {}
+            self._check_file(file_path, header, data_start, file_size)
+
+        if self.index_file:
+            weight_map = self.index.get('weight_map', {})
+            missing = [name for name in weight_map if name not in self.tensors]
+            if missing:
+                self.errors.append(f"{len(missing)} tensor(s) in the index not found in their shards, e.g. {missing[0]}")
+            unindexed = [name for name in self.tensors if name not in weight_map]
+            if unindexed:
+                self.errors.append(f"{len(unindexed)} tensor(s) in shards but not in the index, e.g. {unindexed[0]}")
+            expected_size = self.index.get('metadata', {}).get('total_size')
+            if expected_size is not None and expected_size != self.total_bytes:
+                self.errors.append(f"index total_size {expected_size} does not match tensor bytes {self.total_bytes}")
+        return self.report(elapsed=time.perf_counter() - start)
+
+    def _check_file(self, file_path, header, data_start, file_size):
+        name_of_file = os.path.basename(file_path)
+        data_size = file_size - data_start
+        spans = []
+        for name, info in header.items():
+            try:
+                dtype, shape, offsets = info['dtype'], list(info['shape']), list(info['data_offsets'])
+            except KeyError as e:
+                self.errors.append(f"{name_of_file}: {name} header entry has no {e.args[0]}")
+                continue
+            except TypeError:
+                self.errors.append(f"{name_of_file}: {name} header entry is malformed")
+                continue
+            if len(offsets) != 2 or not all(isinstance(value, int) and value >= 0 for value in shape + offsets):
+                self.errors.append(f"{name_of_file}: {name} has invalid shape {info['shape']} or data_offsets {info['data_offsets']}")
+                continue
+            begin, end = offsets
+            if not isinstance(dtype, str) or dtype not in self.DTYPE_SIZES:
+                self.errors.append(f"{name_of_file}: {name} has unknown dtype {dtype}")
+            elif (end - begin) != math.prod(shape) * self.DTYPE_SIZES[dtype]:
+                self.errors.append(f"{name_of_file}: {name} spans {end - begin} bytes, expected {math.prod(shape) * self.DTYPE_SIZES[dtype]}")
+            if not 0 <= begin <= end <= data_size:
+                self.errors.append(f"{name_of_file}: {name} offsets {begin}-{end} outside the {data_size}-byte data section")
+            if name in self.tensors:
+                self.errors.append(f"{name_of_file}: duplicate tensor {name}")
+            spans.append((begin, end, name))
+            self.tensors[name] = {
+                'file': file_path,
+                'dtype': dtype,
+                'shape': list(shape),
+                'offset': data_start + begin,
+                'bytes': end - begin,
+            }
+        spans.sort()
+        for (_, previous_end, previous), (begin, _, name) in zip(spans, spans[1:]):
+            if begin < previous_end:
+                self.errors.append(f"{name_of_file}: {name} overlaps {previous}")
+
+    @property
+    def total_bytes(self):
+        return sum(tensor['bytes'] for tensor in self.tensors.values())
+
+    @property
+    def total_parameters(self):
+        return sum(math.prod(tensor['shape']) for tensor in self.tensors.values())
+
+    def report(self, elapsed=None):
+        by_dtype = {}
+        for tensor in self.tensors.values():
+            counts = by_dtype.setdefault(tensor['dtype'], {'tensors': 0, 'parameters': 0, 'bytes': 0})
+            counts['tensors'] += 1
+            counts['parameters'] += math.prod(tensor['shape'])
+            counts['bytes'] += tensor['bytes']
+        return {
+            'path': self.path,
+            'index': self.index_file,
+            'shards': len(self.files),
+            'tensors': len(self.tensors),
+            'parameters': self.total_parameters,
+            'bytes': self.total_bytes,
+            'dtypes': by_dtype,
+            'valid': not self.errors,
+            'errors': self.errors,
+            'milliseconds': None if elapsed is None else round(elapsed * 1000, 2),
+        }
+
+    def tensor(self, name):
+        """
+        Return a tensor as a numpy array backed by a read-only memory map of its shard.
+        BF16 and FP8 tensors come back as their raw unsigned integer bits.
+
+        The array stays valid after `close()`: a map still referenced by returned arrays is
+        left for them and unmapped once the last one is released.
+        """
+        import numpy as np
+
+        if not self.tensors:
+            self.inspect()
+        info = self.tensors[name]
+        mapped = self._maps.get(info['file'])
+        if mapped is None:
+            with open(info['file'], 'rb') as f:
+                mapped = self._maps[info['file']] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        dtype = np.dtype(self.NUMPY_DTYPES[info['dtype']]).newbyteorder('<')
+        count = math.prod(info['shape'])
+        return np.frombuffer(mapped, dtype=dtype, count=count, offset=info['offset']).reshape(info['shape'])
+
+    def close(self):
+        for mapped in self._maps.values():
+            try:
+                mapped.close()
+            except BufferError:
+                # Arrays from tensor() still point into it; they keep it alive
+                pass
+        self._maps = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+def _format_bytes(size):
+    for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+        if size < 1024 or unit == 'TB':
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{size} B"
+        size /= 1024
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate safetensors checkpoints from their headers, without loading weights")
+    parser.add_argument("paths", nargs="+", help="Model directories, .safetensors files or model.safetensors.index.json files")
+    parser.add_argument("--tensors", action="store_true", help="List every tensor")
+    parser.add_argument("--json", action="store_true", help="Print the reports as JSON")
+    args = parser.parse_args()
+
+    reports = []
+    for path in args.paths:
+        try:
+            inspector = SafetensorsInspector(path)
+            report = inspector.inspect()
+            if args.tensors:
+                report['tensor_list'] = {name: dict(info, file=os.path.basename(info['file'])) for name, info in inspector.tensors.items()}
+        except (OSError, ValueError) as e:
+            report = {'path': path, 'valid': False, 'errors': [str(e)]}
+        reports.append(report)
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        for report in reports:
+            status = 'ok' if report['valid'] else 'INVALID'
+            if 'tensors' in report:
+                print(f"{status:7} {report['path']}: {report['shards']} shard(s), {report['tensors']} tensors, "
+                      f"{report['parameters']:,} parameters, {_format_bytes(report['bytes'])} in {report['milliseconds']} ms")
+                for dtype, counts in sorted(report['dtypes'].items()):
+                    print(f"        {dtype}: {counts['tensors']} tensors, {counts['parameters']:,} parameters")
+            else:
+                print(f"{status:7} {report['path']}")
+            for error in report['errors']:
+                print(f"        error: {error}")
+            for name, info in report.get('tensor_list', {}).items():
+                print(f"        {name} {info['dtype']} {info['shape']} @{info['offset']} ({info['file']})")
+    return 0 if all(report['valid'] for report in reports) else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,207 @@
+import json
+import logging
+
+_TYPE_CHECKS = {
+    'object': lambda value: isinstance(value, dict),
+    'array': lambda value: isinstance(value, list),
+    'string': lambda value: isinstance(value, str),
+    'integer': lambda value: isinstance(value, int) and not isinstance(value, bool),
+    'number': lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    'boolean': lambda value: isinstance(value, bool),
+    'null': lambda value: value is None,
+}
+
+_KEYWORDS = {'type', 'enum', 'const', 'properties', 'required', 'additionalProperties', 'items',
+             'minItems', 'maxItems', 'minLength', 'maxLength', 'minimum', 'maximum', 'anyOf'}
+# Annotations that do not constrain values
+_ANNOTATIONS = {'title', 'description', 'default', 'examples', '$schema', '$comment'}
+
+def compile_schema(schema):
+    """
+    Compile a JSON schema into a function `check(value, path)` returning a list of
+    (path, message) errors.
+
+    Covers the subset used for generation: type, enum, const, properties, required,
+    additionalProperties, items, min/maxItems, min/maxLength, minimum/maximum and anyOf.
+    The schema is walked once here, so validating each response only runs the checks.
+
+    :raises ValueError: If the schema uses any other keyword (pattern, format, oneOf, $ref,
+        ...), since silently skipping it would accept values the schema rejects
+    """
+    if not isinstance(schema, dict):
+        raise ValueError(f"Schema must be an object, got {type(schema).__name__}")
+    unsupported = sorted(set(schema) - _KEYWORDS - _ANNOTATIONS)
+    if unsupported:
+        raise ValueError(f"Unsupported schema keyword: {', '.join(unsupported)}")
+    checks = []
+
+    types = schema.get('type')
+    if types is not None:
+        types = [types] if isinstance(types, str) else list(types)
+        unknown = [name for name in types if name not in _TYPE_CHECKS]
+        if unknown:
+            raise ValueError(f"Unsupported schema type: {', '.join(unknown)}")
+        type_checks = [_TYPE_CHECKS[name] for name in types]
+        expected = ' or '.join(types)
+
+        def check_type(value, path):
+            if not any(type_check(value) for type_check in type_checks):
+                return [(path, f"expected {expected}, got {type(value).__name__}")]
+            return []
+        checks.append(check_type)
+
+    if 'enum' in schema:
+        allowed = schema['enum']
+        checks.append(lambda value, path: [] if value in allowed else [(path, f"must be one of {allowed!r}")])
+    if 'const' in schema:
+        constant = schema['const']
+        checks.append(lambda value, path: [] if value == constant else [(path, f"must be {constant!r}")])
+
+    for key, compare, message in (('minLength', lambda size, limit: size >= limit, 'shorter than'),
+                                  ('maxLength', lambda size, limit: size <= limit, 'longer than')):
+        if key in schema:
+            limit = schema[key]
+            checks.append(lambda value, path, limit=limit, compare=compare, message=message:
+                          [] if not isinstance(value, str) or compare(len(value), limit) else [(path, f"{message} {limit} characters")])
+    for key, compare, message in (('minItems', lambda size, limit: size >= limit, 'fewer than'),
+                                  ('maxItems', lambda size, limit: size <= limit, 'more than')):
+        if key in schema:
+            limit = schema[key]
+            checks.append(lambda value, path, limit=limit, compare=compare, message=message:
+                          [] if not isinstance(value, list) or compare(len(value), limit) else [(path, f"{message} {limit} items")])
+    for key, compare, message in (('minimum', lambda number, limit: number >= limit, 'less than'),
+                                  ('maximum', lambda number, limit: number <= limit, 'greater than')):
+        if key in schema:
+            limit = schema[key]
+            checks.append(lambda value, path, limit=limit, compare=compare, message=message:
+                          [] if not _TYPE_CHECKS['number'](value) or compare(value, limit) else [(path, f"{message} {limit}")])
+
+    properties = {name: compile_schema(subschema) for name, subschema in schema.get('properties', {}).items()}
+    required = list(schema.get('required', []))
+    additional = schema.get('additionalProperties', True)
+    additional_check = compile_schema(additional) if isinstance(additional, dict) else None
+    if properties or required or additional is not True:
+        def check_object(value, path):
+            if not isinstance(value, dict):
+                return []
+            errors = [(_join(path, name), "is required") for name in required if name not in value]
+            for name, item in value.items():
+                if name in properties:
+                    errors.extend(properties[name](item, _join(path, name)))
+                elif additional is False:
+                    errors.append((_join(path, name), "is not allowed"))
+                elif additional_check is not None:
+                    errors.extend(additional_check(item, _join(path, name)))
+            return errors
+        checks.append(check_object)
+
+    if 'items' in schema:
+        if not isinstance(schema['items'], dict):
+            raise ValueError("Unsupported schema keyword: items must be a single schema")
+        item_check = compile_schema(schema['items'])
+
+        def check_items(value, path):
+            if not isinstance(value, list):
+                return []
+            errors = []
+            for index, item in enumerate(value):
+                errors.extend(item_check(item, f"{path}[{index}]"))
+            return errors
+        checks.append(check_items)
+
+    if 'anyOf' in schema:
+        options = [compile_schema(option) for option in schema['anyOf']]
+        checks.append(lambda value, path: [] if any(not option(value, path) for option in options) else [(path, "matches none of anyOf")])
+
+    def check(value, path=''):
+        errors = []
+        for single_check in checks:
+            errors.extend(single_check(value, path))
+        return errors
+    return check
+
+def _join(path, name):
+    return f"{path}.{name}" if path else name
+
+class StructuredOutput:
+    """
+    Ask a model for JSON constrained by a schema, and repair only what fails validation.
+
+    The schema is sent as Ollama's `format`, so the server constrains decoding to it. The
+    reply is parsed and validated with a compiled validator; top-level properties that are
+    missing or invalid are requested again on their own (with a schema for just those
+    properties) and merged into the result, up to `max_retries` times.
+    """
+
+    def __init__(self, schema, max_retries=2):
+        self.schema = schema
+        self.max_retries = max_retries
+        self.check = compile_schema(schema)
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def for_fields(fields):
+        """
+        Build an object schema from field specs: names, or dicts with `name` and an optional
+        JSON `schema` (defaulting to a string, which any requested data point fits).
+        """
+        properties = {}
+        for field in fields:
+            if isinstance(field, str):
+                field = {'name': field}
+            properties[field['name']] = field.get('schema', {'type': 'string'})
+        return {'type': 'object', 'properties': properties, 'required': list(properties), 'additionalProperties': False}
+
+    def validate(self, value):
+        return self.check(value, '')
+
+    def _subschema(self, names):
+        properties = self.schema.get('properties', {})
+        return {'type': 'object', 'properties': {name: properties[name] for name in names},
+                'required': list(names), 'additionalProperties': False}
+
+    @staticmethod
+    def parse(content):
+        try:
+            return json.loads(content), None
+        except (TypeError, json.JSONDecodeError) as e:
+            return None, f"invalid JSON: {e}"
+
+    def generate(self, chat, messages):
+        """
+        :param chat: Callable(messages, format) returning an Ollama chat response
+        :return: Tuple of (value, errors); errors is an empty list when the value is valid
+        """
+        properties = self.schema.get('properties')
+        response = chat(messages, self.schema)
+        content = response['message']['content']
+        value, parse_error = self.parse(content)
+        errors = [('', parse_error)] if parse_error else self.validate(value)
+
+        for attempt in range(self.max_retries):
+            if not errors:
+                break
+            failed = sorted({path.split('.', 1)[0].split('[', 1)[0] for path, _ in errors})
+            # Whole-value retry when the reply is not an object of known properties
+            if not isinstance(value, dict) or not properties or '' in failed or not set(failed) <= set(properties):
+                self.logger.info(f"Retrying structured output (attempt {attempt + 1}): {errors[:5]}")
+                response = chat(messages, self.schema)
+                content = response['message']['content']
+                value, parse_error = self.parse(content)
+                errors = [('', parse_error)] if parse_error else self.validate(value)
+                continue
+
+            self.logger.info(f"Retrying fields {', '.join(failed)} (attempt {attempt + 1})")
+            feedback = '\n'.join(f"- {path}: {message}" for path, message in errors)
+            retry_messages = list(messages) + [
+                {'role': 'assistant', 'content': content},
+                {'role': 'user', 'content': f"These fields were invalid:\n{feedback}\nReturn a JSON object with only these fields, corrected: {', '.join(failed)}."},
+            ]
+            patch, parse_error = self.parse(chat(retry_messages, self._subschema(failed))['message']['content'])
+            if isinstance(patch, dict):
+                value = dict(value)
+                value.update({name: patch[name] for name in failed if name in patch})
+                # Keep the original key order of the schema
+                value = {name: value[name] for name in list(properties) + [key for key in value if key not in properties] if name in value}
+            errors = self.validate(value)
+        return value, errors
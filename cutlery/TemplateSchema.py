@@ -0,0 +1,163 @@
+import logging
+import pyarrow as pa
+import pyarrow.compute as pc
+
+class TemplateSchema:
+    """
+    A template compiled into column names and a typed Arrow schema.
+
+    Template fields are either plain column names or dicts such as
+    {"name": "score", "type": "float64", "nullable": false, "dictionary": false}. Repeated names
+    (the `input`/`output` pairs in the swarm templates) get `_2`, `_3`, ... suffixes so every
+    column is unique. Low-cardinality columns like `task` and `command` are dictionary-encoded
+    unless a field says otherwise.
+    """
+
+    DICTIONARY_COLUMNS = {'task', 'command', 'generationModel', 'generator'}
+    MULTI_TURN_TEMPLATES = {'duo_swarm'}
+    TYPES = {
+        'string': pa.string(),
+        'large_string': pa.large_string(),
+        'int64': pa.int64(),
+        'int32': pa.int32(),
+        'float64': pa.float64(),
+        'float32': pa.float32(),
+        'bool': pa.bool_(),
+    }
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.logger = logging.getLogger(__name__)
+        self.fields = [self._normalize_field(field) for field in fields]
+        self.field_names = [field['name'] for field in self.fields]
+
+        self.columns = []
+        seen = {}
+        for field_name in self.field_names:
+            seen[field_name] = seen.get(field_name, 0) + 1
+            self.columns.append(field_name if seen[field_name] == 1 else f"{field_name}_{seen[field_name]}")
+
+        arrow_fields = []
+        for column, field in zip(self.columns, self.fields):
+            value_type = self.TYPES[field['type']]
+            if field['dictionary']:
+                value_type = pa.dictionary(pa.int32(), value_type)
+            arrow_fields.append(pa.field(column, value_type, nullable=field['nullable']))
+        self.schema = pa.schema(arrow_fields)
+
+    def _normalize_field(self, field):
+        if isinstance(field, str):
+            field = {'name': field}
+        elif not isinstance(field, dict) or 'name' not in field:
+            raise ValueError(f"Invalid field in template '{self.name}': {field!r}")
+        field_type = field.get('type', 'string')
+        if field_type not in self.TYPES:
+            raise ValueError(f"Unsupported type '{field_type}' for field '{field['name']}' in template '{self.name}'")
+        is_text = field_type in ('string', 'large_string')
+        return {
+            'name': str(field['name']),
+            'type': field_type,
+            'nullable': bool(field.get('nullable', True)),
+            'dictionary': bool(field.get('dictionary', is_text and field['name'] in self.DICTIONARY_COLUMNS)),
+        }
+
+    @property
+    def is_multi_turn(self):
+        return self.name in self.MULTI_TURN_TEMPLATES
+
+    @property
+    def record_schema(self):
+        """
+        Schema of the records written to parquet, or None when they are restructured
+        (multi-turn templates) and the schema is inferred instead.
+        """
+        return None if self.is_multi_turn else self.schema
+
+    def conform(self, table):
+        """
+        Reorder and cast a table (or record batch) to the template schema. Template columns
+        missing from the input are added as nulls; columns outside the template are dropped.
+        """
+        if isinstance(table, pa.RecordBatch):
+            table = pa.Table.from_batches([table])
+        arrays = []
+        for field in self.schema:
+            if field.name in table.column_names:
+                column = table.column(field.name)
+                if column.type != field.type:
+                    try:
+                        column = column.cast(field.type)
+                    except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                        raise ValueError(f"Column '{field.name}' does not match template '{self.name}': {e}")
+                arrays.append(column)
+            else:
+                arrays.append(pa.nulls(table.num_rows, type=field.type))
+        return pa.Table.from_arrays(arrays, schema=self.schema)
+
+    def validate(self, table):
+        """
+        Check a parsed table or record batch against the template with vectorized kernels.
+
+        :return: List of issue strings; empty when the data matches
+        """
+        issues = []
+        names = table.schema.names
+        missing = [column for column in self.columns if column not in names]
+        if missing:
+            issues.append(f"missing columns: {', '.join(missing)}")
+        extra = [name for name in names if name not in self.columns and not name.startswith('__index_level_')]
+        if extra:
+            issues.append(f"unexpected columns: {', '.join(extra)}")
+
+        for field in self.schema:
+            if field.name not in names:
+                continue
+            column = table.column(names.index(field.name))
+            if column.type != field.type:
+                try:
+                    column = column.cast(field.type)
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                    issues.append(f"{field.name}: cannot convert {column.type} to {field.type} ({e})")
+                    continue
+            if field.nullable:
+                continue
+            if column.null_count:
+                issues.append(f"{field.name}: {column.null_count} null value(s) in a non-nullable column")
+            if pa.types.is_dictionary(column.type):
+                column = column.cast(column.type.value_type)
+            if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+                empty = pc.sum(pc.equal(column, '')).as_py() or 0
+                if empty:
+                    issues.append(f"{field.name}: {empty} empty value(s) in a non-nullable column")
+        return issues
+
+    JSON_TYPES = {
+        'string': 'string',
+        'large_string': 'string',
+        'int64': 'integer',
+        'int32': 'integer',
+        'float64': 'number',
+        'float32': 'number',
+        'bool': 'boolean',
+    }
+
+    def json_schema(self):
+        """
+        JSON schema for one record of this template, usable as Ollama's structured output `format`.
+        """
+        properties = {}
+        for column, field in zip(self.columns, self.fields):
+            json_type = self.JSON_TYPES[field['type']]
+            properties[column] = {'type': [json_type, 'null'] if field['nullable'] else json_type}
+            if not field['nullable'] and json_type == 'string':
+                properties[column]['minLength'] = 1
+        return {'type': 'object', 'properties': properties, 'required': list(self.columns), 'additionalProperties': False}
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'columns': self.columns,
+            'fields': [dict(field, column=column) for field, column in zip(self.fields, self.columns)],
+            'schema': str(self.schema),
+            'json_schema': self.json_schema(),
+        }
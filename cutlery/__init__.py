@@ -1,6 +1,54 @@
 #__init__.py
-from .DatasetKitchen import DatasetManager
-from .DatasetKitchen import TemplateManager
-from .OllamaInterface import OllamaInterface
-from .FileHandler import FileHandler
-from .ArxivPaperDownloader import ArxivPaperDownloader
\ No newline at end of file
+# Public classes are imported from their submodules on first access, so `import cutlery`
+# (and every CLI or worker that imports one submodule) does not pay for pandas, datasets,
+# ollama or arxiv until they are actually used.
+import sys
+import types
+import importlib
+
+_EXPORTS = {
+    'DatasetManager': 'DatasetKitchen',
+    'TemplateManager': 'DatasetKitchen',
+    'OllamaInterface': 'OllamaInterface',
+    'FileHandler': 'FileHandler',
+    'ArxivPaperDownloader': 'ArxivPaperDownloader',
+    'BatchIngestor': 'BatchIngestor',
+    'DatasetAugmentor': 'DatasetAugmentor',
+    'DatasetExporter': 'DatasetExporter',
+    'DatasetReader': 'DatasetReader',
+    'DatasetSharder': 'DatasetSharder',
+    'DocumentChunker': 'DocumentChunker',
+    'HuggingFaceDatasetSource': 'HuggingFaceDatasetSource',
+    'IngredientTokenizer': 'IngredientTokenizer',
+    'LatexSegmenter': 'LatexSegmenter',
+    'ModelEvaluator': 'ModelEvaluator',
+    'ParquetRowWriter': 'ParquetRowWriter',
+    'StructuredOutput': 'StructuredOutput',
+    'TemplateSchema': 'TemplateSchema',
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
+
+# Classes the old eager imports bound over their same-named submodules
+_SHADOWED = {'OllamaInterface', 'FileHandler', 'ArxivPaperDownloader'}
+
+class _Package(types.ModuleType):
+    def __setattr__(self, name, value):
+        # Importing e.g. cutlery.OllamaInterface binds the submodule on the package; keep the
+        # name resolving to the class, as before. Every other submodule binds normally.
+        if isinstance(value, types.ModuleType) and name in _SHADOWED:
+            return
+        super().__setattr__(name, value)
+
+sys.modules[__name__].__class__ = _Package
@@ -1,40 +1,229 @@
 import argparse
 import os
+import sys
+import json
+import time
+import hashlib
+import threading
 import subprocess
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
-def convert_safetensor_to_gguf(input_file, output_file):
+DEFAULT_CONVERT_SCRIPT = os.environ.get("AGENTCHEF_CONVERT_SCRIPT", "./convert_to_gguf.py")
+MANIFEST_NAME = "gguf_manifest.json"
+
+def convert_safetensor_to_gguf(input_file, output_file, outtype="f16", convert_script=DEFAULT_CONVERT_SCRIPT):
     """
     Convert a SafeTensor file to GGUF format using llama.cpp's convert_to_gguf.py script.
+
+    The output is written to a temporary name and renamed on success, so an interrupted
+    conversion never leaves a truncated .gguf behind.
+
+    :return: Tuple of (success, seconds, error message or None)
     """
-    convert_script = "./convert_to_gguf.py"  # Assuming convert_to_gguf.py is in the same directory
+    part_file = f"{output_file}.part"
     command = [
-        "python", convert_script,
+        sys.executable, convert_script,
         "--input", input_file,
-        "--output", output_file,
-        "--outtype", "f16"
+        "--output", part_file,
+        "--outtype", outtype
     ]
-    
+
+    start = time.perf_counter()
     try:
-        subprocess.run(command, check=True)
-        print(f"Conversion successful: {input_file} -> {output_file}")
-    except subprocess.CalledProcessError as e:
-        print(f"Conversion failed for {input_file}: {e}")
+        subprocess.run(command, check=True, capture_output=True, text=True)
+        if not os.path.exists(part_file):
+            raise RuntimeError(f"{convert_script} did not write {part_file}")
+        os.replace(part_file, output_file)
+        return True, time.perf_counter() - start, None
+    except (subprocess.CalledProcessError, OSError, RuntimeError) as e:
+        detail = e.stderr.strip().splitlines()[-1] if isinstance(e, subprocess.CalledProcessError) and e.stderr and e.stderr.strip() else str(e)
+        if os.path.exists(part_file):
+            os.remove(part_file)
+        return False, time.perf_counter() - start, detail
 
-def process_directory(input_dir, output_dir):
+def file_sha256(path, chunk_size=1 << 24):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def default_memory_budget():
     """
-    Process all .safetensors files in the input directory and convert them to GGUF format.
+    Three quarters of physical memory in bytes, or None when it cannot be determined.
     """
-    input_dir = Path(input_dir)
-    output_dir = Path(output_dir)
+    try:
+        return int(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") * 0.75)
+    except (AttributeError, ValueError, OSError):
+        return None
+
+class ConversionScheduler:
+    """
+    Run GGUF conversions in parallel within a memory budget, skipping up-to-date outputs.
+
+    Each job reserves an estimate of its peak memory (input size × `memory_factor`) before it
+    starts and releases it when done; jobs wait while the running ones would exceed the budget,
+    although a single job larger than the budget still runs on its own. A manifest in the output
+    directory records each output's input size, mtime (and optionally sha256), outtype and
+    converter, so re-running converts only what changed.
+    """
+
+    def __init__(self, output_dir, outtypes=("f16",), convert_script=DEFAULT_CONVERT_SCRIPT, max_jobs=2,
+                 memory_budget=None, memory_factor=1.0, use_hash=False, force=False):
+        self.output_dir = Path(output_dir)
+        self.outtypes = list(outtypes)
+        self.convert_script = convert_script
+        self.max_jobs = max(1, max_jobs)
+        self.memory_budget = memory_budget
+        self.memory_factor = memory_factor
+        self.use_hash = use_hash
+        self.force = force
+        self.manifest_file = self.output_dir / MANIFEST_NAME
+        self.manifest = self._load_manifest()
+        self._lock = threading.Lock()
+        self._memory_free = threading.Condition(self._lock)
+        self._reserved = 0
+        self._running = 0
+        self._done = 0
+        self._total = 0
+
+    def _load_manifest(self):
+        if self.manifest_file.exists():
+            try:
+                with open(self.manifest_file, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable manifest {self.manifest_file}: {e}")
+        return {}
+
+    def _save_manifest(self):
+        # Called with the lock held; atomic so a crash never corrupts the manifest
+        tmp_file = self.manifest_file.with_name(f"{MANIFEST_NAME}.tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_file, self.manifest_file)
+
+    def output_path(self, input_file, outtype):
+        name = input_file.stem + (".gguf" if len(self.outtypes) == 1 else f".{outtype}.gguf")
+        return self.output_dir / name
 
-    # Create output directory if it doesn't exist
-    output_dir.mkdir(parents=True, exist_ok=True)
+    def plan(self, input_files):
+        """
+        :return: List of (input_file, outtype, output_file) jobs still to run, and the skipped ones
+        """
+        jobs, skipped = [], []
+        for input_file in sorted(Path(path) for path in input_files):
+            stat = input_file.stat()
+            for outtype in self.outtypes:
+                output_file = self.output_path(input_file, outtype)
+                if not self.force and self._is_current(input_file, stat, outtype, output_file):
+                    skipped.append((input_file, outtype, output_file))
+                else:
+                    jobs.append((input_file, outtype, output_file))
+        return jobs, skipped
 
-    # Process all .safetensors files in the input directory
-    for safetensor_file in input_dir.glob("*.safetensors"):
-        gguf_file = output_dir / (safetensor_file.stem + ".gguf")
-        convert_safetensor_to_gguf(str(safetensor_file), str(gguf_file))
+    def _is_current(self, input_file, stat, outtype, output_file):
+        entry = self.manifest.get(output_file.name)
+        if entry is None or not output_file.exists():
+            return False
+        if entry.get("input") != str(input_file) or entry.get("outtype") != outtype or entry.get("convert_script") != self.convert_script:
+            return False
+        if entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+            return True
+        if self.use_hash and entry.get("sha256") and entry.get("size") == stat.st_size:
+            # Touched but unchanged content: refresh the recorded mtime and skip
+            if file_sha256(input_file) == entry["sha256"]:
+                entry["mtime_ns"] = stat.st_mtime_ns
+                return True
+        return False
+
+    def _reserve(self, amount):
+        with self._memory_free:
+            while self._running and self.memory_budget is not None and self._reserved + amount > self.memory_budget:
+                self._memory_free.wait()
+            self._reserved += amount
+            self._running += 1
+
+    def _release(self, amount):
+        with self._memory_free:
+            self._reserved -= amount
+            self._running -= 1
+            self._memory_free.notify_all()
+
+    def _run_job(self, job):
+        input_file, outtype, output_file = job
+        stat = input_file.stat()
+        estimate = int(stat.st_size * self.memory_factor)
+        self._reserve(estimate)
+        try:
+            ok, seconds, error = convert_safetensor_to_gguf(str(input_file), str(output_file), outtype, self.convert_script)
+        finally:
+            self._release(estimate)
+
+        result = {"input": str(input_file), "outtype": outtype, "output": str(output_file),
+                  "status": "converted" if ok else "failed", "seconds": round(seconds, 3), "error": error}
+        # Hash outside the lock: reading a multi-GB input must not stall the other jobs
+        digest = file_sha256(input_file) if ok and self.use_hash else None
+        with self._lock:
+            self._done += 1
+            if ok:
+                self.manifest[output_file.name] = {
+                    "input": str(input_file),
+                    "outtype": outtype,
+                    "convert_script": self.convert_script,
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "sha256": digest,
+                    "seconds": result["seconds"],
+                    "converted_at": time.time(),
+                }
+                self._save_manifest()
+            progress = f"[{self._done}/{self._total}]"
+        if ok:
+            print(f"{progress} Conversion successful: {input_file} -> {output_file} ({outtype}, {seconds:.1f}s)")
+        else:
+            print(f"{progress} Conversion failed for {input_file} ({outtype}): {error}")
+        return result
+
+    def run(self, input_files):
+        """
+        Convert every input to every outtype that is not already up to date.
+
+        :return: Report dict with per-job results and totals
+        """
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        start = time.perf_counter()
+        jobs, skipped = self.plan(input_files)
+        results = [{"input": str(input_file), "outtype": outtype, "output": str(output_file), "status": "skipped", "seconds": 0.0, "error": None}
+                   for input_file, outtype, output_file in skipped]
+        for _, outtype, output_file in skipped:
+            print(f"Up to date: {output_file} ({outtype})")
+
+        self._total = len(jobs)
+        # Largest inputs first so the long conversions start early and small ones fill the gaps
+        jobs.sort(key=lambda job: -job[0].stat().st_size)
+        if jobs:
+            with ThreadPoolExecutor(max_workers=self.max_jobs) as executor:
+                results.extend(executor.map(self._run_job, jobs))
+        if skipped:
+            with self._lock:
+                self._save_manifest()
+
+        counts = {}
+        for result in results:
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+        return {"results": results, "counts": counts, "seconds": round(time.perf_counter() - start, 3)}
+
+def process_directory(input_dir, output_dir, outtypes=("f16",), convert_script=DEFAULT_CONVERT_SCRIPT, max_jobs=2,
+                      memory_budget=None, memory_factor=1.0, use_hash=False, force=False):
+    """
+    Process all .safetensors files in the input directory and convert them to GGUF format.
+    """
+    input_dir = Path(input_dir)
+    scheduler = ConversionScheduler(output_dir, outtypes=outtypes, convert_script=convert_script, max_jobs=max_jobs,
+                                    memory_budget=memory_budget, memory_factor=memory_factor, use_hash=use_hash, force=force)
+    return scheduler.run(input_dir.glob("*.safetensors"))
 
 def get_user_input():
     """
@@ -48,6 +237,14 @@ def main():
     parser = argparse.ArgumentParser(description="Convert SafeTensor models to GGUF format")
     parser.add_argument("--input_dir", type=str, help="Directory containing SafeTensor files")
     parser.add_argument("--output_dir", type=str, help="Directory to save GGUF files")
+    parser.add_argument("--outtype", action="append", help="Output type, repeatable for several quantizations in one pass (default: f16)")
+    parser.add_argument("--convert_script", default=DEFAULT_CONVERT_SCRIPT, help="llama.cpp conversion script (env AGENTCHEF_CONVERT_SCRIPT)")
+    parser.add_argument("--jobs", type=int, default=2, help="Maximum conversions running at once")
+    parser.add_argument("--memory_budget_gb", type=float, help="Memory the running conversions may reserve (default: 75%% of RAM)")
+    parser.add_argument("--memory_factor", type=float, default=1.0, help="Estimated peak memory per conversion as a multiple of the input size")
+    parser.add_argument("--hash", action="store_true", help="Also compare input sha256 so touched but unchanged files are skipped")
+    parser.add_argument("--force", action="store_true", help="Convert even if the manifest says the output is up to date")
+    parser.add_argument("--report", help="Write a JSON report with per-file timings")
     args = parser.parse_args()
 
     if args.input_dir and args.output_dir:
@@ -60,8 +257,19 @@ def main():
 
     print(f"Input directory: {input_dir}")
     print(f"Output directory: {output_dir}")
-    
-    process_directory(input_dir, output_dir)
+
+    memory_budget = int(args.memory_budget_gb * (1 << 30)) if args.memory_budget_gb else default_memory_budget()
+    report = process_directory(input_dir, output_dir, outtypes=args.outtype or ["f16"], convert_script=args.convert_script,
+                               max_jobs=args.jobs, memory_budget=memory_budget, memory_factor=args.memory_factor,
+                               use_hash=args.hash, force=args.force)
+
+    for result in sorted(report["results"], key=lambda result: -result["seconds"]):
+        print(f"{result['seconds']:8.1f}s  {result['status']:9}  {result['outtype']:6}  {result['input']}")
+    print(f"Done in {report['seconds']:.1f}s: {report['counts']}")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 1 if report["counts"].get("failed") else 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    raise SystemExit(main())
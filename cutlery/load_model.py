@@ -1,9 +1,32 @@
-import torch
-from safetensors.torch import load_file
+import os
+import sys
 
-model_path = "/home/borch/Agent_Chef/agent_chef_data/huggingface_models/Meta-Llama-3.1-8B-bnb-4bit/model.safetensors"
 try:
-    state_dict = load_file(model_path)
-    print("Model loaded successfully")
-except Exception as e:
-    print(f"Error loading model: {e}")
\ No newline at end of file
+    from .SafetensorsInspector import SafetensorsInspector
+except ImportError:
+    from SafetensorsInspector import SafetensorsInspector
+
+MODELS_DIR = os.path.join("agent_chef_data", "huggingface_models")
+
+def main():
+    # Validate downloaded checkpoints from their safetensors headers instead of loading every
+    # tensor into RAM. Pass model directories or files, or check everything in huggingface_models.
+    model_paths = sys.argv[1:]
+    if not model_paths and os.path.isdir(MODELS_DIR):
+        model_paths = sorted(os.path.join(MODELS_DIR, name) for name in os.listdir(MODELS_DIR) if os.path.isdir(os.path.join(MODELS_DIR, name)))
+
+    failed = False
+    for model_path in model_paths:
+        try:
+            report = SafetensorsInspector(model_path).inspect()
+            if report['valid']:
+                print(f"Model loaded successfully: {model_path} ({report['tensors']} tensors, {report['parameters']:,} parameters, {report['milliseconds']} ms)")
+                continue
+            print(f"Error loading model {model_path}: {'; '.join(report['errors'])}")
+        except Exception as e:
+            print(f"Error loading model {model_path}: {e}")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
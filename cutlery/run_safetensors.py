@@ -1,55 +1,276 @@
 import os
-import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
-from peft import PeftModel, PeftConfig
-import gradio as gr
-
-def setup_model(base_model_path, lora_adapter_path):
-    # Load tokenizer for LLaMA 3.1
-    print(f"Loading base model from {base_model_path}")
-    
+import sys
+import json
+import time
+import queue
+import logging
+import argparse
+import threading
+from concurrent.futures import Future
+
+# torch, transformers, peft and gradio are imported inside the functions that use them, so
+# importing this module (e.g. to reuse generate_response) does not load the whole stack
+
+DEFAULT_BASE_MODEL = os.environ.get("AGENTCHEF_BASE_MODEL")
+DEFAULT_LORA_ADAPTER = os.environ.get("AGENTCHEF_LORA_ADAPTER")
+
+logger = logging.getLogger(__name__)
+
+def setup_model(base_model_path, lora_adapter_path=None, device=None, threads=None, merge_adapter=True):
+    """
+    Load a base model and optional LoRA adapter for inference.
+
+    On a CPU-only machine the model is loaded in float32 on the CPU (half precision matmuls are
+    slow or unsupported there), the adapter is merged into the weights so each step runs one
+    matmul per layer instead of two, and torch uses `threads` intra-op threads.
+    """
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+    if threads:
+        torch.set_num_threads(threads)
+
+    print(f"Loading base model from {base_model_path} on {device}")
     tokenizer = AutoTokenizer.from_pretrained(base_model_path)
-    
+    # Decoder-only models must be left-padded for batched generation
+    tokenizer.padding_side = "left"
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+
     # Load the base model with safetensors (automatically handles multi-part safetensors files)
     base_model = AutoModelForCausalLM.from_pretrained(
         base_model_path,
-        torch_dtype=torch.float16,  # Optimize memory usage
-        device_map="auto",
+        torch_dtype=torch.float16 if device.startswith("cuda") else torch.float32,
+        device_map="auto" if device.startswith("cuda") else None,
         low_cpu_mem_usage=True
     )
-    
-    # Load LoRA adapter configuration and apply it
-    print(f"Loading LoRA adapter from {lora_adapter_path}")
-    peft_config = PeftConfig.from_pretrained(lora_adapter_path)
-    
-    # Apply the LoRA adapter to the base model
-    model = PeftModel(base_model, peft_config)
+    if not device.startswith("cuda"):
+        base_model = base_model.to(device)
+
+    model = base_model
+    if lora_adapter_path:
+        from peft import PeftModel
 
+        # Load the trained LoRA weights on top of the base model
+        print(f"Loading LoRA adapter from {lora_adapter_path}")
+        model = PeftModel.from_pretrained(base_model, lora_adapter_path)
+        if merge_adapter:
+            model = model.merge_and_unload()
+
+    model.eval()
+    if model.generation_config.pad_token_id is None:
+        model.generation_config.pad_token_id = tokenizer.pad_token_id
     return model, tokenizer
 
+def plan_batches(lengths, max_batch_size=16, max_batch_tokens=4096):
+    """
+    Group prompt indices by token length so each padded batch wastes little compute.
+
+    Prompts are sorted by length and cut into batches whose padded size
+    (batch size × longest prompt) stays within `max_batch_tokens`.
+
+    :return: List of index lists
+    """
+    order = sorted(range(len(lengths)), key=lambda index: lengths[index])
+    batches, current, longest = [], [], 0
+    for index in order:
+        length = max(lengths[index], 1)
+        if current and (len(current) >= max_batch_size or max(longest, length) * (len(current) + 1) > max_batch_tokens):
+            batches.append(current)
+            current, longest = [], 0
+        current.append(index)
+        longest = max(longest, length)
+    if current:
+        batches.append(current)
+    return batches
+
+def generate_batch(prompts, model, tokenizer, max_new_tokens=150, max_batch_size=16, max_batch_tokens=4096, **generate_kwargs):
+    """
+    Generate completions for many prompts with length-grouped, padded batches.
+
+    :return: List of completions (without the prompt), in the order of `prompts`
+    """
+    import torch
+
+    lengths = [len(ids) for ids in tokenizer(list(prompts), add_special_tokens=True)["input_ids"]]
+    results = [None] * len(prompts)
+    for batch in plan_batches(lengths, max_batch_size, max_batch_tokens):
+        inputs = tokenizer([prompts[index] for index in batch], return_tensors="pt", padding=True).to(model.device)
+        with torch.inference_mode():
+            outputs = model.generate(**inputs, max_new_tokens=max_new_tokens, pad_token_id=tokenizer.pad_token_id, **generate_kwargs)
+        # With left padding every prompt ends at the same position
+        completions = tokenizer.batch_decode(outputs[:, inputs["input_ids"].shape[1]:], skip_special_tokens=True)
+        for index, completion in zip(batch, completions):
+            results[index] = completion.strip()
+    return results
+
 def generate_response(user_input, model, tokenizer):
-    inputs = tokenizer(user_input, return_tensors="pt").to(model.device)
-    outputs = model.generate(**inputs, max_new_tokens=150)
-    response = tokenizer.decode(outputs[0], skip_special_tokens=True)
-    return response
+    return generate_batch([user_input], model, tokenizer)[0]
+
+class BatchingGenerator:
+    """
+    Collect prompts submitted from many threads and generate them in dynamic batches.
+
+    A worker thread waits for the first queued prompt, then keeps collecting for up to
+    `max_wait` seconds or until `max_batch_size` prompts are queued, and runs them through
+    `generate_batch` together. `submit` returns a Future resolved with the completion.
+    """
+
+    def __init__(self, model, tokenizer, max_batch_size=16, max_batch_tokens=4096, max_wait=0.05, max_new_tokens=150):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_wait = max_wait
+        self.max_new_tokens = max_new_tokens
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, prompt, max_new_tokens=None):
+        future = Future()
+        self._queue.put((prompt, max_new_tokens or self.max_new_tokens, future))
+        return future
+
+    def generate(self, prompt, max_new_tokens=None, timeout=None):
+        return self.submit(prompt, max_new_tokens).result(timeout=timeout)
+
+    def _collect(self):
+        pending = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(pending) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            # Requests with different generation lengths are run separately
+            by_length = {}
+            for item in pending:
+                by_length.setdefault(item[1], []).append(item)
+            for max_new_tokens, items in by_length.items():
+                try:
+                    completions = generate_batch([prompt for prompt, _, _ in items], self.model, self.tokenizer,
+                                                 max_new_tokens=max_new_tokens, max_batch_size=self.max_batch_size,
+                                                 max_batch_tokens=self.max_batch_tokens)
+                    for (_, _, future), completion in zip(items, completions):
+                        future.set_result(completion)
+                except Exception as e:
+                    for _, _, future in items:
+                        future.set_exception(e)
+
+def evaluate_parquet(model, tokenizer, input_file, output_file, prompt_template="{instruction}", limit=None,
+                     read_batch_size=256, max_new_tokens=150, max_batch_size=16, max_batch_tokens=4096):
+    """
+    Generate a prediction for every row of a parquet dataset (e.g. a validation dish) and write
+    the rows with an added `prediction` column. Rows are streamed in `read_batch_size` chunks
+    and copied as Arrow batches, so the source column types (dictionaries, all-null columns)
+    are kept exactly.
+
+    :param prompt_template: str.format template over the row's columns
+    :return: Number of rows written
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(input_file)
+    schema = parquet_file.schema_arrow
+    if "prediction" in schema.names:
+        # Re-evaluating an earlier output replaces its predictions
+        schema = schema.remove(schema.get_field_index("prediction"))
+    rows_done = 0
+    start = time.perf_counter()
+    with pq.ParquetWriter(output_file, schema.append(pa.field("prediction", pa.string()))) as writer:
+        for batch in parquet_file.iter_batches(batch_size=read_batch_size):
+            if limit is not None:
+                batch = batch.slice(0, max(limit - rows_done, 0))
+            if not batch.num_rows:
+                break
+            try:
+                prompts = [prompt_template.format(**row) for row in batch.to_pylist()]
+            except KeyError as e:
+                raise ValueError(f"Prompt template uses column {e} which is not in {input_file}")
+            predictions = generate_batch(prompts, model, tokenizer, max_new_tokens=max_new_tokens,
+                                         max_batch_size=max_batch_size, max_batch_tokens=max_batch_tokens)
+            if "prediction" in batch.schema.names:
+                batch = batch.drop_columns(["prediction"])
+            writer.write_batch(batch.append_column("prediction", pa.array(predictions, pa.string())))
+            rows_done += batch.num_rows
+            elapsed = time.perf_counter() - start
+            print(f"{rows_done} rows, {rows_done / elapsed:.2f} rows/s")
+    return rows_done
+
+def serve(model, tokenizer, host="127.0.0.1", port=8008, **batching):
+    """
+    Minimal JSON HTTP endpoint: POST /generate with {"prompt": "..."} or {"prompts": [...]}
+    (and optional "max_new_tokens"). Concurrent requests are batched together.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    generator = BatchingGenerator(model, tokenizer, **batching)
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if self.path != "/generate":
+                return self._send(404, {"error": "Not found"})
+            try:
+                data = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                prompts = data["prompts"] if "prompts" in data else [data["prompt"]]
+                futures = [generator.submit(prompt, data.get("max_new_tokens")) for prompt in prompts]
+                completions = [future.result() for future in futures]
+            except (KeyError, TypeError, ValueError) as e:
+                return self._send(400, {"error": f"Invalid request: {e}"})
+            except Exception as e:
+                return self._send(500, {"error": str(e)})
+            self._send(200, {"completions": completions} if "prompts" in data else {"completion": completions[0]})
+
+        def log_message(self, format, *args):
+            logger.info(format % args)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(f"Serving on http://{host}:{port}/generate")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
 
 def launch_gradio(model, tokenizer):
+    import gradio as gr
+
     # Chat history to store the conversation
     chat_history = []
 
     def chat_interface(user_input):
         # Get model response
         response = generate_response(user_input, model, tokenizer)
-        
+
         # Add user input and response to the chat history
         chat_history.append(("User", user_input))
         chat_history.append(("Assistant", response))
-        
+
         # Format the chat history for display
         formatted_history = ""
         for speaker, message in chat_history:
             formatted_history += f"{speaker}: {message}\n\n"
-        
+
         return formatted_history, ""
 
     def clear_history():
@@ -59,19 +280,19 @@ def launch_gradio(model, tokenizer):
     # Create Gradio blocks
     with gr.Blocks() as demo:
         gr.Markdown("# Chat with LLaMA 3.1 Model with LoRA Adapter")
-        
+
         with gr.Column():
             # Text area for the conversation history (read-only)
             chat_output = gr.Textbox(label="Chat History", interactive=False, lines=20, placeholder="Chat will appear here.")
-            
+
             # Input area for user message
             user_input = gr.Textbox(label="Your Message", placeholder="Type your message here...", lines=1)
-            
+
             # Submit button and Clear button
             with gr.Row():
                 submit_btn = gr.Button("Send")
                 clear_btn = gr.Button("Clear Chat")
-        
+
         # Bind the submit button and clear button to their respective functions
         submit_btn.click(chat_interface, inputs=user_input, outputs=[chat_output, user_input])
         clear_btn.click(clear_history, outputs=[chat_output, user_input])
@@ -79,15 +300,43 @@ def launch_gradio(model, tokenizer):
     # Launch the Gradio app
     demo.launch()
 
+def main():
+    parser = argparse.ArgumentParser(description="Run a base model with an optional LoRA adapter: chat UI, batched parquet evaluation or HTTP server")
+    parser.add_argument("mode", choices=["chat", "eval", "serve"], help="chat: Gradio UI; eval: predict a parquet; serve: JSON HTTP endpoint")
+    parser.add_argument("--base_model", default=DEFAULT_BASE_MODEL, help="Base model directory (env AGENTCHEF_BASE_MODEL)")
+    parser.add_argument("--adapter", default=DEFAULT_LORA_ADAPTER, help="LoRA adapter directory, e.g. an oven/ checkpoint (env AGENTCHEF_LORA_ADAPTER)")
+    parser.add_argument("--device", help="torch device (default: cuda if available, else cpu)")
+    parser.add_argument("--threads", type=int, help="CPU threads for torch")
+    parser.add_argument("--no_merge", action="store_true", help="Keep the adapter separate instead of merging it into the weights")
+    parser.add_argument("--max_new_tokens", type=int, default=150)
+    parser.add_argument("--max_batch_size", type=int, default=16, help="Prompts per generate call")
+    parser.add_argument("--max_batch_tokens", type=int, default=4096, help="Cap on batch size × longest prompt")
+    parser.add_argument("--input", help="eval: parquet to predict (e.g. a validation dish)")
+    parser.add_argument("--output", help="eval: parquet to write with a prediction column")
+    parser.add_argument("--prompt_template", default="{instruction}", help="eval: str.format template over the row's columns")
+    parser.add_argument("--limit", type=int, help="eval: only the first N rows")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8008)
+    parser.add_argument("--max_wait_ms", type=float, default=50, help="serve: how long to gather a batch")
+    args = parser.parse_args()
+
+    if not args.base_model:
+        parser.error("--base_model (or AGENTCHEF_BASE_MODEL) is required")
+    if args.mode == "eval" and not (args.input and args.output):
+        parser.error("eval needs --input and --output")
+
+    logging.basicConfig(level=logging.INFO)
+    model, tokenizer = setup_model(args.base_model, args.adapter, device=args.device, threads=args.threads, merge_adapter=not args.no_merge)
+    if args.mode == "eval":
+        rows = evaluate_parquet(model, tokenizer, args.input, args.output, prompt_template=args.prompt_template, limit=args.limit,
+                                max_new_tokens=args.max_new_tokens, max_batch_size=args.max_batch_size, max_batch_tokens=args.max_batch_tokens)
+        print(f"Wrote {rows} predictions to {args.output}")
+    elif args.mode == "serve":
+        serve(model, tokenizer, host=args.host, port=args.port, max_batch_size=args.max_batch_size,
+              max_batch_tokens=args.max_batch_tokens, max_wait=args.max_wait_ms / 1000, max_new_tokens=args.max_new_tokens)
+    else:
+        launch_gradio(model, tokenizer)
+    return 0
+
 if __name__ == "__main__":
-    # Path to the base model directory containing safetensors and tokenizer files
-    base_model_path = "/home/borch/Agent_Chef/agent_chef_data/huggingface_models/Meta-Llama-3.1-8B-Instruct-bnb-4bit"
-    
-    # Path to the LoRA adapter directory
-    lora_adapter_path = "/home/borch/Agent_Chef/agent_chef_data/oven/Meta-Llama-3.1-8B-Instruct-bnb-4bit_OARC_Commander_v001/checkpoint-900"
-
-    # Load the tokenizer and model with the LoRA adapter
-    model, tokenizer = setup_model(base_model_path, lora_adapter_path)
-    
-    # Launch the Gradio interface
-    launch_gradio(model, tokenizer)
+    sys.exit(main())
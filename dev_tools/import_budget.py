@@ -0,0 +1,92 @@
+"""
+Check import cost of the cutlery package and the Flask app against a budget.
+
+Each module is imported in a fresh interpreter with `python -X importtime`; the best of
+`--runs` cumulative times is compared with its budget, and the run fails if a module pulls
+in a heavy dependency it is not supposed to load at import time.
+
+    python dev_tools/import_budget.py
+    python dev_tools/import_budget.py --budget app=600 --top 15
+"""
+import os
+import re
+import sys
+import argparse
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# module: (budget in ms, dependencies that must not be imported)
+BUDGETS = {
+    'cutlery': (50, ['pandas', 'pyarrow', 'datasets', 'ollama', 'arxiv', 'requests', 'torch']),
+    'cutlery.DatasetKitchen': (800, ['datasets', 'ollama', 'arxiv', 'requests', 'torch', 'transformers']),
+    'cutlery.BatchIngestor': (800, ['datasets', 'ollama', 'arxiv', 'torch']),
+    'cutlery.run_safetensors': (50, ['torch', 'transformers', 'peft', 'gradio']),
+    'app': (1200, ['datasets', 'ollama', 'arxiv', 'torch', 'transformers', 'peft', 'gradio']),
+}
+
+LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)')
+
+def measure(module):
+    """
+    Import `module` in a new interpreter.
+
+    :return: (cumulative microseconds, {imported module: cumulative microseconds})
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=REPO_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    entries = [match.groups() for match in map(LINE.match, result.stderr.splitlines()) if match]
+    for index, (_, cumulative, indent, name) in enumerate(entries):
+        if name == module:
+            break
+    else:
+        return 0, {}
+    # The module's own imports are the deeper-indented lines printed just before it;
+    # earlier top-level lines are interpreter startup (site, sitecustomize, ...)
+    imported = {module: int(cumulative)}
+    for _, child_cumulative, child_indent, child_name in reversed(entries[:index]):
+        if len(child_indent) <= len(indent):
+            break
+        imported[child_name] = max(imported.get(child_name, 0), int(child_cumulative))
+    return int(cumulative), imported
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail when importing cutlery or app.py gets slower than its budget")
+    parser.add_argument("modules", nargs="*", help=f"Modules to check (default: {', '.join(BUDGETS)})")
+    parser.add_argument("--budget", action="append", default=[], metavar="MODULE=MS", help="Override a budget in milliseconds")
+    parser.add_argument("--runs", type=int, default=3, help="Imports per module; the fastest counts")
+    parser.add_argument("--top", type=int, default=10, help="Slowest top-level dependencies to list per module")
+    args = parser.parse_args()
+
+    budgets = {module: budget for module, (budget, _) in BUDGETS.items()}
+    for override in args.budget:
+        module, _, value = override.partition('=')
+        budgets[module] = float(value)
+
+    failed = False
+    for module in args.modules or list(BUDGETS):
+        runs = [measure(module) for _ in range(max(1, args.runs))]
+        total, imported = min(runs, key=lambda run: run[0])
+        budget = budgets.get(module)
+        forbidden = [name for name in BUDGETS.get(module, (None, []))[1] if name in imported]
+        over = budget is not None and total / 1000 > budget
+        status = 'FAIL' if over or forbidden else 'ok'
+        failed = failed or status == 'FAIL'
+        print(f"{status:4} {module}: {total / 1000:.0f} ms" + (f" (budget {budget:.0f} ms)" if budget is not None else ""))
+        if forbidden:
+            print(f"     imports at startup: {', '.join(forbidden)}")
+
+        # Largest packages, counted once at their top-level name
+        top_level = {}
+        for name, cumulative in imported.items():
+            root = name.split('.')[0]
+            if root != module.split('.')[0] and cumulative > top_level.get(root, 0):
+                top_level[root] = cumulative
+        for name, cumulative in sorted(top_level.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"     {cumulative / 1000:8.1f} ms  {name}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
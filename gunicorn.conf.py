@@ -0,0 +1,46 @@
+""" gunicorn.conf.py
+
+    Production serving config for the AgentChef API:
+
+        gunicorn -c gunicorn.conf.py app:app
+
+    Settings can be overridden with AGENTCHEF_* environment variables. The app is not
+    preloaded, so every worker imports app.py itself and builds its own DatasetManager,
+    TemplateManager and Ollama client (nothing is shared across forks).
+"""
+
+import os
+import signal
+import multiprocessing
+
+bind = os.environ.get("AGENTCHEF_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("AGENTCHEF_WORKERS", min(4, multiprocessing.cpu_count())))
+threads = int(os.environ.get("AGENTCHEF_THREADS", 8))
+worker_class = "gthread"
+preload_app = False
+
+# Generation requests stay open for the whole job, so the worker timeout must be generous.
+timeout = int(os.environ.get("AGENTCHEF_TIMEOUT", 3600))
+# Time given to in-flight requests after SIGTERM; running generation jobs checkpoint and return.
+graceful_timeout = int(os.environ.get("AGENTCHEF_GRACEFUL_TIMEOUT", 60))
+keepalive = 5
+
+accesslog = "-"
+loglevel = os.environ.get("AGENTCHEF_LOG_LEVEL", "info")
+
+def _begin_shutdown():
+    import app as agent_chef_app
+    agent_chef_app.begin_shutdown()
+
+def post_worker_init(worker):
+    # Chain our shutdown flag in front of gunicorn's own SIGTERM handling
+    original_handle_exit = worker.handle_exit
+
+    def handle_exit(sig, frame):
+        _begin_shutdown()
+        original_handle_exit(sig, frame)
+
+    signal.signal(signal.SIGTERM, handle_exit)
+
+def worker_int(worker):
+    _begin_shutdown()
@@ -0,0 +1,27 @@
+import pyarrow.parquet as pq
+
+from cutlery.BatchIngestor import BatchIngestor
+from cutlery.DatasetKitchen import TemplateManager
+
+
+def write_seed(path, rows):
+    path.write_text('\n'.join('\n'.join(f'$("{value}")' for value in row) + '\n' for row in rows))
+    return str(path)
+
+
+def test_per_file_outputs_do_not_replace_existing_parquets(tmp_path):
+    templates_dir, output_dir = tmp_path / 'templates', tmp_path / 'out'
+    templates_dir.mkdir()
+    ingestor = BatchIngestor(TemplateManager(str(templates_dir)), max_workers=1)
+    seeds = tmp_path / 'seeds'
+    seeds.mkdir()
+    seed = write_seed(seeds / 'seed.txt', [('be brief', 'hello', 'hi')])
+
+    first = ingestor.ingest([seed], 'instruct', str(output_dir))
+    write_seed(seeds / 'seed.txt', [('be brief', 'bye', 'goodbye'), ('be brief', 'again', 'ok')])
+    second = ingestor.ingest([seed], 'instruct', str(output_dir))
+
+    assert first['files'][0]['output'] == str(output_dir / 'seed.parquet')
+    assert second['files'][0]['output'] == str(output_dir / 'seed_2.parquet')
+    assert pq.read_metadata(output_dir / 'seed.parquet').num_rows == 1
+    assert pq.read_metadata(output_dir / 'seed_2.parquet').num_rows == 2
@@ -0,0 +1,47 @@
+import json
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from cutlery.DatasetKitchen import DatasetManager, TemplateManager
+from cutlery.ParquetRowWriter import ParquetRowWriter
+from cutlery.TemplateSchema import TemplateSchema
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return DatasetManager(None, TemplateManager(str(tmp_path)), str(tmp_path), str(tmp_path))
+
+
+def test_template_seed_combines_with_plain_string_dish(tmp_path, manager):
+    seed = str(tmp_path / 'seed.parquet')
+    template = TemplateSchema('commands', ['task', 'instruction', 'command'])
+    with ParquetRowWriter(seed, template_schema=template) as writer:
+        writer.write_rows([{'task': 'move', 'instruction': 'go left', 'command': '/left'}])
+    assert pa.types.is_dictionary(pq.read_schema(seed).field('task').type)
+
+    dish = str(tmp_path / 'dish.parquet')
+    pq.write_table(pa.table({'task': ['stop'], 'instruction': ['halt'], 'command': ['/stop'], 'score': [3]}), dish)
+    output = str(tmp_path / 'combined.parquet')
+
+    assert manager.combine_files([seed, dish], output) == 2
+    combined = pq.read_table(output)
+    assert combined.schema.field('task').type == pa.string()
+    assert combined.to_pylist() == [
+        {'task': 'move', 'instruction': 'go left', 'command': '/left', 'score': None},
+        {'task': 'stop', 'instruction': 'halt', 'command': '/stop', 'score': 3},
+    ]
+
+
+def test_conflicting_types_fall_back_to_string(tmp_path, manager):
+    numbers, words = str(tmp_path / 'numbers.parquet'), str(tmp_path / 'words.jsonl')
+    pq.write_table(pa.table({'id': [1, 2], 'tags': [['a'], ['b']]}), numbers)
+    with open(words, 'w') as f:
+        f.write(json.dumps({'id': 'x-3', 'tags': 'none'}) + '\n')
+    output = str(tmp_path / 'combined.parquet')
+
+    assert manager.combine_files([numbers, words], output) == 3
+    combined = pq.read_table(output)
+    assert combined.column('id').to_pylist() == ['1', '2', 'x-3']
+    assert combined.column('tags').to_pylist() == ['["a"]', '["b"]', 'none']
@@ -0,0 +1,120 @@
+import json
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from cutlery.DatasetAugmentor import (AugmentationPipeline, DatasetAugmentor, NumericJitterOperator, PunctuationOperator,
+                                      ShuffleFieldsOperator, SynonymOperator)
+
+
+def test_remove_punctuation_keeps_non_ascii_letters():
+    column = pa.chunked_array([['Héllo, wörld! naïve /run-it_now ß.', '数据, 集!']])
+    result = PunctuationOperator('remove', probability=1.0).transform(column, np.random.default_rng(0))
+    assert result.to_pylist() == ['Héllo wörld naïve /run-it_now ß', '数据 集']
+
+
+def test_remove_punctuation_keeps_combining_marks():
+    decomposed = 'café!'
+    result = PunctuationOperator('remove', probability=1.0).transform(pa.chunked_array([[decomposed]]), np.random.default_rng(0))
+    assert result.to_pylist() == ['café']
+
+
+def write_dataset(path, num_rows=400, row_group_size=50):
+    rng = np.random.default_rng(7)
+    table = pa.table({
+        'instruction': [f"  Please make it quick,  item {index}!" if index % 3 else f"a quick note {index}" for index in range(num_rows)],
+        'agent_one': [f"one {index}" for index in range(num_rows)],
+        'agent_two': [f"two {index}" for index in range(num_rows)],
+        'task': pa.array(['even' if index % 2 == 0 else 'odd' for index in range(num_rows)]).dictionary_encode(),
+        'count': pa.array(rng.integers(1, 1000, num_rows), pa.int64()),
+        'score': rng.random(num_rows),
+    })
+    pq.write_table(table, path, row_group_size=row_group_size)
+    return str(path)
+
+
+CONFIG = [
+    {'op': 'whitespace'},
+    {'op': 'punctuation', 'mode': 'toggle_period', 'probability': 0.5},
+    {'op': 'synonyms', 'table': {'quick': ['fast', 'speedy']}, 'probability': 0.5},
+    {'op': 'case', 'mode': 'upper', 'probability': 0.2},
+    {'op': 'shuffle_fields', 'groups': [['agent_one', 'agent_two']], 'probability': 0.5},
+    {'op': 'numeric_jitter', 'scale': 0.2},
+]
+
+
+def test_augment_file_does_not_depend_on_worker_count(tmp_path):
+    source = write_dataset(tmp_path / 'source.parquet')
+    pipeline = AugmentationPipeline.from_config(CONFIG, seed=11)
+    outputs = {}
+    for workers in (4, 1):
+        output = tmp_path / f'out-{workers}.parquet'
+        report = DatasetAugmentor(max_workers=workers, batch_size=32, row_group_size=100).augment_file(
+            source, str(output), pipeline, copies=2, include_original=True)
+        assert report['input_rows'] == 400 and report['output_rows'] == 1200
+        outputs[workers] = pq.read_table(output)
+    assert outputs[4].equals(outputs[1])
+    assert outputs[4].schema.field('task').type == pa.dictionary(pa.int32(), pa.string())
+    # The first batch is written as is, then its augmented copies
+    assert not outputs[4].slice(0, 32).equals(outputs[4].slice(32, 32))
+
+
+def test_synonyms_replace_whole_words_only(tmp_path):
+    table_file = tmp_path / 'synonyms.csv'
+    table_file.write_text('quick,fast\nslow,\n')
+    operator = SynonymOperator(str(table_file), probability=1.0)
+    assert operator._synonyms == {'quick': ['fast']}
+    table = pa.table({'text': ['The quick fox', 'Quickly done', 'QUICK!', None], 'task': ['quick'] * 4})
+    result = operator.apply(table, np.random.default_rng(0))
+    assert result.column('text').to_pylist() == ['The fast fox', 'Quickly done', 'fast!', None]
+    assert result.column('task').to_pylist() == ['quick'] * 4
+
+
+def test_synonyms_only_change_picked_rows():
+    table = pa.table({'text': ['quick'] * 200})
+    result = SynonymOperator({'quick': ['fast', 'rapid']}, probability=0.5).apply(table, np.random.default_rng(3))
+    counts = {value: result.column('text').to_pylist().count(value) for value in ('quick', 'fast', 'rapid')}
+    assert sum(counts.values()) == 200
+    assert all(30 < count < 170 for count in counts.values())
+
+
+def test_shuffle_fields_permutes_within_rows():
+    table = pa.table({'agent_one': [f"one {index}" for index in range(100)], 'agent_two': [f"two {index}" for index in range(100)]})
+    result = ShuffleFieldsOperator([['agent_one', 'agent_two']], probability=0.5).apply(table, np.random.default_rng(0))
+    pairs = list(zip(result.column('agent_one').to_pylist(), result.column('agent_two').to_pylist()))
+    assert all(sorted(pair) == [f"one {index}", f"two {index}"] for index, pair in enumerate(pairs))
+    swapped = sum(first.startswith('two') for first, _ in pairs)
+    assert 0 < swapped < 100
+
+
+def test_shuffle_fields_rejects_mixed_types():
+    table = pa.table({'a': ['x'], 'b': [1]})
+    with pytest.raises(ValueError, match='different types'):
+        ShuffleFieldsOperator([['a', 'b']]).apply(table, np.random.default_rng(0))
+
+
+def test_numeric_jitter_rounds_integers():
+    values = np.array([10, 100, 1000, 5])
+    table = pa.table({'count': pa.array(values, pa.int32()), 'score': [1.0, 2.0, 3.0, 4.0]})
+    result = NumericJitterOperator(scale=0.5, columns=['count']).apply(table, np.random.default_rng(0))
+    factors = 1 + np.random.default_rng(0).uniform(-0.5, 0.5, len(values))
+    assert result.schema.field('count').type == pa.int32()
+    assert result.column('count').to_pylist() == np.round(values * factors).astype(int).tolist()
+    assert result.column('score').to_pylist() == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_pipeline_config_round_trip():
+    pipeline = AugmentationPipeline.from_config(CONFIG, seed=5)
+    config = pipeline.to_config()
+    assert config[1] == {'op': 'punctuation', 'mode': 'toggle_period', 'columns': None, 'probability': 0.5}
+    assert config[4] == {'op': 'shuffle_fields', 'groups': [['agent_one', 'agent_two']], 'probability': 0.5}
+    rebuilt = AugmentationPipeline.from_config(json.loads(json.dumps(config)), seed=5)
+    assert rebuilt.to_config() == config
+
+    table = pa.table({'instruction': ['a quick test', 'another  one'], 'agent_one': ['x', 'y'], 'agent_two': ['z', 'w'], 'count': [3, 40]})
+    assert rebuilt.apply(table).equals(pipeline.apply(table))
+
+    with pytest.raises(ValueError, match='Unknown augmentation operator'):
+        AugmentationPipeline.from_config([{'op': 'translate'}])
@@ -0,0 +1,37 @@
+import json
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from cutlery.DatasetExporter import DatasetExporter
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = tmp_path / 'dataset.parquet'
+    pq.write_table(pa.table({'task': ['a', 'b', 'c'], 'command': ['x', 'y', 'z']}), path)
+    return str(path)
+
+
+@pytest.mark.parametrize('output_format', ['csv', 'jsonl', 'txt', 'parquet'])
+def test_unknown_columns_raise_before_streaming(dataset, output_format):
+    with pytest.raises(ValueError, match='missing'):
+        DatasetExporter().iter_export(dataset, output_format, columns=['task', 'missing'])
+
+
+def test_jsonl_source_errors_raise_before_streaming(tmp_path):
+    path = tmp_path / 'dataset.jsonl'
+    path.write_text('{"task": "a"}\n{"task": "b"}\n')
+    with pytest.raises(ValueError, match='command'):
+        DatasetExporter().iter_export(str(path), 'csv', columns=['command'])
+
+
+def test_export_streams_every_row(dataset):
+    chunks = DatasetExporter(batch_size=1).iter_export(dataset, 'jsonl', start=1)
+    records = [json.loads(line) for line in b''.join(chunks).decode().splitlines()]
+    assert records == [{'task': 'b', 'command': 'y'}, {'task': 'c', 'command': 'z'}]
+
+
+def test_empty_range_exports_nothing(dataset):
+    assert b''.join(DatasetExporter().iter_export(dataset, 'csv', start=2, stop=2)) == b''
@@ -0,0 +1,39 @@
+import json
+
+import pyarrow as pa
+import pytest
+
+from cutlery.DatasetReader import DatasetReader
+
+
+def test_extension_wins_over_content(tmp_path):
+    seed = tmp_path / 'seed.txt'
+    seed.write_text('$("a, b")\n$("c")\n')
+    reader = DatasetReader()
+    assert reader.sniff(str(seed)).name == 'txt'
+    assert reader.read_table(str(seed)).column('text').to_pylist() == ['a, b', 'c']
+
+
+def test_unknown_extension_is_sniffed(tmp_path):
+    data = tmp_path / 'data.dat'
+    data.write_text('{"task": "a"}\n')
+    assert DatasetReader().sniff(str(data)).name == 'jsonl'
+
+
+@pytest.mark.parametrize('suffix', ['.json', '.jsonl'])
+def test_json_schema_is_inferred_over_the_whole_file(tmp_path, suffix):
+    records = [{'task': 'a', 'score': 1, 'id': 1}] * 3 + [{'task': 'b', 'score': 1.5, 'id': 'x-2', 'note': 'late'}]
+    path = tmp_path / f'data{suffix}'
+    if suffix == '.json':
+        path.write_text(json.dumps(records))
+    else:
+        path.write_text(''.join(json.dumps(record) + '\n' for record in records))
+
+    batches = list(DatasetReader(batch_size=2).iter_batches(str(path)))
+    assert len({batch.schema for batch in batches}) == 1
+    schema = batches[0].schema
+    assert schema.field('score').type == pa.float64()
+    assert schema.field('id').type == pa.string()
+    table = pa.Table.from_batches(batches)
+    assert table.column('id').to_pylist() == ['1', '1', '1', 'x-2']
+    assert table.column('note').to_pylist() == [None, None, None, 'late']
@@ -0,0 +1,67 @@
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from cutlery.DatasetSharder import DatasetSharder
+
+
+@pytest.fixture
+def dish(tmp_path):
+    path = tmp_path / 'dish.parquet'
+    pq.write_table(pa.table({'task': ['a', 'b'] * 50, 'command': [f'/c{index}' for index in range(100)]}), path)
+    return str(path)
+
+
+def shard_files(output_dir):
+    return sorted(os.path.relpath(os.path.join(root, name), output_dir)
+                  for root, _, names in os.walk(output_dir) for name in names)
+
+
+def test_resharding_removes_stale_shards(dish, tmp_path):
+    output_dir = str(tmp_path / 'shards')
+    DatasetSharder(rows_per_shard=10).shard(dish, output_dir, splits={'train': 0.8, 'holdout': 0.2})
+    assert 'holdout/holdout-00001-of-00002.parquet' in shard_files(output_dir)
+
+    manifest = DatasetSharder(rows_per_shard=1000).shard(dish, output_dir, splits={'train': 0.9, 'test': 0.1})
+    assert shard_files(output_dir) == ['manifest.json', 'test/test-00000-of-00001.parquet', 'train/train-00000-of-00001.parquet']
+    assert sum(split['rows'] for split in manifest['splits'].values()) == 100
+    assert DatasetSharder.verify(output_dir) == []
+
+
+@pytest.mark.parametrize('name', ['..', '.', '', 'a/b'])
+def test_split_names_must_stay_inside_the_output_folder(dish, tmp_path, name):
+    with pytest.raises(ValueError, match='Invalid split names'):
+        DatasetSharder().shard(dish, str(tmp_path / 'shards'), splits={'train': 0.5, name: 0.5})
+
+
+def test_many_small_strata_keep_split_sizes(tmp_path):
+    path = tmp_path / 'small_strata.parquet'
+    pq.write_table(pa.table({'task': [f't{index // 5}' for index in range(2000)], 'value': list(range(2000))}), path)
+    splits = {'train': 0.9, 'validation': 0.05, 'test': 0.05}
+    assignment, strata = DatasetSharder().assign(pq.ParquetFile(path), list(splits.values()), stratify='task', seed=3)
+
+    assert len(strata) == 400
+    for split_index, ratio in enumerate(splits.values()):
+        assert abs((assignment == split_index).sum() - 2000 * ratio) <= 1
+        assert sum(sizes[split_index] for sizes in strata.values()) == (assignment == split_index).sum()
+    for sizes in strata.values():
+        assert sum(sizes) == 5
+        assert sizes[0] >= 3
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_stratum_proportions_within_a_row(tmp_path, seed):
+    path = tmp_path / 'uneven.parquet'
+    tasks = ['a'] * 523 + ['b'] * 97 + ['c'] * 11 + [None] * 7
+    pq.write_table(pa.table({'task': tasks}), path)
+    ratios = [0.7, 0.2, 0.1]
+    assignment, strata = DatasetSharder(batch_size=100).assign(pq.ParquetFile(path), ratios, stratify='task', seed=seed)
+
+    assert set(strata) == {'a', 'b', 'c', None}
+    for split_index, ratio in enumerate(ratios):
+        assert abs((assignment == split_index).sum() - len(tasks) * ratio) <= 1
+    for stratum, sizes in strata.items():
+        size = tasks.count(stratum)
+        assert all(abs(count - size * ratio) < 2 for count, ratio in zip(sizes, ratios))
@@ -0,0 +1,96 @@
+import json
+import os
+import sys
+import time
+
+import pytest
+
+from cutlery import gguf_converter_cli
+from cutlery.gguf_converter_cli import MANIFEST_NAME, process_directory
+
+# Stand-in for llama.cpp's converter: logs its start and end, fails for inputs named bad*
+STUB = """
+import argparse, os, sys, time
+parser = argparse.ArgumentParser()
+parser.add_argument('--input')
+parser.add_argument('--output')
+parser.add_argument('--outtype')
+args = parser.parse_args()
+log = os.path.join(os.path.dirname(args.output), 'calls.log')
+with open(log, 'a') as f:
+    f.write(f"start {time.time()} {os.path.basename(args.input)}\\n")
+time.sleep(0.3)
+if os.path.basename(args.input).startswith('bad'):
+    sys.exit('conversion exploded')
+with open(args.output, 'w') as f:
+    f.write(args.outtype)
+with open(log, 'a') as f:
+    f.write(f"end {time.time()} {os.path.basename(args.input)}\\n")
+"""
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    input_dir, output_dir = tmp_path / 'safetensors', tmp_path / 'gguf'
+    input_dir.mkdir()
+    output_dir.mkdir()
+    script = tmp_path / 'convert_stub.py'
+    script.write_text(STUB)
+    for name in ('a', 'b'):
+        (input_dir / f'{name}.safetensors').write_bytes(name.encode() * 64)
+    return input_dir, output_dir, str(script)
+
+
+def calls(output_dir):
+    log = output_dir / 'calls.log'
+    return [line.split() for line in log.read_text().splitlines()] if log.exists() else []
+
+
+def test_conversions_run_in_parallel(dirs):
+    input_dir, output_dir, script = dirs
+    report = process_directory(input_dir, output_dir, convert_script=script, max_jobs=2)
+    assert report['counts'] == {'converted': 2}
+    assert (output_dir / 'a.gguf').read_text() == 'f16'
+    starts = [float(call[1]) for call in calls(output_dir) if call[0] == 'start']
+    ends = [float(call[1]) for call in calls(output_dir) if call[0] == 'end']
+    # Both conversions started before either finished
+    assert max(starts) < min(ends)
+
+
+def test_manifest_skips_unchanged_inputs(dirs):
+    input_dir, output_dir, script = dirs
+    process_directory(input_dir, output_dir, convert_script=script, max_jobs=2)
+    report = process_directory(input_dir, output_dir, convert_script=script, max_jobs=2)
+    assert report['counts'] == {'skipped': 2}
+    assert len(calls(output_dir)) == 4
+
+    (input_dir / 'a.safetensors').write_bytes(b'changed' * 64)
+    report = process_directory(input_dir, output_dir, convert_script=script, max_jobs=2)
+    assert report['counts'] == {'converted': 1, 'skipped': 1}
+
+
+def test_hash_skips_touched_but_unchanged_inputs(dirs):
+    input_dir, output_dir, script = dirs
+    process_directory(input_dir, output_dir, convert_script=script, use_hash=True)
+    manifest = json.loads((output_dir / MANIFEST_NAME).read_text())
+    assert all(entry['sha256'] for entry in manifest.values())
+
+    later = time.time() + 10
+    os.utime(input_dir / 'a.safetensors', (later, later))
+    assert process_directory(input_dir, output_dir, convert_script=script, use_hash=False)['counts'] == {'converted': 1, 'skipped': 1}
+    os.utime(input_dir / 'b.safetensors', (later + 10, later + 10))
+    assert process_directory(input_dir, output_dir, convert_script=script, use_hash=True)['counts'] == {'skipped': 2}
+
+
+def test_failed_conversion_sets_the_exit_code(dirs, monkeypatch):
+    input_dir, output_dir, script = dirs
+    (input_dir / 'bad.safetensors').write_bytes(b'x' * 64)
+    report_file = output_dir / 'report.json'
+    monkeypatch.setattr(sys, 'argv', ['gguf_converter_cli', '--input_dir', str(input_dir), '--output_dir', str(output_dir),
+                                      '--convert_script', script, '--report', str(report_file)])
+    assert gguf_converter_cli.main() == 1
+    failed = [result for result in json.loads(report_file.read_text())['results'] if result['status'] == 'failed']
+    assert [os.path.basename(result['input']) for result in failed] == ['bad.safetensors']
+    assert failed[0]['error'] == 'conversion exploded'
+    assert not (output_dir / 'bad.gguf').exists()
+    assert not (output_dir / 'bad.gguf.part').exists()
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+datasets = pytest.importorskip('datasets')
+
+from cutlery.HuggingFaceDatasetSource import HuggingFaceDatasetSource
+
+ROWS = [{'instruction': f'q{index}', 'output': f'a{index}', 'task': 'even' if index % 2 == 0 else 'odd'} for index in range(10)]
+
+
+@pytest.fixture
+def saved(tmp_path):
+    path = tmp_path / 'saved'
+    datasets.DatasetDict({'train': datasets.Dataset.from_list(ROWS)}).save_to_disk(str(path))
+    return str(path)
+
+
+@pytest.fixture
+def jsonl(tmp_path):
+    path = tmp_path / 'rows.jsonl'
+    path.write_text(''.join(json.dumps(row) + '\n' for row in ROWS))
+    return str(path)
+
+
+def read(source, **options):
+    batches = list(HuggingFaceDatasetSource(source, **options).iter_batches())
+    return [row for batch in batches for row in batch.to_pylist()], batches
+
+
+def test_reads_a_saved_dataset_in_batches(saved):
+    rows, batches = read(saved, batch_size=4)
+    assert rows == ROWS
+    assert [batch.num_rows for batch in batches] == [4, 4, 2]
+
+
+def test_limit_and_column_projection(saved):
+    rows, _ = read(saved, columns=['output'], limit=3)
+    assert rows == [{'output': 'a0'}, {'output': 'a1'}, {'output': 'a2'}]
+
+
+def test_missing_columns_raise(saved):
+    with pytest.raises(ValueError, match='missing'):
+        read(saved, columns=['instruction', 'missing'])
+
+
+def test_missing_split_raises(saved):
+    with pytest.raises(ValueError, match="Split 'test' not found"):
+        read(saved, split='test')
+
+
+def test_map_style_shards_are_contiguous(saved):
+    shards = [read(saved, num_shards=3, shard_index=index)[0] for index in range(3)]
+    assert [[row['instruction'] for row in shard] for shard in shards] == [
+        ['q0', 'q1', 'q2', 'q3'], ['q4', 'q5', 'q6'], ['q7', 'q8', 'q9']]
+
+
+def test_arrow_file(saved):
+    arrow_file = datasets.load_from_disk(saved)['train'].cache_files[0]['filename']
+    rows, _ = read(arrow_file, columns=['task'], limit=2)
+    assert rows == [{'task': 'even'}, {'task': 'odd'}]
+
+
+def test_streaming_modulo_shards(jsonl):
+    # A single data file cannot be split by file, so rows are dealt out round-robin
+    shards = [read('json', data_files=jsonl, num_shards=3, shard_index=index, batch_size=2)[0] for index in range(3)]
+    assert [[row['instruction'] for row in shard] for shard in shards] == [
+        ['q0', 'q3', 'q6', 'q9'], ['q1', 'q4', 'q7'], ['q2', 'q5', 'q8']]
+    assert sorted(row['instruction'] for shard in shards for row in shard) == sorted(row['instruction'] for row in ROWS)
+
+
+def test_streaming_limit_applies_to_the_shard(jsonl):
+    rows, _ = read('json', data_files=jsonl, num_shards=2, shard_index=1, limit=2)
+    assert [row['instruction'] for row in rows] == ['q1', 'q3']
+    rows, _ = read('json', data_files=jsonl, columns=['output'], limit=2)
+    assert rows == [{'output': 'a0'}, {'output': 'a1'}]
@@ -0,0 +1,19 @@
+from cutlery.LatexSegmenter import LatexSegmenter
+
+DOCUMENT = r"""\begin{document}
+\section{Intro}\label{sec:intro}
+Text.
+\section{Body}
+Prose before \begin{equation}x = 1\label{eq:x}\end{equation} and after.
+\subsection{Sub}
+  \label{sec:sub} More text.
+\end{document}
+"""
+
+
+def test_section_label_must_follow_the_heading():
+    labels = {(segment['kind'], segment['title']): segment['label'] for segment in LatexSegmenter().segment_text(DOCUMENT)}
+    assert labels[('section', 'Intro')] == 'sec:intro'
+    assert labels[('section', 'Body')] is None
+    assert labels[('section', 'Sub')] == 'sec:sub'
+    assert labels[('equation', None)] == 'eq:x'
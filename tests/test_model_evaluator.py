@@ -0,0 +1,50 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from cutlery.ModelEvaluator import ModelEvaluator
+
+
+class FakeInterface:
+    """
+    Echoes the expected command for every input except those starting with 'fail'.
+    """
+
+    model = 'fake'
+
+    def complete(self, messages, options=None):
+        user = messages[-1]['content']
+        if user.startswith('fail'):
+            raise ConnectionError('server down')
+        return user.replace('say ', '')
+
+
+def write_dish(path):
+    pq.write_table(pa.table({
+        'task': pa.array(['a', 'a', 'b', 'b']).dictionary_encode(),
+        'instruction': ['sys'] * 4,
+        'input': ['fail 1', 'fail 2', 'say /run', 'say /stop'],
+        'command': ['/x', '/y', '/run', '/halt'],
+        'exact': [1.0, 1.0, 1.0, 1.0],
+    }), path)
+    return str(path)
+
+
+def test_failed_first_batch_does_not_fix_the_output_types(tmp_path):
+    dish = write_dish(tmp_path / 'dish.parquet')
+    output = str(tmp_path / 'scored.parquet')
+    evaluator = ModelEvaluator(FakeInterface(), cache_dir=str(tmp_path / 'cache'), batch_size=2, max_workers=2)
+
+    report = evaluator.evaluate(dish, 'fake', output_file=output)
+    assert report['overall']['rows'] == 4
+    assert report['overall']['missing'] == 2
+    assert report['overall']['exact'] == 0.5
+
+    scored = pq.read_table(output)
+    assert scored.schema.field('prediction').type == pa.string()
+    assert scored.schema.field('task').type == pa.dictionary(pa.int32(), pa.string())
+    for name in ('exact', 'normalized', 'contains', 'token_f1'):
+        assert scored.schema.field(name).type == pa.float64()
+    assert scored.column('prediction').to_pylist() == [None, None, '/run', '/stop']
+    # Stale scores from the dataset are replaced, and rows without a prediction are left unscored
+    assert scored.column('exact').to_pylist() == [None, None, 1.0, 0.0]
+    assert evaluator.score_file(output)['overall']['exact'] == 0.5
@@ -0,0 +1,104 @@
+import json
+import os
+import re
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from cutlery.OpenAgentChef import Open_Agent_Chef
+
+
+class FakeClient:
+    """
+    Stand-in for `ollama.Client` that records peak concurrency. Paraphrase requests echo
+    the source value back, structured requests fill every requested field.
+    """
+
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def chat(self, model=None, messages=None, format=None, **kwargs):
+        with self.lock:
+            self.calls += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            prompt = messages[-1]['content']
+            match = re.search(r'based on: (.*)\. Maintain', prompt)
+            # Later rows answer faster, so completion order differs from input order
+            value = int(match.group(1)) if match and match.group(1).isdigit() else 0
+            time.sleep(self.delay / (1 + value % 5))
+            if format is not None:
+                content = json.dumps({name: f"{name} value" for name in format['properties']})
+            else:
+                content = f"copy of {match.group(1)}"
+            return {'message': {'content': content}}
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+@pytest.fixture
+def make_chef(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr('builtins.input', lambda prompt='': 'test-model')
+
+    def make(**options):
+        chef = Open_Agent_Chef(**options)
+        chef.client = FakeClient()
+        return chef
+    return make
+
+
+def test_synthetic_rows_keep_input_order(make_chef):
+    chef = make_chef(max_workers=4, duplicates=1)
+    rows = chef.generate_synthetic_data([{'text': str(index)} for index in range(20)])
+    assert rows == [{'text': f"copy of {index}"} for index in range(20)]
+
+
+def test_requests_never_exceed_max_workers(make_chef):
+    chef = make_chef(max_workers=3, duplicates=1)
+    # Two columns per row, so the row and field pools together could issue 9 requests at once
+    chef.generate_synthetic_data([{'a': str(index), 'b': str(index)} for index in range(24)])
+    assert chef.client.calls == 48
+    assert chef.client.peak <= 3
+
+
+def test_duplicates_per_seed_row(make_chef):
+    chef = make_chef(max_workers=2, duplicates=3)
+    rows = chef.generate_synthetic_data(pd.DataFrame({'text': ['1', '2']}))
+    assert rows == [{'text': 'copy of 1'}] * 3 + [{'text': 'copy of 2'}] * 3
+
+
+def test_dataset_schema_puts_seed_columns_first(make_chef):
+    fields = [{'name': 'question', 'prompt': 'Ask something'}, {'name': 'answer', 'prompt': 'Answer it'}]
+    chef = make_chef(dataset_params={'size': 3, 'fields': fields}, max_workers=2)
+    chef.seed_data = pd.DataFrame({'id': [7], 'answer': [{'nested': True}]})
+    schema = chef.dataset_schema()
+    assert schema.names == ['id', 'answer', 'question']
+    assert schema.field('id').type == pa.int64()
+    assert schema.field('answer').type == pa.string()
+    assert schema.field('question').type == pa.string()
+
+    with chef.open_writer('dataset.parquet', schema=schema) as writer:
+        assert chef.generate_dataset(writer) == 3
+    table = pq.read_table(writer.output_file)
+    assert table.schema.equals(schema)
+    assert table.column('answer').to_pylist() == ['{"nested": true}', 'answer value', 'answer value']
+    assert table.column('question').to_pylist() == [None, 'question value', 'question value']
+
+
+@pytest.mark.parametrize('mode', ['latex', None])
+def test_main_reports_unsupported_mode(make_chef, mode):
+    chef = make_chef()
+    chef.mode = mode
+    assert chef.main() == f"An error occurred: Unsupported mode: {mode} (expected 'custom' or 'huggingface')"
+    assert os.listdir(chef.output_dir) == []
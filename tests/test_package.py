@@ -0,0 +1,21 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHECK = """
+import types
+import cutlery
+assert isinstance(cutlery.TemplateSchema, type), cutlery.TemplateSchema
+import cutlery.ModelEvaluator as evaluator_module
+import cutlery.OllamaInterface as ollama_interface
+assert isinstance(evaluator_module, types.ModuleType), evaluator_module
+assert isinstance(evaluator_module.ModelEvaluator, type)
+assert isinstance(ollama_interface, type), ollama_interface
+assert isinstance(cutlery.OllamaInterface, type)
+"""
+
+
+def test_only_the_legacy_names_shadow_their_submodules():
+    subprocess.run([sys.executable, '-c', CHECK], check=True, cwd=ROOT)
@@ -0,0 +1,45 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from cutlery.ParquetRowWriter import ParquetRowWriter
+
+
+def test_fields_missing_from_the_first_row_are_kept(tmp_path):
+    path = str(tmp_path / 'rows.parquet')
+    with ParquetRowWriter(path) as writer:
+        writer.write_rows([{'task': 'a'}, {'task': 'b', 'command': 'x'}])
+    assert pq.read_table(path).to_pylist() == [{'task': 'a', 'command': None}, {'task': 'b', 'command': 'x'}]
+
+
+def test_null_only_columns_in_the_first_group_become_strings(tmp_path):
+    path = str(tmp_path / 'rows.parquet')
+    with ParquetRowWriter(path, row_group_size=2) as writer:
+        writer.write_rows([{'task': 'a', 'note': None}, {'task': 'b', 'note': None}, {'task': 'c', 'note': 'kept'}])
+    table = pq.read_table(path)
+    assert table.schema.field('note').type == pa.string()
+    assert table.column('note').to_pylist() == [None, None, 'kept']
+
+
+@pytest.mark.parametrize('background', [False, True])
+def test_unknown_fields_after_the_first_group_raise(tmp_path, background):
+    writer = ParquetRowWriter(str(tmp_path / 'rows.parquet'), row_group_size=1, background=background)
+    with pytest.raises(ValueError, match='command'):
+        writer.write_row({'task': 'a'})
+        writer.write_row({'task': 'b', 'command': 'x'})
+        writer.close()
+
+
+def test_explicit_schema_rejects_unknown_fields(tmp_path):
+    schema = pa.schema([('task', pa.string())])
+    writer = ParquetRowWriter(str(tmp_path / 'rows.parquet'), schema=schema)
+    writer.write_row({'task': 'a', 'extra': 1})
+    with pytest.raises(ValueError, match='extra'):
+        writer.close()
+
+
+def test_empty_file_keeps_the_schema(tmp_path):
+    path = str(tmp_path / 'rows.parquet')
+    schema = pa.schema([('task', pa.string()), ('score', pa.float64())])
+    assert ParquetRowWriter(path, schema=schema).close() == 0
+    assert pq.read_schema(path).equals(schema)
@@ -0,0 +1,25 @@
+import json
+import math
+import importlib
+
+import numpy as np
+
+encoder_module = importlib.import_module('cutlery.ResponseEncoder')
+ResponseEncoder = encoder_module.ResponseEncoder
+
+ROW = {'score': float('nan'), 'values': [1.0, float('inf'), np.float64('nan')], 'count': np.int64(3), 'text': 'ok'}
+EXPECTED = {'score': None, 'values': [1.0, None, None], 'count': 3, 'text': 'ok'}
+
+def test_json_fallback_maps_non_finite_floats_to_null(monkeypatch):
+    monkeypatch.setattr(encoder_module, 'orjson', None)
+    assert json.loads(ResponseEncoder().dumps(ROW)) == EXPECTED
+
+def test_numpy_arrays_with_nan_in_json_fallback(monkeypatch):
+    monkeypatch.setattr(encoder_module, 'orjson', None)
+    decoded = json.loads(ResponseEncoder().dumps({'array': np.array([0.5, math.nan])}))
+    assert decoded == {'array': [0.5, None]}
+
+def test_orjson_and_fallback_agree():
+    if encoder_module.orjson is None:
+        return
+    assert json.loads(ResponseEncoder().dumps(ROW)) == EXPECTED
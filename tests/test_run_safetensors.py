@@ -0,0 +1,105 @@
+import threading
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from cutlery import run_safetensors
+from cutlery.run_safetensors import BatchingGenerator, evaluate_parquet, plan_batches
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """
+    Replace the model with a stub that upper-cases each prompt and records every batch.
+    """
+    recorded = []
+
+    def fake_generate_batch(prompts, model, tokenizer, max_new_tokens=150, **kwargs):
+        recorded.append((list(prompts), max_new_tokens))
+        return [prompt.upper() for prompt in prompts]
+
+    monkeypatch.setattr(run_safetensors, 'generate_batch', fake_generate_batch)
+    return recorded
+
+
+def test_plan_batches_groups_by_length_within_limits():
+    lengths = [5, 100, 6, 90, 7, 0]
+    batches = plan_batches(lengths, max_batch_size=2, max_batch_tokens=150)
+    assert sorted(index for batch in batches for index in batch) == list(range(len(lengths)))
+    assert batches == [[5, 0], [2, 4], [3], [1]]
+    for batch in batches:
+        assert len(batch) <= 2
+        assert max(max(lengths[index], 1) for index in batch) * len(batch) <= 150
+
+
+def test_plan_batches_keeps_oversized_prompts_alone():
+    assert plan_batches([500, 10], max_batch_size=8, max_batch_tokens=100) == [[1], [0]]
+
+
+def test_batching_generator_batches_concurrent_requests(calls):
+    generator = BatchingGenerator(None, None, max_batch_size=8, max_wait=0.2)
+    results = {}
+    barrier = threading.Barrier(4)
+
+    def request(prompt):
+        barrier.wait()
+        results[prompt] = generator.generate(prompt, timeout=5)
+
+    threads = [threading.Thread(target=request, args=(f'p{index}',)) for index in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {f'p{index}': f'P{index}' for index in range(4)}
+    assert sum(len(prompts) for prompts, _ in calls) == 4
+    assert len(calls) < 4
+
+
+def test_batching_generator_splits_by_max_new_tokens(calls):
+    generator = BatchingGenerator(None, None, max_batch_size=2, max_wait=0.5)
+    futures = [generator.submit('a', max_new_tokens=10), generator.submit('b', max_new_tokens=20)]
+    assert [future.result(timeout=5) for future in futures] == ['A', 'B']
+    assert sorted(calls) == [(['a'], 10), (['b'], 20)]
+
+
+def test_batching_generator_propagates_errors(monkeypatch):
+    def failing_generate_batch(prompts, *args, **kwargs):
+        raise RuntimeError('out of memory')
+
+    monkeypatch.setattr(run_safetensors, 'generate_batch', failing_generate_batch)
+    with pytest.raises(RuntimeError, match='out of memory'):
+        BatchingGenerator(None, None, max_wait=0).generate('x', timeout=5)
+
+
+def test_evaluate_parquet_keeps_source_types(tmp_path, calls):
+    source = tmp_path / 'validation.parquet'
+    table = pa.table({
+        'instruction': ['one', 'two', 'three'],
+        'task': pa.array(['a', 'b', 'a']).dictionary_encode(),
+        'note': pa.array([None, None, 'late'], pa.string()),
+    })
+    pq.write_table(table, source)
+    output = tmp_path / 'predictions.parquet'
+
+    assert evaluate_parquet(None, None, str(source), str(output), read_batch_size=2) == 3
+    result = pq.read_table(output)
+    assert result.schema.field('task').type == pa.dictionary(pa.int32(), pa.string())
+    assert result.schema.field('note').type == pa.string()
+    assert result.column('prediction').to_pylist() == ['ONE', 'TWO', 'THREE']
+    assert result.column('note').to_pylist() == [None, None, 'late']
+    assert [prompts for prompts, _ in calls] == [['one', 'two'], ['three']]
+
+
+def test_evaluate_parquet_limit_and_template(tmp_path, calls):
+    source = tmp_path / 'validation.parquet'
+    pq.write_table(pa.table({'instruction': ['x', 'y', 'z'], 'prediction': ['old', 'old', 'old']}), source)
+    output = tmp_path / 'predictions.parquet'
+
+    assert evaluate_parquet(None, None, str(source), str(output), prompt_template='Q: {instruction}', limit=2) == 2
+    result = pq.read_table(output)
+    assert result.schema.names == ['instruction', 'prediction']
+    assert result.column('prediction').to_pylist() == ['Q: X', 'Q: Y']
+
+    with pytest.raises(ValueError, match='missing'):
+        evaluate_parquet(None, None, str(source), str(output), prompt_template='{missing}')
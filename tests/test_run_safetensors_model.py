@@ -0,0 +1,91 @@
+import pytest
+
+torch = pytest.importorskip('torch')
+transformers = pytest.importorskip('transformers')
+tokenizers = pytest.importorskip('tokenizers')
+
+from cutlery.run_safetensors import generate_batch, generate_response, setup_model
+
+WORDS = ['the', 'cat', 'sat', 'on', 'a', 'mat', 'dog', 'ran', 'far', 'away', 'and', 'then', 'slept', 'in', 'sun']
+PROMPTS = ['cat', 'the dog ran far away and then', 'a cat sat']
+
+
+@pytest.fixture(scope='module')
+def base_model(tmp_path_factory):
+    """
+    A tiny random Llama with a word-level tokenizer that has no pad token, saved as
+    safetensors so setup_model loads it exactly like a downloaded checkpoint.
+    """
+    path = tmp_path_factory.mktemp('tiny-llama')
+    vocab = {'<unk>': 0, '<s>': 1, '</s>': 2, **{word: index + 3 for index, word in enumerate(WORDS)}}
+    backend = tokenizers.Tokenizer(tokenizers.models.WordLevel(vocab, unk_token='<unk>'))
+    backend.pre_tokenizer = tokenizers.pre_tokenizers.Whitespace()
+    tokenizer = transformers.PreTrainedTokenizerFast(tokenizer_object=backend, unk_token='<unk>', bos_token='<s>', eos_token='</s>')
+    tokenizer.save_pretrained(path)
+
+    config = transformers.LlamaConfig(vocab_size=len(vocab), hidden_size=32, intermediate_size=64, num_hidden_layers=2,
+                                      num_attention_heads=4, num_key_value_heads=4, max_position_embeddings=256,
+                                      bos_token_id=1, eos_token_id=2, tie_word_embeddings=False)
+    torch.manual_seed(0)
+    transformers.LlamaForCausalLM(config).save_pretrained(path, safe_serialization=True)
+    return str(path)
+
+
+def single(prompt, model, tokenizer, max_new_tokens=6):
+    # Unpadded reference: generate one prompt and cut its tokens off the output
+    inputs = tokenizer([prompt], return_tensors='pt')
+    with torch.inference_mode():
+        outputs = model.generate(**inputs, max_new_tokens=max_new_tokens, do_sample=False, pad_token_id=tokenizer.pad_token_id)
+    return tokenizer.decode(outputs[0, inputs['input_ids'].shape[1]:], skip_special_tokens=True).strip()
+
+
+def test_setup_model_pads_on_the_left(base_model):
+    model, tokenizer = setup_model(base_model, device='cpu', threads=1)
+    assert tokenizer.padding_side == 'left'
+    assert tokenizer.pad_token == tokenizer.eos_token
+    assert model.generation_config.pad_token_id == tokenizer.pad_token_id
+    assert next(model.parameters()).dtype == torch.float32
+    assert not model.training
+
+    padded = tokenizer(PROMPTS, padding=True)['input_ids']
+    assert padded[0][:-1] == [tokenizer.pad_token_id] * (len(padded[0]) - 1)
+
+
+def test_batched_output_matches_single_prompts(base_model):
+    model, tokenizer = setup_model(base_model, device='cpu')
+    expected = [single(prompt, model, tokenizer) for prompt in PROMPTS]
+    assert generate_batch(PROMPTS, model, tokenizer, max_new_tokens=6, do_sample=False) == expected
+    # Tiny batches take the other path through plan_batches
+    assert generate_batch(PROMPTS, model, tokenizer, max_new_tokens=6, max_batch_size=1, do_sample=False) == expected
+    assert generate_response(PROMPTS[1], model, tokenizer) == single(PROMPTS[1], model, tokenizer, max_new_tokens=150)
+
+
+def test_completions_exclude_the_prompt(base_model):
+    model, tokenizer = setup_model(base_model, device='cpu')
+    completions = generate_batch(PROMPTS, model, tokenizer, max_new_tokens=4, min_new_tokens=4, do_sample=False)
+    for completion in completions:
+        # Each generated token decodes to at most one word; the prompt is not repeated
+        assert len(completion.split()) <= 4
+
+
+def test_adapter_is_merged(base_model, tmp_path):
+    peft = pytest.importorskip('peft')
+    base, tokenizer = setup_model(base_model, device='cpu')
+    lora = peft.LoraConfig(r=4, lora_alpha=8, target_modules=['q_proj', 'v_proj'], init_lora_weights=False)
+    adapter = tmp_path / 'adapter'
+    torch.manual_seed(1)
+    peft.get_peft_model(base, lora).save_pretrained(adapter)
+
+    base, _ = setup_model(base_model, device='cpu')
+    merged, _ = setup_model(base_model, str(adapter), device='cpu')
+    unmerged, _ = setup_model(base_model, str(adapter), device='cpu', merge_adapter=False)
+    assert not isinstance(merged, peft.PeftModel)
+    assert isinstance(unmerged, peft.PeftModel)
+
+    inputs = tokenizer(PROMPTS, return_tensors='pt', padding=True)
+    with torch.inference_mode():
+        logits = [model(**inputs).logits for model in (base, merged, unmerged)]
+    assert not torch.allclose(logits[0], logits[1], atol=1e-4)
+    assert torch.allclose(logits[1], logits[2], atol=1e-4)
+    assert generate_batch(PROMPTS, merged, tokenizer, max_new_tokens=6, do_sample=False) == \
+        generate_batch(PROMPTS, unmerged, tokenizer, max_new_tokens=6, do_sample=False)
@@ -0,0 +1,37 @@
+import json
+import struct
+
+import numpy as np
+
+from cutlery.SafetensorsInspector import SafetensorsInspector
+
+
+def write_safetensors(path, header, data):
+    encoded = json.dumps(header).encode()
+    path.write_bytes(struct.pack('<Q', len(encoded)) + encoded + data)
+    return str(path)
+
+
+def test_malformed_entries_are_reported_per_tensor(tmp_path):
+    header = {
+        'good': {'dtype': 'F32', 'shape': [2], 'data_offsets': [0, 8]},
+        'no_dtype': {'shape': [1], 'data_offsets': [8, 12]},
+        'bad_offsets': {'dtype': 'F32', 'shape': [1], 'data_offsets': [12]},
+        'not_an_entry': 5,
+    }
+    path = write_safetensors(tmp_path / 'model.safetensors', header, np.arange(3, dtype='<f4').tobytes())
+    report = SafetensorsInspector(path).inspect()
+    assert report['tensors'] == 1
+    assert not report['valid']
+    errors = '\n'.join(report['errors'])
+    assert 'no_dtype header entry has no dtype' in errors
+    assert 'bad_offsets has invalid shape' in errors
+    assert 'not_an_entry header entry is malformed' in errors
+
+
+def test_tensors_outlive_close(tmp_path):
+    header = {'weight': {'dtype': 'F32', 'shape': [2, 2], 'data_offsets': [0, 16]}}
+    path = write_safetensors(tmp_path / 'model.safetensors', header, np.arange(4, dtype='<f4').tobytes())
+    with SafetensorsInspector(path) as inspector:
+        weight = inspector.tensor('weight')
+    assert weight.tolist() == [[0.0, 1.0], [2.0, 3.0]]
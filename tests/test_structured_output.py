@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from cutlery.StructuredOutput import StructuredOutput
+
+
+def test_fields_default_to_strings():
+    schema = StructuredOutput.for_fields(['question', {'name': 'tags', 'schema': {'type': 'array', 'items': {'type': 'string'}}}])
+    assert schema['properties'] == {'question': {'type': 'string'}, 'tags': {'type': 'array', 'items': {'type': 'string'}}}
+    assert schema['required'] == ['question', 'tags']
+
+
+def test_only_invalid_fields_are_retried():
+    structured = StructuredOutput(StructuredOutput.for_fields(['question', 'answer']), max_retries=1)
+    replies = iter([{'question': 'Why?', 'answer': 42}, {'answer': 'Because.'}])
+    formats = []
+
+    def chat(messages, format):
+        formats.append(format)
+        return {'message': {'content': json.dumps(next(replies))}}
+
+    value, errors = structured.generate(chat, [{'role': 'user', 'content': 'go'}])
+    assert errors == []
+    assert value == {'question': 'Why?', 'answer': 'Because.'}
+    assert list(formats[1]['properties']) == ['answer']
+
+
+def test_invalid_json_retries_whole_value():
+    structured = StructuredOutput(StructuredOutput.for_fields(['question']), max_retries=2)
+    replies = iter(['not json', '["a list"]', '{"question": "Why?"}'])
+    formats = []
+
+    def chat(messages, format):
+        formats.append(format)
+        return {'message': {'content': next(replies)}}
+
+    value, errors = structured.generate(chat, [{'role': 'user', 'content': 'go'}])
+    assert errors == []
+    assert value == {'question': 'Why?'}
+    assert formats == [structured.schema] * 3
+
+
+def test_retries_give_up_with_errors():
+    structured = StructuredOutput(StructuredOutput.for_fields(['question']), max_retries=1)
+    value, errors = structured.generate(lambda messages, format: {'message': {'content': 'nope'}}, [])
+    assert value is None
+    assert errors[0][0] == '' and errors[0][1].startswith('invalid JSON')
+
+
+def test_any_of_and_enum():
+    schema = {'type': 'object', 'properties': {
+        'label': {'enum': ['yes', 'no']},
+        'score': {'anyOf': [{'type': 'integer', 'minimum': 0}, {'type': 'null'}]},
+    }, 'required': ['label']}
+    check = StructuredOutput(schema).validate
+    assert check({'label': 'yes', 'score': 3}) == []
+    assert check({'label': 'no', 'score': None}) == []
+    assert check({'label': 'maybe', 'score': -1}) == [
+        ('label', "must be one of ['yes', 'no']"),
+        ('score', 'matches none of anyOf'),
+    ]
+
+
+@pytest.mark.parametrize('schema', [
+    {'type': 'string', 'pattern': '^a'},
+    {'type': 'string', 'format': 'date'},
+    {'oneOf': [{'type': 'string'}]},
+    {'$ref': '#/definitions/thing'},
+    {'type': 'object', 'minProperties': 1},
+    {'type': 'object', 'properties': {'nested': {'type': 'string', 'pattern': '^a'}}},
+    {'type': 'array', 'items': [{'type': 'string'}]},
+])
+def test_unsupported_keywords_are_rejected(schema):
+    with pytest.raises(ValueError, match='Unsupported schema keyword'):
+        StructuredOutput(schema)
+
+
+def test_annotations_are_allowed():
+    schema = {'title': 'Point', 'description': 'A data point', 'type': 'object',
+              'properties': {'x': {'type': 'number', 'description': 'x coordinate', 'default': 0}}}
+    assert StructuredOutput(schema).validate({'x': 1.5}) == []